@@ -0,0 +1,385 @@
+"""
+BATCH PROCESSING OF THE RECORDINGS
+==================================
+This script runs the whole analysis pipeline (`load_and_preprocess`, `detect_stimuli` and `identify_peak_flexion`) on
+all the trials found in the data directory, using several processes. It writes one row of results per trial.
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Functions
+---------
+discover_trials(data_dir='data', participants=None, tasks=None)
+    Find the trial files in the data directory.
+trial_parameters(file_name, custom_params_path=None)
+    Get the custom peak detection parameters of a trial.
+load_trial(file_path, fs=5000, use_cache=False)
+    Load and preprocess the movement and sound signals of a trial.
+map_trials(function, *iterables, max_workers=None, **kwargs)
+    Apply a function to each trial (or participant), in a pool of processes.
+ioi_statistics(peaks, fs=5000)
+    Compute the mean, standard deviation and coefficient of variation of the IOIs and movement frequencies.
+process_trial(trial, fs=5000, custom_params_path=None, results_dir=None, use_cache=False)
+    Run the analysis pipeline on one trial.
+run_batch(data_dir='data', participants=None, tasks=None, max_workers=None, fs=5000, custom_params_path=None, results_dir=None, output_path=None, use_cache=False)
+    Run the analysis pipeline on all the trials of the data directory.
+run_trials(trials, max_workers=None, output_path=None, **kwargs)
+    Run the analysis pipeline on a list of trials.
+
+Usage
+-----
+    python -m src.batch_processing data --workers 4 --output results.csv
+
+Notes
+-----
+Trial files must follow the naming convention `data/<participant>/<participant>_<task>__<trial>.csv`, where task is
+one of 'Pref' (SMT measurement), 'adapt', 'conti' or 'synch'.
+"""
+
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+import re
+
+import numpy as np
+import pandas as pd
+
+from src.peak_detection import CUSTOM_PARAMETERS, get_custom_parameters, identify_peak_flexion
+from src.preprocessing_cache import load_and_preprocess_cached
+from src.stimulus_analysis import load_and_preprocess, detect_stimuli
+
+# Task identifiers in the file names, and the corresponding task identifiers of the analysis functions
+TASKS = {'Pref': 'SMT', 'adapt': 'adapt', 'conti': 'conti', 'synch': 'synch'}
+PEAK_PARAMETERS = CUSTOM_PARAMETERS
+FILE_PATTERN = re.compile(r'^(?P<participant>.+)_(?P<task>[^_]+)__(?P<trial>\d+)\.csv$')
+
+
+def discover_trials(data_dir='data', participants=None, tasks=None):
+    """
+    Find the trial files in the data directory.
+
+    Parameters
+    ----------
+    data_dir : str or Path, optional
+        Directory containing one subdirectory per participant. Default is 'data'.
+    participants : list, optional
+        Participants to include. If None, all participants are included. Default is None.
+    tasks : list, optional
+        Tasks to include, as written in the file names (e.g., 'Pref', 'synch'). If None, all tasks are included.
+        Default is None.
+
+    Returns
+    -------
+    out : list
+        List of dictionaries with the participant, task, trial number and path of each trial file, sorted by
+        participant, task and trial number.
+    """
+    trials = []
+
+    for participant_dir in sorted(Path(data_dir).iterdir()):
+        if not participant_dir.is_dir() or (participants is not None and participant_dir.name not in participants):
+            continue
+
+        for file_path in participant_dir.glob('*.csv'):
+            match = FILE_PATTERN.match(file_path.name)
+            if match is None or match['participant'] != participant_dir.name or match['task'] not in TASKS:
+                continue
+            if tasks is not None and match['task'] not in tasks:
+                continue
+
+            trials.append({
+                'participant': match['participant'],
+                'task': match['task'],
+                'trial': int(match['trial']),
+                'file_path': file_path,
+            })
+
+    return sorted(trials, key=lambda trial: (trial['participant'], trial['task'], trial['trial']))
+
+
+def trial_parameters(file_name, custom_params_path=None):
+    """
+    Get the custom peak detection parameters of a trial.
+
+    Parameters
+    ----------
+    file_name : str
+        The identifier for the file.
+    custom_params_path : str or Path, optional
+        Path to the csv file containing custom peak detection parameters. See `load_custom_parameters`. Default is
+        None.
+
+    Returns
+    -------
+    out : dict
+        Custom parameters of the trial. Empty if the trial has no custom parameters.
+    """
+    return get_custom_parameters(file_name, custom_params_path) or {}
+
+
+def load_trial(file_path, fs=5000, use_cache=False):
+    """
+    Load and preprocess the movement and sound signals of a trial.
+
+    Parameters
+    ----------
+    file_path : str or Path
+        Path to the CSV file of the trial.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    use_cache : bool, optional
+        Whether to load the preprocessed recording from the cache. See `load_and_preprocess_cached`. Default is False.
+
+    Returns
+    -------
+    mov : array
+        Preprocessed goniometer data.
+    sound : array
+        Sound signal.
+    """
+    if use_cache:
+        _, mov, sound = load_and_preprocess_cached(file_path, fs=fs)
+    else:
+        _, mov, sound = load_and_preprocess(file_path, fs=fs, with_time=False)
+    return mov, sound
+
+
+def map_trials(function, *iterables, max_workers=None, **kwargs):
+    """
+    Apply a function to each trial (or participant), in a pool of processes.
+
+    Parameters
+    ----------
+    function : callable
+        Function applied to each item. It must be defined at the top level of a module, so that it can be sent to the
+        processes.
+    *iterables
+        Positional arguments of the function, one iterable per argument, as with `map`.
+    max_workers : int, optional
+        Number of processes. If None, the number of processors is used. If 1, the items are processed in the current
+        process. Default is None.
+    **kwargs
+        Keyword arguments passed to the function for every item.
+
+    Returns
+    -------
+    out : list
+        Output of the function for each item, in the order of the items.
+    """
+    worker = partial(function, **kwargs)
+
+    if max_workers == 1:
+        return [worker(*args) for args in zip(*iterables)]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(worker, *iterables))
+
+
+def ioi_statistics(peaks, fs=5000):
+    """
+    Compute the mean, standard deviation and coefficient of variation of the IOIs and movement frequencies.
+
+    Parameters
+    ----------
+    peaks : array
+        Detected peak indices.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+
+    Returns
+    -------
+    out : dict
+        Mean, standard deviation and coefficient of variation in % of the IOIs in s ('ioi_mean', 'ioi_sd', 'ioi_cv'),
+        and mean and standard deviation of the movement frequencies in Hz ('freq_mean', 'freq_sd'). NaN if less than
+        two peaks were detected.
+    """
+    iois = np.diff(peaks) / fs
+    if len(iois) == 0:
+        return {'ioi_mean': np.nan, 'ioi_sd': np.nan, 'ioi_cv': np.nan, 'freq_mean': np.nan, 'freq_sd': np.nan}
+
+    frequencies = 1 / iois
+    return {
+        'ioi_mean': np.mean(iois),
+        'ioi_sd': np.std(iois),
+        'ioi_cv': np.std(iois) / np.mean(iois) * 100,
+        'freq_mean': np.mean(frequencies),
+        'freq_sd': np.std(frequencies),
+    }
+
+
+def process_trial(trial, fs=5000, custom_params_path=None, results_dir=None, use_cache=False):
+    """
+    Run the analysis pipeline on one trial.
+
+    Errors are caught and reported in the result, so that one faulty file does not stop a batch.
+
+    Parameters
+    ----------
+    trial : dict
+        Trial description, as returned by `discover_trials`.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    custom_params_path : str or Path, optional
+        Path to the csv file containing custom peak detection parameters. See `load_custom_parameters`. Default is
+        None.
+    results_dir : str or Path, optional
+        Directory in which the detected peaks, stimulus onsets, plateaus, and task onset and offset are saved as
+        `<file name>.npz`. If None, they are not saved. Default is None.
+    use_cache : bool, optional
+        Whether to load the preprocessed recordings from the cache. See `load_and_preprocess_cached`. Default is False.
+
+    Returns
+    -------
+    out : dict
+        Result row, with the trial description, the peak detection parameters, the number of stimuli and peaks, and the
+        mean, standard deviation and coefficient of variation of the IOIs and movement frequencies.
+    """
+    file_path = Path(trial['file_path'])
+    task = TASKS[trial['task']]
+    row = {
+        'participant': trial['participant'],
+        'task': trial['task'],
+        'trial': trial['trial'],
+        'file_name': file_path.stem,
+    }
+
+    try:
+        parameters = trial_parameters(file_path.stem, custom_params_path)
+
+        mov, sound = load_trial(file_path, fs=fs, use_cache=use_cache)
+        stim_onset, _, plateaus, _, task_onset, task_offset = detect_stimuli(sound, task=task, fs=fs)
+        peaks = identify_peak_flexion(mov, stim_onset, plateaus, task, fs=fs, **parameters)
+
+        if results_dir is not None:
+            Path(results_dir).mkdir(parents=True, exist_ok=True)
+            np.savez(
+                Path(results_dir) / f'{file_path.stem}.npz', peaks=peaks, stim_onset=stim_onset, plateaus=plateaus,
+                task_onset=task_onset, task_offset=task_offset
+            )
+
+        row.update({
+            **{name: parameters.get(name, np.nan) for name in PEAK_PARAMETERS},
+            'n_stimuli': len(stim_onset),
+            'n_peaks': len(peaks),
+            **ioi_statistics(peaks, fs=fs),
+            'status': 'ok',
+            'error': '',
+        })
+
+    except Exception as error:
+        row.update({'status': 'error', 'error': f'{type(error).__name__}: {error}'})
+
+    return row
+
+
+def run_batch(
+    data_dir='data',
+    participants=None,
+    tasks=None,
+    max_workers=None,
+    fs=5000,
+    custom_params_path=None,
+    results_dir=None,
+    output_path=None,
+    use_cache=False
+):
+    """
+    Run the analysis pipeline on all the trials of the data directory.
+
+    Trials are processed in parallel in a pool of processes.
+
+    Parameters
+    ----------
+    data_dir : str or Path, optional
+        Directory containing one subdirectory per participant. Default is 'data'.
+    participants : list, optional
+        Participants to include. If None, all participants are included. Default is None.
+    tasks : list, optional
+        Tasks to include, as written in the file names (e.g., 'Pref', 'synch'). If None, all tasks are included.
+        Default is None.
+    max_workers : int, optional
+        Number of processes. See `map_trials`. Default is None.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    custom_params_path : str or Path, optional
+        Path to the csv file containing custom peak detection parameters. See `load_custom_parameters`. Default is
+        None.
+    results_dir : str or Path, optional
+        Directory in which the detected peaks, stimulus onsets and plateaus of each trial are saved. Default is None.
+    output_path : str or Path, optional
+        Path of the csv file in which the results are written. If None, the results are not written. Default is None.
+    use_cache : bool, optional
+        Whether to load the preprocessed recordings from the cache. Default is False.
+
+    Returns
+    -------
+    out : pandas.DataFrame
+        One row of results per trial, as returned by `process_trial`.
+    """
+    trials = discover_trials(data_dir, participants=participants, tasks=tasks)
+    return run_trials(
+        trials, max_workers=max_workers, fs=fs, custom_params_path=custom_params_path, results_dir=results_dir,
+        output_path=output_path, use_cache=use_cache
+    )
+
+
+def run_trials(trials, max_workers=None, output_path=None, **kwargs):
+    """
+    Run the analysis pipeline on a list of trials.
+
+    Parameters
+    ----------
+    trials : list
+        Trial descriptions, as returned by `discover_trials`.
+    max_workers : int, optional
+        Number of processes. See `map_trials`. Default is None.
+    output_path : str or Path, optional
+        Path of the csv file in which the results are written. If None, the results are not written. Default is None.
+    **kwargs
+        Keyword arguments passed to `process_trial`.
+
+    Returns
+    -------
+    out : pandas.DataFrame
+        One row of results per trial, as returned by `process_trial`.
+    """
+    results = pd.DataFrame(map_trials(process_trial, trials, max_workers=max_workers, **kwargs))
+
+    if output_path is not None:
+        results.to_csv(output_path, index=False)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the analysis pipeline on all the trials of the data directory.")
+    parser.add_argument('data_dir', nargs='?', default='data', help="Directory containing one folder per participant.")
+    parser.add_argument('--participants', nargs='+', default=None, help="Participants to include.")
+    parser.add_argument('--tasks', nargs='+', default=None, choices=list(TASKS), help="Tasks to include.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of processes.")
+    parser.add_argument('--fs', type=int, default=5000, help="Sampling frequency in Hz.")
+    parser.add_argument('--custom-params', default=None,
+                        help="Csv file with custom peak detection parameters.")
+    parser.add_argument('--results-dir', default=None, help="Directory in which the detected peaks are saved.")
+    parser.add_argument('--output', default='results.csv', help="Csv file in which the results are written.")
+    parser.add_argument('--cache', action='store_true', help="Load the preprocessed recordings from the cache.")
+    args = parser.parse_args(argv)
+
+    results = run_batch(
+        args.data_dir, participants=args.participants, tasks=args.tasks, max_workers=args.workers, fs=args.fs,
+        custom_params_path=args.custom_params, results_dir=args.results_dir, output_path=args.output,
+        use_cache=args.cache
+    )
+
+    n_errors = int(np.sum(results['status'] == 'error')) if len(results) > 0 else 0
+    print(f"{len(results)} trials processed, {n_errors} errors. Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,356 @@
+"""
+BENCHMARK OF THE ANALYSIS STAGES
+================================
+This script measures the wall time and the peak memory of the stages of the analysis (`load_and_preprocess`,
+`moving_average`, `detect_stimuli` and `identify_peak_flexion`) on synthetic recordings that mimic the acquisition (see
+`synthetic_recording`), and compares them with a baseline saved in a JSON file, so that a change that makes a stage
+slower or more memory-hungry is noticed.
+
+The recordings last from 30 s to 30 min, with stimulus frequencies from 0.9 to 7 Hz. The peaks are detected with the
+validation of the movement between peaks (stimulus frequency below `frequency_threshold`) and with the direct detection
+(above it).
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Functions
+---------
+measure(function, *args, repeat=5, **kwargs)
+    Measure the wall time and the peak memory of a function call.
+benchmark_recording(duration, frequency, fs=5000, repeat=5, work_dir=None, seed=0)
+    Measure the analysis stages on one synthetic recording.
+run_benchmarks(durations=DURATIONS, frequencies=FREQUENCIES, fs=5000, repeat=5, work_dir=None, seed=0)
+    Measure the analysis stages on synthetic recordings of each duration and stimulus frequency.
+save_baseline(results, file_path)
+    Save benchmark results as a baseline in a JSON file.
+load_baseline(file_path)
+    Load the benchmark results of a baseline.
+compare_to_baseline(results, baseline, max_regression=20, min_time=0.005, min_memory=1)
+    Compare benchmark results with a baseline and flag the regressions.
+
+Usage
+-----
+Save a baseline, then check a change against it (the exit code is 1 if a stage regressed or if a measurement of the
+run is missing from the baseline):
+    python -m src.benchmark --save benchmarks/baseline.json
+    python -m src.benchmark --baseline benchmarks/baseline.json --max-regression 20
+
+Notes
+-----
+The wall time is the best of `repeat` calls, and the peak memory is measured with `tracemalloc` during an additional
+call. The CSV files of the recordings are written once in `work_dir` and reused, as a 30-min recording takes about
+400 MB and more than a minute to write. Baselines are only comparable on the same computer.
+"""
+
+
+import argparse
+from datetime import datetime
+import json
+import platform
+from pathlib import Path
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+import scipy
+
+from src.peak_detection import identify_peak_flexion
+from src.stimulus_analysis import detect_stimuli, load_and_preprocess, write_acquisition_csv
+from src.synthetic import synthetic_recording
+from src.utils import moving_average
+
+
+# Durations of the recordings in s and stimulus frequencies in Hz
+DURATIONS = (30, 300, 1800)
+FREQUENCIES = (0.9, 2.5, 7)
+
+# Frequency thresholds of the peak detection: validation of the movement between peaks, or direct detection
+BRANCHES = {'validation': 7.3, 'direct': 0}
+
+# Columns identifying a measurement
+KEY = ['stage', 'branch', 'duration', 'frequency']
+
+
+def measure(function, *args, repeat=5, **kwargs):
+    """
+    Measure the wall time and the peak memory of a function call.
+
+    Parameters
+    ----------
+    function : callable
+        Function to measure.
+    *args, **kwargs
+        Arguments of the function.
+    repeat : int, optional
+        Number of timed calls. Default is 5.
+
+    Returns
+    -------
+    time : float
+        Shortest wall time of the calls in s.
+    memory : float
+        Peak memory allocated during the call in MB.
+    output : object
+        Output of the function.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = function(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return min(times), peak / 2**20, output
+
+
+def benchmark_recording(duration, frequency, fs=5000, repeat=5, work_dir=None, seed=0):
+    """
+    Measure the analysis stages on one synthetic recording.
+
+    Parameters
+    ----------
+    duration : float
+        Duration of the recording in s.
+    frequency : float
+        Stimulus frequency in Hz.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    repeat : int, optional
+        Number of timed calls of each stage. Default is 5.
+    work_dir : str or Path, optional
+        Directory of the CSV files of the recordings. If None, a temporary directory is used and removed. Default is
+        None.
+    seed : int, optional
+        Seed of the synthetic recording. Default is 0.
+
+    Returns
+    -------
+    out : list of dict
+        One measurement per stage, with the stage ('stage'), the branch of the peak detection ('branch', None for the
+        other stages), the duration and the stimulus frequency of the recording, the wall time in s ('time') and the
+        peak memory in MB ('memory').
+    """
+    if work_dir is None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            return benchmark_recording(duration, frequency, fs=fs, repeat=repeat, work_dir=tmp_dir, seed=seed)
+
+    recording = synthetic_recording(duration, frequency, fs=fs, seed=seed)
+    file_path = Path(work_dir) / f"benchmark_{duration:g}s_{frequency:g}Hz_{seed}.csv"
+    if not file_path.exists():
+        write_acquisition_csv(file_path, recording['gonio'], recording['sound'], fs=fs)
+
+    n_stimuli = len(recording['stim_onset'])
+    stages = {}
+    stages['load_and_preprocess'] = measure(load_and_preprocess, file_path, fs=fs, repeat=repeat)
+    _, movement, sound = stages['load_and_preprocess'][2]
+
+    # Baseline of the movement over 3 stimulus periods, as in `extract_and_normalize_movement`
+    stages['moving_average'] = measure(moving_average, movement, int(3 / frequency * fs), repeat=repeat)
+    stages['detect_stimuli'] = measure(
+        detect_stimuli, sound, task='synch', fs=fs, n_stimuli_first_plateau=n_stimuli - 1, repeat=repeat
+    )
+    stim_onset, _, plateaus, _, _, _ = stages['detect_stimuli'][2]
+
+    rows = [
+        {'stage': stage, 'branch': None, 'duration': duration, 'frequency': frequency, 'time': t, 'memory': memory}
+        for stage, (t, memory, _) in stages.items()
+    ]
+    for branch, frequency_threshold in BRANCHES.items():
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            t, memory, _ = measure(
+                identify_peak_flexion, movement, stim_onset, plateaus, 'synch', fs=fs,
+                frequency_threshold=frequency_threshold, repeat=repeat
+            )
+        rows.append({
+            'stage': 'identify_peak_flexion', 'branch': branch, 'duration': duration, 'frequency': frequency,
+            'time': t, 'memory': memory
+        })
+
+    return rows
+
+
+def run_benchmarks(durations=DURATIONS, frequencies=FREQUENCIES, fs=5000, repeat=5, work_dir=None, seed=0):
+    """
+    Measure the analysis stages on synthetic recordings of each duration and stimulus frequency.
+
+    Parameters
+    ----------
+    durations : list, optional
+        Durations of the recordings in s. Default is `DURATIONS`.
+    frequencies : list, optional
+        Stimulus frequencies in Hz. Default is `FREQUENCIES`.
+    fs, repeat, work_dir, seed
+        See `benchmark_recording`.
+
+    Returns
+    -------
+    results : DataFrame
+        One row per measurement. See `benchmark_recording`.
+    """
+    rows = []
+    for duration in durations:
+        for frequency in frequencies:
+            rows += benchmark_recording(duration, frequency, fs=fs, repeat=repeat, work_dir=work_dir, seed=seed)
+
+    return pd.DataFrame(rows)
+
+
+def save_baseline(results, file_path):
+    """
+    Save benchmark results as a baseline in a JSON file.
+
+    The file also describes the computer and the versions of Python, NumPy, SciPy and pandas.
+
+    Parameters
+    ----------
+    results : DataFrame
+        Benchmark results, as returned by `run_benchmarks`.
+    file_path : str or Path
+        Path to the JSON file.
+    """
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+
+    baseline = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'machine': platform.platform(),
+        'processor': platform.processor(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'pandas': pd.__version__,
+        'results': results.astype(object).where(results.notna(), None).to_dict(orient='records'),
+    }
+    file_path.write_text(json.dumps(baseline, indent=2))
+
+
+def load_baseline(file_path):
+    """
+    Load the benchmark results of a baseline.
+
+    Parameters
+    ----------
+    file_path : str or Path
+        Path to the JSON file, written by `save_baseline`.
+
+    Returns
+    -------
+    results : DataFrame
+        Benchmark results of the baseline.
+    """
+    baseline = json.loads(Path(file_path).read_text())
+    return pd.DataFrame(baseline['results'])
+
+
+def compare_to_baseline(results, baseline, max_regression=20, min_time=0.005, min_memory=1):
+    """
+    Compare benchmark results with a baseline and flag the regressions.
+
+    A stage regresses when its wall time or its peak memory exceeds that of the baseline by more than `max_regression`
+    percent. Differences smaller than `min_time` and `min_memory` are ignored, as the measurements of the fastest stages
+    are noisy.
+
+    Parameters
+    ----------
+    results : DataFrame
+        Benchmark results, as returned by `run_benchmarks`.
+    baseline : DataFrame
+        Benchmark results of the baseline, as returned by `load_baseline`.
+    max_regression : float, optional
+        Largest accepted increase in percent. Default is 20.
+    min_time : float, optional
+        Smallest increase of the wall time in s considered as a regression. Default is 0.005.
+    min_memory : float, optional
+        Smallest increase of the peak memory in MB considered as a regression. Default is 1.
+
+    Returns
+    -------
+    comparison : DataFrame
+        All the measurements of the results, with the baseline values ('time_baseline', 'memory_baseline'), the changes
+        in percent ('time_change', 'memory_change'), whether the measurement is absent from the baseline ('missing')
+        and whether the stage regressed ('regressed').
+    """
+    # Missing branches are compared as strings, as NaN never matches
+    results = results.assign(branch=results['branch'].fillna(''))
+    baseline = baseline.assign(branch=baseline['branch'].fillna(''))
+
+    comparison = results.merge(baseline[KEY + ['time', 'memory']], on=KEY, how='left', suffixes=('', '_baseline'))
+    comparison['missing'] = comparison['time_baseline'].isna()
+    limit = 1 + max_regression / 100
+    comparison['time_change'] = (comparison['time'] / comparison['time_baseline'] - 1) * 100
+    comparison['memory_change'] = (comparison['memory'] / comparison['memory_baseline'] - 1) * 100
+    comparison['regressed'] = (
+        (comparison['time'] > comparison['time_baseline'] * limit) &
+        (comparison['time'] - comparison['time_baseline'] > min_time)
+    ) | (
+        (comparison['memory'] > comparison['memory_baseline'] * limit) &
+        (comparison['memory'] - comparison['memory_baseline'] > min_memory)
+    )
+
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analysis stages on synthetic recordings.")
+    parser.add_argument('--durations', nargs='+', type=float, default=list(DURATIONS),
+                        help="Durations of the recordings in s.")
+    parser.add_argument('--frequencies', nargs='+', type=float, default=list(FREQUENCIES),
+                        help="Stimulus frequencies in Hz.")
+    parser.add_argument('--repeat', type=int, default=5, help="Number of timed calls of each stage.")
+    parser.add_argument('--work-dir', default=None, help="Directory in which the CSV files are kept.")
+    parser.add_argument('--fs', type=int, default=5000, help="Sampling frequency in Hz.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic recordings.")
+    parser.add_argument('--save', default=None, help="JSON file in which the results are saved as a baseline.")
+    parser.add_argument('--baseline', default=None, help="JSON file of the baseline to compare with.")
+    parser.add_argument('--max-regression', type=float, default=20, help="Largest accepted increase in percent.")
+    args = parser.parse_args(argv)
+
+    if args.work_dir is not None:
+        Path(args.work_dir).mkdir(parents=True, exist_ok=True)
+    results = run_benchmarks(
+        args.durations, args.frequencies, fs=args.fs, repeat=args.repeat, work_dir=args.work_dir, seed=args.seed
+    )
+
+    with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.precision', 4):
+        print(results.to_string(index=False))
+
+    if args.save is not None:
+        save_baseline(results, args.save)
+        print(f"Baseline saved to {args.save}")
+
+    if args.baseline is not None:
+        comparison = compare_to_baseline(results, load_baseline(args.baseline), max_regression=args.max_regression)
+        regressions = comparison[comparison['regressed']]
+        if len(regressions):
+            columns = KEY + ['time', 'time_baseline', 'time_change', 'memory', 'memory_baseline', 'memory_change']
+            print(regressions[columns].to_string(index=False))
+            raise SystemExit(f"{len(regressions)} stages regressed by more than {args.max_regression:g}%.")
+
+        # A measurement absent from the baseline cannot be checked, e.g. another grid or a renamed stage
+        missing = comparison[comparison['missing']]
+        if len(missing) or not len(comparison):
+            print(missing[KEY].to_string(index=False))
+            raise SystemExit(
+                f"{len(missing)} of {len(comparison)} measurements are missing from the baseline {args.baseline}; "
+                f"run the same grid as the baseline or save a new one."
+            )
+        print(f"No stage regressed by more than {args.max_regression:g}% ({len(comparison)} measurements compared).")
+
+
+if __name__ == '__main__':
+    main()
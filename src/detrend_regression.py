@@ -0,0 +1,177 @@
+"""
+REGRESSION COMPARISON OF THE DETRENDING MODES
+=============================================
+This script checks that the recording-level detrending of `identify_peak_flexion` (detrend='recording') detects the
+same peaks as the reference per-plateau detrending (detrend='plateau'). The trials are synthesized from the schedules
+of synthetic participants (see `synthetic_trial`), low-pass filtered as in `load_and_preprocess`, and the stimuli are
+detected with `detect_stimuli`, so that the comparison covers the plateaus of every task. The time taken by each mode
+is measured as well.
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Functions
+---------
+regression_trial(movement, stim_onset, plateaus, task, fs=5000, **detection)
+    Detect the peaks of a trial with both detrending modes and compare them.
+detrend_regression(participants=(1, 2), fs=5000, seed=0, cutoff=20, order=4, **detection)
+    Compare the detrending modes on all the 'adapt', 'conti' and 'synch' trials of synthetic participants.
+
+Usage
+-----
+The exit code is 1 if the modes disagree on any trial:
+    python -m src.detrend_regression --participants 1 2 3
+"""
+
+
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy.signal import butter, filtfilt
+
+from src.peak_detection import detrend_movement, extract_and_normalize_movement, identify_peak_flexion
+from src.peak_detection import normalize_movement, plateau_segments
+from src.schedule import build_session
+from src.stimulus_analysis import detect_stimuli
+from src.synthetic_cohort import participant_traits, synthetic_trial
+
+
+# Tasks whose trials are compared; 'SMT' trials have a single plateau, so both modes do the same work
+TASKS = ('adapt', 'conti', 'synch')
+
+
+def regression_trial(movement, stim_onset, plateaus, task, fs=5000, **detection):
+    """
+    Detect the peaks of a trial with both detrending modes and compare them.
+
+    Parameters
+    ----------
+    movement : array
+        The movement signal (e.g., filtered goniometer data).
+    stim_onset : array
+        Indices of stimulus onset times.
+    plateaus : array
+        Plateau start and end indices as (start, end) pairs.
+    task : str
+        Task identifier.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    **detection
+        Peak detection parameters passed to `identify_peak_flexion`.
+
+    Returns
+    -------
+    out : dict
+        Number of peaks of each mode ('n_recording', 'n_plateau'), number of peaks found by one mode only ('n_moved'),
+        whether the peaks are identical ('identical'), largest difference between the normalized movements of the
+        plateaus ('max_normalized_error') and wall time of each mode in s ('time_recording', 'time_plateau').
+    """
+    peaks = {}
+    times = {}
+    for mode in ('recording', 'plateau'):
+        start = time.perf_counter()
+        peaks[mode] = identify_peak_flexion(movement, stim_onset, plateaus, task, fs=fs, detrend=mode, **detection)
+        times[mode] = time.perf_counter() - start
+
+    segments = plateau_segments(stim_onset, plateaus, task, fs=fs)
+    max_normalized_error = max(
+        np.max(np.abs(
+            normalize_movement(centered) - extract_and_normalize_movement(movement, start, end, stim_freq, fs=fs)
+        ))
+        for (start, end, stim_freq), centered in zip(segments, detrend_movement(movement, segments, fs=fs))
+    )
+
+    return {
+        'n_recording': len(peaks['recording']),
+        'n_plateau': len(peaks['plateau']),
+        'n_moved': len(np.setxor1d(peaks['recording'], peaks['plateau'])),
+        'identical': np.array_equal(peaks['recording'], peaks['plateau']),
+        'max_normalized_error': max_normalized_error,
+        'time_recording': times['recording'],
+        'time_plateau': times['plateau'],
+    }
+
+
+def detrend_regression(participants=(1, 2), fs=5000, seed=0, cutoff=20, order=4, **detection):
+    """
+    Compare the detrending modes on all the 'adapt', 'conti' and 'synch' trials of synthetic participants.
+
+    Parameters
+    ----------
+    participants : list, optional
+        Numbers of the synthetic participants. Default is (1, 2).
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    seed : int, optional
+        Seed of the synthetic participants. Default is 0.
+    cutoff : float, optional
+        Cutoff frequency of the low-pass filter in Hz. Default is 20.
+    order : int, optional
+        Order of the low-pass filter. Default is 4.
+    **detection
+        Peak detection parameters passed to `identify_peak_flexion`.
+
+    Returns
+    -------
+    results : DataFrame
+        One row per trial, with the participant, the task and the condition of the trial. See `regression_trial`.
+    """
+    b, a = butter(order, cutoff / (fs / 2), btype='low')
+    rows = []
+
+    for participant_number in participants:
+        rng = np.random.default_rng([seed, participant_number])
+        traits = participant_traits(rng)
+        session = build_session(participant_number, traits['smt'], fs=fs)
+
+        for task in TASKS:
+            for schedule in session[task]:
+                trial = synthetic_trial(schedule, traits, fs=fs, seed=rng.integers(2**32))
+                movement = filtfilt(b, a, trial['gonio'])
+
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    stim_onset, _, plateaus, _, _, _ = detect_stimuli(trial['sound'], task=task, fs=fs)
+                    result = regression_trial(movement, stim_onset, plateaus, task, fs=fs, **detection)
+
+                rows.append({
+                    'participant': participant_number, 'task': task, 'condition': schedule['condition'],
+                    **result
+                })
+
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the detrending modes of the peak detection.")
+    parser.add_argument('--participants', nargs='+', type=int, default=[1, 2],
+                        help="Numbers of the synthetic participants.")
+    parser.add_argument('--fs', type=int, default=5000, help="Sampling frequency in Hz.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic participants.")
+    args = parser.parse_args(argv)
+
+    results = detrend_regression(args.participants, fs=args.fs, seed=args.seed)
+
+    with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.precision', 4):
+        print(results.to_string(index=False))
+
+    different = results[~results['identical']]
+    if len(different):
+        raise SystemExit(f"The detrending modes disagree on {len(different)} of {len(results)} trials.")
+    print(
+        f"The detrending modes agree on all {len(results)} trials "
+        f"({results['time_recording'].sum():.2f} s with 'recording', {results['time_plateau'].sum():.2f} s with "
+        f"'plateau')."
+    )
+
+
+if __name__ == '__main__':
+    main()
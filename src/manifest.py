@@ -0,0 +1,240 @@
+"""
+INCREMENTAL REPROCESSING OF THE RECORDINGS
+==========================================
+This script keeps a manifest of the processed trials, so that only the trials whose inputs changed are processed
+again by the batch pipeline (see `batch_processing`).
+
+For each trial, the manifest records the hash of the input file, the peak detection parameters, the sampling frequency,
+and the version of the analysis (`ANALYSIS_VERSION`), together with the result row of the trial. A trial is processed again
+when one of them changed, when its previous processing failed, or when its saved results are missing.
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Functions
+---------
+load_manifest(results_dir)
+    Load the manifest of a results directory.
+save_manifest(manifest, results_dir)
+    Save the manifest of a results directory.
+reprocess(data_dir='data', results_dir='results', force=False, participants=None, tasks=None, max_workers=None, fs=5000, custom_params_path=None)
+    Process the trials whose inputs changed since the last run.
+
+Usage
+-----
+    python -m src.manifest data results --workers 4
+    python -m src.manifest data results --force
+
+Notes
+-----
+`ANALYSIS_VERSION` must be increased when a change to the analysis functions (e.g., `identify_peak_flexion`) changes
+the results of the trials, so that all the trials are processed again. Changes that do not affect the results (e.g.,
+comments, plots, speed) keep the version, so they do not trigger any processing.
+"""
+
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.batch_processing import discover_trials, run_trials, trial_parameters
+from src.preprocessing_cache import file_hash
+
+MANIFEST_NAME = 'manifest.json'
+RESULTS_NAME = 'results.csv'
+
+# Version of the analysis, to increase when a change to the pipeline changes the results of the trials
+ANALYSIS_VERSION = '1'
+
+
+def load_manifest(results_dir):
+    """
+    Load the manifest of a results directory.
+
+    Parameters
+    ----------
+    results_dir : str or Path
+        Directory of the results.
+
+    Returns
+    -------
+    out : dict
+        Manifest entries indexed by file name. Empty if the directory has no manifest.
+    """
+    manifest_path = Path(results_dir) / MANIFEST_NAME
+    if not manifest_path.is_file():
+        return {}
+    with open(manifest_path, 'r') as file:
+        return json.load(file)
+
+
+def save_manifest(manifest, results_dir):
+    """
+    Save the manifest of a results directory.
+
+    The manifest is written to a temporary file first, so that an interrupted write does not corrupt it.
+
+    Parameters
+    ----------
+    manifest : dict
+        Manifest entries indexed by file name.
+    results_dir : str or Path
+        Directory of the results.
+    """
+    manifest_path = Path(results_dir) / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix('.tmp')
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file, indent=2, default=_to_json)
+    os.replace(tmp_path, manifest_path)
+
+
+def _to_json(value):
+    # NumPy scalars in the result rows
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def reprocess(
+    data_dir='data',
+    results_dir='results',
+    force=False,
+    participants=None,
+    tasks=None,
+    max_workers=None,
+    fs=5000,
+    custom_params_path=None
+):
+    """
+    Process the trials whose inputs changed since the last run.
+
+    The results of all the trials (processed or skipped) are written to `results.csv` in the results directory, and the
+    detected peaks of the processed trials are saved as `<file name>.npz`.
+
+    Parameters
+    ----------
+    data_dir : str or Path, optional
+        Directory containing one subdirectory per participant. Default is 'data'.
+    results_dir : str or Path, optional
+        Directory of the results and of the manifest. Default is 'results'.
+    force : bool, optional
+        Whether to process all the trials, whether their inputs changed or not. Default is False.
+    participants : list, optional
+        Participants to include. If None, all participants are included. Default is None.
+    tasks : list, optional
+        Tasks to include, as written in the file names (e.g., 'Pref', 'synch'). If None, all tasks are included.
+        Default is None.
+    max_workers : int, optional
+        Number of processes. See `run_trials`. Default is None.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    custom_params_path : str or Path, optional
+        Path to the csv file containing custom peak detection parameters. See `load_custom_parameters`. Default is
+        None.
+
+    Returns
+    -------
+    results : pandas.DataFrame
+        One row of results per trial.
+    report : dict
+        Names of the processed and skipped trials, with the reason why each trial was processed.
+    """
+    results_dir = Path(results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = load_manifest(results_dir)
+
+    to_process, inputs, report = [], {}, {'processed': {}, 'skipped': []}
+    for trial in discover_trials(data_dir, participants=participants, tasks=tasks):
+        file_path = Path(trial['file_path'])
+        file_name = file_path.stem
+        entry = manifest.get(file_name)
+
+        # The hash is only computed again when the size or modification time of the file changed
+        stat = file_path.stat()
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            input_hash = entry['file_hash']
+        else:
+            input_hash = file_hash(file_path)
+
+        inputs[file_name] = {
+            'file_hash': input_hash,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'parameters': trial_parameters(file_name, custom_params_path),
+            'fs': fs,
+            'version': ANALYSIS_VERSION,
+        }
+
+        if force:
+            reason = 'forced'
+        elif entry is None:
+            reason = 'new trial'
+        elif entry['file_hash'] != input_hash:
+            reason = 'input file changed'
+        elif entry['parameters'] != inputs[file_name]['parameters'] or entry['fs'] != fs:
+            reason = 'parameters changed'
+        elif entry['version'] != ANALYSIS_VERSION:
+            reason = 'analysis version changed'
+        elif entry['row'].get('status') != 'ok':
+            reason = 'previous processing failed'
+        elif not (results_dir / f'{file_name}.npz').is_file():
+            reason = 'results missing'
+        else:
+            # Keep the size and modification time up to date to avoid computing the hash again
+            entry.update(size=stat.st_size, mtime=stat.st_mtime)
+            report['skipped'].append(file_name)
+            continue
+
+        report['processed'][file_name] = reason
+        to_process.append(trial)
+
+    # Process the trials whose inputs changed and update their manifest entries
+    if len(to_process) > 0:
+        rows = run_trials(
+            to_process, max_workers=max_workers, fs=fs, custom_params_path=custom_params_path, results_dir=results_dir
+        ).to_dict('records')
+        for row in rows:
+            manifest[row['file_name']] = {**inputs[row['file_name']], 'row': row}
+    save_manifest(manifest, results_dir)
+
+    results = pd.DataFrame([manifest[file_name]['row'] for file_name in inputs])
+    results.to_csv(results_dir / RESULTS_NAME, index=False)
+
+    return results, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process the trials whose inputs changed since the last run.")
+    parser.add_argument('data_dir', nargs='?', default='data', help="Directory containing one folder per participant.")
+    parser.add_argument('results_dir', nargs='?', default='results', help="Directory of the results and manifest.")
+    parser.add_argument('--force', action='store_true', help="Process all the trials.")
+    parser.add_argument('--participants', nargs='+', default=None, help="Participants to include.")
+    parser.add_argument('--tasks', nargs='+', default=None, help="Tasks to include.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of processes.")
+    parser.add_argument('--fs', type=int, default=5000, help="Sampling frequency in Hz.")
+    parser.add_argument('--custom-params', default=None,
+                        help="Csv file with custom peak detection parameters.")
+    args = parser.parse_args(argv)
+
+    _, report = reprocess(
+        args.data_dir, args.results_dir, force=args.force, participants=args.participants, tasks=args.tasks,
+        max_workers=args.workers, fs=args.fs, custom_params_path=args.custom_params
+    )
+
+    for file_name, reason in report['processed'].items():
+        print(f"Processed {file_name} ({reason})")
+    print(f"{len(report['processed'])} trials processed, {len(report['skipped'])} trials skipped (unchanged).")
+
+
+if __name__ == '__main__':
+    main()
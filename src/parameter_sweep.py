@@ -0,0 +1,305 @@
+"""
+SWEEP OF THE PEAK DETECTION PARAMETERS
+======================================
+This script evaluates `identify_peak_flexion` on a grid of peak detection parameters (`peak_threshold`,
+`min_velocity_sum` and `frequency_threshold`), for one or several recordings, to help choose the custom parameters of a
+difficult trial.
+
+The work that does not depend on the parameters is done once per recording: preprocessing, stimulus detection,
+detrending and normalization of each plateau, and cumulative movement indexes. Peaks are detected once per plateau at
+the lowest `peak_threshold`, and the candidates of the higher thresholds are obtained by filtering them on their height.
+Each combination of parameters then only validates the candidate peaks with `plateau_peaks`, the per-plateau detection
+of `identify_peak_flexion`, so the sweep gives the same peaks as the pipeline.
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Functions
+---------
+parameter_grid(peak_threshold=50, min_velocity_sum=60, frequency_threshold=7.3)
+    Build the combinations of peak detection parameters.
+sweep_parameters(movement, stim_onset, plateaus, task, fs=5000, peak_threshold=50, min_velocity_sum=60, frequency_threshold=7.3)
+    Detect the peaks of one recording for each combination of peak detection parameters.
+sweep_trial(trial, fs=5000, use_cache=False, **grid)
+    Run the parameter sweep on one trial file.
+sweep_trials(trials, max_workers=None, output_path=None, **kwargs)
+    Run the parameter sweep on a list of trial files.
+
+Usage
+-----
+    python -m src.parameter_sweep data --participants P01 --tasks synch --peak-threshold 30 40 50 60 --min-velocity-sum 40 60 80
+
+Notes
+-----
+The agreement with the stimulus count (`count_error`) is only meaningful for the trials where the participant moves
+with every stimulus (e.g., synchronization plateaus).
+"""
+
+
+import argparse
+import itertools
+from pathlib import Path
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+
+from src.batch_processing import TASKS, discover_trials, ioi_statistics, load_trial, map_trials
+from src.peak_detection import (
+    CUSTOM_PARAMETERS, cumulative_movement, detrend_movement, movement_to_plateau_end, normalize_movement,
+    plateau_peaks, plateau_segments
+)
+from src.stimulus_analysis import detect_stimuli
+
+
+def parameter_grid(peak_threshold=50, min_velocity_sum=60, frequency_threshold=7.3):
+    """
+    Build the combinations of peak detection parameters.
+
+    Parameters
+    ----------
+    peak_threshold : float or array_like, optional
+        Value(s) of the minimum height for peaks in the normalized movement signal. Default is 50.
+    min_velocity_sum : float or array_like, optional
+        Value(s) of the minimum sum of absolute velocity between peaks. Default is 60.
+    frequency_threshold : float or array_like, optional
+        Value(s) of the frequency threshold for direct peak detection in Hz. Default is 7.3.
+
+    Returns
+    -------
+    out : pandas.DataFrame
+        One row per combination of parameters.
+    """
+    values = [np.atleast_1d(np.asarray(value, dtype=float)) for value in (
+        peak_threshold, min_velocity_sum, frequency_threshold
+    )]
+    return pd.DataFrame(list(itertools.product(*values)), columns=list(CUSTOM_PARAMETERS))
+
+
+def sweep_parameters(
+    movement,
+    stim_onset,
+    plateaus,
+    task,
+    fs=5000,
+    peak_threshold=50,
+    min_velocity_sum=60,
+    frequency_threshold=7.3
+):
+    """
+    Detect the peaks of one recording for each combination of peak detection parameters.
+
+    The detected peaks are the same as those of `identify_peak_flexion` with the default detrending.
+
+    Parameters
+    ----------
+    movement : array
+        The movement signal (e.g., filtered goniometer data).
+    stim_onset : array
+        Indices of stimulus onset times.
+    plateaus : array
+        Plateau start and end indices as (start, end) pairs.
+    task : str
+        Task identifier.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    peak_threshold : float or array_like, optional
+        Value(s) of the minimum height for peaks in the normalized movement signal. Default is 50.
+    min_velocity_sum : float or array_like, optional
+        Value(s) of the minimum sum of absolute velocity between peaks. Default is 60.
+    frequency_threshold : float or array_like, optional
+        Value(s) of the frequency threshold for direct peak detection in Hz. Default is 7.3.
+
+    Returns
+    -------
+    out : pandas.DataFrame
+        One row per combination of parameters, with the parameters, the number of stimuli and peaks, the difference
+        between them, the mean, standard deviation and coefficient of variation of the IOIs, and the status of the
+        detection ('ok' or the reason why no peaks were detected).
+    """
+    grid = parameter_grid(peak_threshold, min_velocity_sum, frequency_threshold)
+    movement = np.asarray(movement)
+
+    # Work shared by all the combinations: detrending, normalization and cumulative movement index of each plateau
+    segments = plateau_segments(stim_onset, plateaus, task, fs=fs)
+    centered_segments = detrend_movement(movement, segments, fs=fs)
+    lowest_threshold = grid['peak_threshold'].min()
+
+    shared = []
+    for (plateau_start, plateau_end, stim_freq), centered in zip(segments, centered_segments):
+        plateau_mov = normalize_movement(centered)
+        candidates, properties = find_peaks(plateau_mov, height=lowest_threshold)
+        shared.append({
+            'start': plateau_start,
+            'end': plateau_end,
+            'stim_freq': stim_freq,
+            'mov': plateau_mov,
+            'cum_movement': cumulative_movement(plateau_mov),
+            'candidates': candidates,
+            'heights': properties['peak_heights'],
+            'direct_peaks': None,
+        })
+
+    # Cumulative movement index between the last peak of a plateau and the end of the next one, indexed by
+    # (plateau index, last peak index), since several combinations share the same last peak
+    movement_to_end = {}
+
+    rows = []
+    for parameters in grid.to_dict('records'):
+        try:
+            with warnings.catch_warnings():
+                # Expected for the combinations whose thresholds are too high for the movement
+                warnings.filterwarnings('ignore', message='No candidate peak reaches the minimal movement')
+                peaks = _detect_peaks(movement, shared, movement_to_end, fs=fs, **parameters)
+            status = 'ok' if len(peaks) > 0 else 'no peaks'
+        except IndexError:
+            # A plateau of the low frequency branch has no peak above the threshold
+            peaks, status = np.array([], dtype=int), 'no candidate peaks'
+
+        rows.append({
+            **parameters,
+            'n_stimuli': len(stim_onset),
+            'n_peaks': len(peaks),
+            'count_error': len(peaks) - len(stim_onset),
+            **ioi_statistics(peaks, fs=fs),
+            'status': status,
+        })
+
+    return pd.DataFrame(rows)
+
+
+def _detect_peaks(movement, shared, movement_to_end, fs, peak_threshold, min_velocity_sum, frequency_threshold):
+    # Same steps as identify_peak_flexion, on the precomputed plateaus
+    detected_peaks = []
+    last_peak_idx = 0
+
+    for plateau_idx, plateau in enumerate(shared):
+        detection = dict(
+            plateau_idx=plateau_idx, last_peak_idx=last_peak_idx, fs=fs, peak_threshold=peak_threshold,
+            min_velocity_sum=min_velocity_sum, frequency_threshold=frequency_threshold
+        )
+
+        if plateau['stim_freq'] >= frequency_threshold:
+            # Direct detection does not depend on the other parameters
+            if plateau['direct_peaks'] is None:
+                plateau['direct_peaks'], _ = plateau_peaks(
+                    movement, plateau['mov'], plateau['start'], plateau['end'], plateau['stim_freq'], **detection
+                )
+            detected_peaks.extend(plateau['direct_peaks'])
+            continue
+
+        to_plateau_end = None
+        if plateau_idx > 0:
+            key = (plateau_idx, last_peak_idx)
+            if key not in movement_to_end:
+                movement_to_end[key] = movement_to_plateau_end(movement, last_peak_idx, plateau['end'])
+            to_plateau_end = movement_to_end[key]
+
+        peaks, last_peak_idx = plateau_peaks(
+            movement, plateau['mov'], plateau['start'], plateau['end'], plateau['stim_freq'],
+            candidates=(plateau['candidates'], plateau['heights']), cum_movement=plateau['cum_movement'],
+            to_plateau_end=to_plateau_end, **detection
+        )
+        detected_peaks.extend(peaks)
+
+    return np.unique(detected_peaks[1:])
+
+
+def sweep_trial(trial, fs=5000, use_cache=False, **grid):
+    """
+    Run the parameter sweep on one trial file.
+
+    Parameters
+    ----------
+    trial : dict
+        Trial description, as returned by `discover_trials`.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    use_cache : bool, optional
+        Whether to load the preprocessed recordings from the cache. See `load_and_preprocess_cached`. Default is False.
+    **grid
+        Values of the peak detection parameters, passed to `sweep_parameters`.
+
+    Returns
+    -------
+    out : pandas.DataFrame
+        One row per combination of parameters, as returned by `sweep_parameters`, with the trial description.
+    """
+    file_path = Path(trial['file_path'])
+    task = TASKS[trial['task']]
+
+    mov, sound = load_trial(file_path, fs=fs, use_cache=use_cache)
+    stim_onset, _, plateaus, _, _, _ = detect_stimuli(sound, task=task, fs=fs)
+
+    results = sweep_parameters(mov, stim_onset, plateaus, task, fs=fs, **grid)
+    results.insert(0, 'file_name', file_path.stem)
+    for column in ('trial', 'task', 'participant'):
+        results.insert(0, column, trial[column])
+
+    return results
+
+
+def sweep_trials(trials, max_workers=None, output_path=None, **kwargs):
+    """
+    Run the parameter sweep on a list of trial files.
+
+    Trials are processed in parallel in a pool of processes.
+
+    Parameters
+    ----------
+    trials : list
+        Trial descriptions, as returned by `discover_trials`.
+    max_workers : int, optional
+        Number of processes. See `map_trials`. Default is None.
+    output_path : str or Path, optional
+        Path of the csv file in which the results are written. If None, the results are not written. Default is None.
+    **kwargs
+        Keyword arguments passed to `sweep_trial`.
+
+    Returns
+    -------
+    out : pandas.DataFrame
+        One row per trial and combination of parameters, as returned by `sweep_trial`.
+    """
+    tables = map_trials(sweep_trial, trials, max_workers=max_workers, **kwargs)
+    results = pd.concat(tables, ignore_index=True) if len(tables) > 0 else pd.DataFrame()
+
+    if output_path is not None:
+        results.to_csv(output_path, index=False)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the peak detection on a grid of parameters.")
+    parser.add_argument('data_dir', nargs='?', default='data', help="Directory containing one folder per participant.")
+    parser.add_argument('--participants', nargs='+', default=None, help="Participants to include.")
+    parser.add_argument('--tasks', nargs='+', default=None, choices=list(TASKS), help="Tasks to include.")
+    parser.add_argument('--peak-threshold', nargs='+', type=float, default=[50], help="Values of peak_threshold.")
+    parser.add_argument('--min-velocity-sum', nargs='+', type=float, default=[60], help="Values of min_velocity_sum.")
+    parser.add_argument('--frequency-threshold', nargs='+', type=float, default=[7.3],
+                        help="Values of frequency_threshold.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of processes.")
+    parser.add_argument('--fs', type=int, default=5000, help="Sampling frequency in Hz.")
+    parser.add_argument('--output', default='sweep.csv', help="Csv file in which the results are written.")
+    parser.add_argument('--cache', action='store_true', help="Load the preprocessed recordings from the cache.")
+    args = parser.parse_args(argv)
+
+    trials = discover_trials(args.data_dir, participants=args.participants, tasks=args.tasks)
+    results = sweep_trials(
+        trials, max_workers=args.workers, output_path=args.output, fs=args.fs, use_cache=args.cache,
+        peak_threshold=args.peak_threshold, min_velocity_sum=args.min_velocity_sum,
+        frequency_threshold=args.frequency_threshold
+    )
+
+    print(f"{len(trials)} trials, {len(results)} combinations evaluated. Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
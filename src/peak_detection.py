@@ -23,18 +23,90 @@ Versions
     Added two functions:
         - get_custom_parameters, which retrieves custom peak detection parameters for a given file name.
         - identify_peaks_with_custom_parameters, which retrieves custom parameters and calls identify_peak_flexion.
+2026-10-18: v1.3.0.
+    Added two functions:
+        - cumulative_movement, which builds a cumulative index of the absolute velocity of a signal.
+        - movement_between, which uses this index to compute the total movement between pairs of indices.
+    identify_peak_flexion
+        - Validated the candidate peaks with the cumulative index instead of summing the velocity for each peak.
+2026-10-18: v1.4.0.
+    Added three functions:
+        - normalize_movement, which normalizes a centered movement between 0 and 100.
+        - plateau_segments, which computes the movement segment and stimulus frequency of each plateau.
+        - detrend_movement, which detrends the whole recording once and returns the centered movement of each segment.
+    identify_peak_flexion
+        - Added the detrend parameter. By default, the movement is detrended once for the whole recording. The previous
+          per-plateau detrending is kept as reference.
+        - Passed the sampling frequency to the movement normalization.
+2026-10-18: v1.5.0.
+    Added three functions:
+        - refine_peaks, which refines peaks detected on a decimated signal to full-rate indices.
+        - identify_peak_flexion_multiresolution, which detects the peaks on a decimated copy of the movement and refines
+          them at full rate.
+        - compare_peaks, which measures the agreement between two sets of detected peaks.
+    get_custom_parameters
+        - Added a parameter for the path of the custom parameters file, and returned None if the file does not exist.
+2026-10-18: v1.6.0.
+    Added two functions:
+        - custom_parameters_path, which resolves the location of the custom parameters file.
+        - load_custom_parameters, which loads the custom parameters table once and reloads it only when the file changes.
+    get_custom_parameters
+        - Looked up the parameters in the loaded table instead of reading the csv file at each call.
+        - Supported participant-level and wildcard rows, overridden by the rows of the file names.
+    identify_peaks_with_custom_parameters
+        - Added a parameter for the path of the custom parameters file.
+2026-10-18: v1.7.0.
+    plot_peak_on_movement
+        - Plotted the movement decimated to the width of the axes, and decimated it again when zooming.
+        - Plotted the stimulus onsets and plateau limits as one collection each instead of one line per onset.
+        - Added parameters for the axes and for showing the figure, and returned the axes.
+2026-10-18: v1.8.0.
+    Added two functions:
+        - movement_to_plateau_end, which normalizes the movement between the last peak of the previous plateau and the
+          end of a plateau.
+        - plateau_peaks, which detects and validates the peaks of one plateau. It is shared by identify_peak_flexion,
+          identify_peak_flexion_multiresolution and sweep_parameters.
+2026-10-18: v1.8.1.
+    refine_peaks
+        - Searched the maximum of the movement centered with the exact full-rate baseline of the plateau, read from the
+          cumulative sum of the recording, instead of the decimated baseline interpolated at full rate. The segments of
+          the plateaus replace the baseline parameter.
 
 Functions
 ---------
 extract_and_normalize_movement(movement, start, end, stim_freq, fs=5000)
     Extract and normalize movement data between a start and end index.
-plot_peak_on_movement(movement, detected_peaks, stim_onset, plateaus, fs=5000, figure_size=(14, 5))
+normalize_movement(movement_centered)
+    Normalize a centered movement signal between 0 and 100.
+plateau_segments(stim_onset, plateaus, task, fs=5000)
+    Compute the movement segment and the stimulus frequency used to detect the peaks of each plateau.
+detrend_movement(movement, segments, fs=5000)
+    Detrend the movement of a whole recording once and return the centered movement of each segment.
+cumulative_movement(signal)
+    Build a cumulative index of the absolute velocity of a signal.
+movement_between(signal, cum_movement, start, end, threshold=None)
+    Compute the total movement of a signal between start and end indices.
+movement_to_plateau_end(movement, last_peak_idx, plateau_end)
+    Normalize the movement between the last peak of the previous plateau and the end of a plateau.
+plateau_peaks(movement, plateau_mov, plateau_start, plateau_end, stim_freq, plateau_idx=0, last_peak_idx=0, fs=5000, peak_threshold=50, min_velocity_sum=60, frequency_threshold=7.3, candidates=None, cum_movement=None, to_plateau_end=None)
+    Detect and validate the peaks of one plateau, as in `identify_peak_flexion`.
+plot_peak_on_movement(movement, detected_peaks, stim_onset, plateaus, fs=5000, figure_size=(14, 5), ax=None, show=True)
     Plot detected peaks on the movement signal.
-identify_peak_flexion(movement, stim_onset, plateaus, task, fs=5000, peak_threshold=50, min_velocity_sum=60, frequency_threshold=7.3, debugging=False, plot_verif=False, figure_size=(14, 5))
+identify_peak_flexion(movement, stim_onset, plateaus, task, fs=5000, peak_threshold=50, min_velocity_sum=60, frequency_threshold=7.3, debugging=False, plot_verif=False, figure_size=(14, 5), detrend='recording')
     Identify peak flexion moments in movement data.
-get_custom_parameters(file_name)
+refine_peaks(movement, coarse_peaks, factor, segments=None, fs=5000, half_window=None)
+    Refine peaks detected on a decimated signal to exact indices in the full-rate signal.
+identify_peak_flexion_multiresolution(movement, stim_onset, plateaus, task, fs=5000, analysis_fs=250, peak_threshold=50, min_velocity_sum=60, frequency_threshold=7.3, debugging=False, plot_verif=False, figure_size=(14, 5))
+    Identify peak flexion moments on a decimated copy of the movement, then refine them at full rate.
+compare_peaks(reference_peaks, detected_peaks, fs=5000, tolerance=0.05)
+    Compare detected peaks with reference peaks.
+custom_parameters_path(custom_params_path=None)
+    Resolve the location of the custom parameters file.
+load_custom_parameters(custom_params_path=None)
+    Load the table of custom peak detection parameters.
+get_custom_parameters(file_name, custom_params_path=None)
     Retrieve custom peak detection parameters for a given file name.
-identify_peaks_with_custom_parameters(file_name, movement, stim_onset, plateaus, task, fs=5000, debugging=False, plot_verif=False, figure_size=(14, 5))
+identify_peaks_with_custom_parameters(file_name, movement, stim_onset, plateaus, task, fs=5000, debugging=False, plot_verif=False, figure_size=(14, 5), custom_params_path=None)
     Wrapper function that retrieves custom parameters (if available) and calls identify_peak_flexion.
 
 
@@ -46,9 +118,16 @@ movement peaks.
 
 The different thresholds used in this function were determined empirically based on the characteristics of the movement
 data. They may need to be adjusted for different datasets.
+
+Custom parameters are read from 'specific_parameters.csv' in the working directory, or from the file given by the
+`SMS_CUSTOM_PARAMETERS` environment variable. Each process keeps its own copy of the loaded table, so the lookup is safe
+in the worker processes of `batch_processing`.
 """
 
 
+import fnmatch
+import os
+from pathlib import Path
 import warnings
 
 from matplotlib import pyplot as plt
@@ -57,7 +136,15 @@ import pandas as pd
 from scipy.signal import find_peaks
 
 # from config import path_base
-from src.utils import moving_average
+from src.utils import moving_average, plot_decimated
+
+# Custom peak detection parameters, and location of the file in which they are defined
+CUSTOM_PARAMETERS = ('peak_threshold', 'min_velocity_sum', 'frequency_threshold')
+CUSTOM_PARAMETERS_ENV = 'SMS_CUSTOM_PARAMETERS'
+DEFAULT_CUSTOM_PARAMETERS = 'specific_parameters.csv'
+
+# Tables of custom parameters already loaded, indexed by the path of their file
+_CUSTOM_PARAMETERS_REGISTRY = {}
 
 def extract_and_normalize_movement(movement, start, end, stim_freq, fs=5000):
     """
@@ -88,29 +175,379 @@ def extract_and_normalize_movement(movement, start, end, stim_freq, fs=5000):
     window_length = int(3 / stim_freq * fs)
     movement_centered = movement - moving_average(movement, window_length)
 
-    # Normalize the movement between 0 and 100
+    return normalize_movement(movement_centered)
+
+
+def normalize_movement(movement_centered):
+    """
+    Normalize a centered movement signal between 0 and 100.
+
+    Parameters
+    ----------
+    movement_centered : array
+        The centered movement signal.
+
+    Returns
+    -------
+    out : array
+        Normalized movement signal, scaled to the range [0, 100].
+    """
     movement_normalized = movement_centered - np.min(movement_centered)
     movement_normalized = movement_normalized / np.max(movement_normalized) *100
 
     return movement_normalized
 
 
-def plot_peak_on_movement(movement, detected_peaks, stim_onset, plateaus, fs=5000, figure_size=(14, 5)):
-    plt.figure(figsize=figure_size)
-    t = np.arange(len(movement)) / fs
-    plt.plot(t, movement, 'k')
-    plt.plot(t[detected_peaks], movement[detected_peaks], 'ro')
+def plateau_segments(stim_onset, plateaus, task, fs=5000):
+    """
+    Compute the movement segment and the stimulus frequency used to detect the peaks of each plateau.
+
+    Parameters
+    ----------
+    stim_onset : array
+        Indices of stimulus onset times.
+    plateaus : array
+        Plateau start and end indices as (start, end) pairs.
+    task : str
+        Task identifier.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+
+    Returns
+    -------
+    out : list
+        List of (start, end, stim_freq) tuples, one for each plateau. Start and end are indices in the movement signal.
+    """
+    plateaus = np.asarray(plateaus)
+    segments = []
+
+    for plateau_idx in range(len(plateaus)):
+
+        # Calculate stimulus frequency for the current plateau. If there are no stimuli, set the frequency to 2 Hz.
+        # This approximates a typical movement frequency for this task. Having a frequency close to that of the movement
+        # is necessary for correct normalization of the movement.
+        if (task=='adapt' and plateau_idx in [0, 2]) or (task=='conti' and plateau_idx == 1) or (task=='SMT'):
+            stim_freq = 2
+        else: 
+            stim_freq = fs / np.mean(np.diff(stim_onset[plateaus[plateau_idx, 0]:plateaus[plateau_idx, 1]]))
+
+        plateau_end = stim_onset[plateaus[plateau_idx, 1]] + 1
+        if plateau_idx == 0:
+            plateau_start = stim_onset[0]
+        else:
+            plateau_start = stim_onset[plateaus[plateau_idx - 1, 1]] -1
+
+        segments.append((plateau_start, plateau_end, stim_freq))
+
+    return segments
+
+
+def detrend_movement(movement, segments, fs=5000):
+    """
+    Detrend the movement of a whole recording once and return the centered movement of each segment.
+
+    The baseline of each segment is the moving average over 3 movements at the stimulus frequency of the segment, with
+    windows truncated at the edges of the segment, as in `extract_and_normalize_movement`. The cumulative sum of the
+    movement is computed once for the whole recording, and the baseline of each segment is read from it for its window
+    length, so the segments only cost the subtraction of their baseline.
+
+    Parameters
+    ----------
+    movement : array
+        The raw movement signal.
+    segments : list
+        List of (start, end, stim_freq) tuples, as returned by `plateau_segments`.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+
+    Returns
+    -------
+    out : list
+        Centered movement for each segment.
+    """
+    movement = np.asarray(movement, dtype=float)
+    csum, offset = _movement_cumsum(movement)
+
+    return [
+        movement[start:end] - _segment_baseline(csum, offset, np.arange(start, end), start, end, stim_freq, fs)
+        for start, end, stim_freq in segments
+    ]
+
+
+def _movement_cumsum(movement):
+    # Cumulative sum with a leading zero, after removing the mean to limit the loss of precision on long recordings
+    offset = np.mean(movement)
+    return np.concatenate(([0.], np.cumsum(movement - offset))), offset
+
+
+def _segment_baseline(csum, offset, idx, start, end, stim_freq, fs):
+    # Moving average over 3 movements at the samples `idx` of a segment, with windows truncated to the segment
+    window_length = int(3 / stim_freq * fs)
+    before = window_length // 2
+    after = window_length - before - 1
+
+    window_start = np.maximum(idx - before, start)
+    window_end = np.minimum(idx + after + 1, end)
+    return (csum[window_end] - csum[window_start]) / (window_end - window_start) + offset
+
+
+def cumulative_movement(signal):
+    """
+    Build a cumulative index of the absolute velocity of a signal.
+
+    Parameters
+    ----------
+    signal : array
+        The movement signal.
+
+    Returns
+    -------
+    out : array
+        Array of the same length as `signal`, where element i is the total movement (sum of absolute velocity) between
+        the first sample and sample i.
+    """
+    return np.concatenate(([0.], np.cumsum(np.abs(np.diff(signal)))))
+
+
+def movement_between(signal, cum_movement, start, end, threshold=None):
+    """
+    Compute the total movement of a signal between start and end indices.
+
+    The total movement between `start` and `end` is `np.sum(np.abs(np.diff(signal[start:end])))`. It is obtained in
+    constant time from the cumulative index, for any number of (start, end) pairs at once. The start and end indices
+    follow the same conventions as Python slices.
+
+    Parameters
+    ----------
+    signal : array
+        The movement signal.
+    cum_movement : array
+        Cumulative index of the signal, as returned by `cumulative_movement`.
+    start : int or array
+        Start indices.
+    end : int or array
+        End indices (excluded).
+    threshold : float, optional
+        Threshold to which the total movements will be compared. Values that are too close to the threshold to be 
+        decided with the cumulative index are recomputed directly from the signal, so that comparisons give the same 
+        result as the direct sum. Default is None.
+
+    Returns
+    -------
+    out : array
+        Total movement between each pair of indices.
+    """
+    n = len(signal)
+    start, end = np.broadcast_arrays(np.asarray(start, dtype=int), np.asarray(end, dtype=int))
+    start = np.clip(np.where(start < 0, start + n, start), 0, n)
+    end = np.clip(np.where(end < 0, end + n, end), 0, n)
+
+    # Slices with less than two samples have no movement
+    last = np.maximum(end - 1, start)
+    total = cum_movement[last] - cum_movement[start]
+
+    if threshold is not None:
+        tolerance = 1e-9 * (cum_movement[-1] + abs(threshold))
+        for idx in np.flatnonzero(np.abs(total - threshold) <= tolerance):
+            total.flat[idx] = np.sum(np.abs(np.diff(signal[start.flat[idx]:end.flat[idx]])))
+
+    return total
+
+
+def movement_to_plateau_end(movement, last_peak_idx, plateau_end):
+    """
+    Normalize the movement between the last peak of the previous plateau and the end of a plateau.
+
+    Parameters
+    ----------
+    movement : array
+        The movement signal.
+    last_peak_idx : int
+        Index of the last peak of the previous plateau in the movement signal.
+    plateau_end : int
+        End index of the plateau in the movement signal.
+
+    Returns
+    -------
+    mov_between_peaks : array
+        Movement between `last_peak_idx` and `plateau_end`, scaled to the range [0, 100].
+    cum_movement : array
+        Cumulative index of `mov_between_peaks`, as returned by `cumulative_movement`.
+    """
+    mov_between_peaks = movement[last_peak_idx:plateau_end]
+    mov_between_peaks = mov_between_peaks - np.min(mov_between_peaks)
+    mov_between_peaks = mov_between_peaks / np.max(mov_between_peaks) * 100
+
+    return mov_between_peaks, cumulative_movement(mov_between_peaks)
+
+
+def plateau_peaks(
+    movement,
+    plateau_mov,
+    plateau_start,
+    plateau_end,
+    stim_freq,
+    plateau_idx=0,
+    last_peak_idx=0,
+    fs=5000,
+    peak_threshold=50,
+    min_velocity_sum=60,
+    frequency_threshold=7.3,
+    candidates=None,
+    cum_movement=None,
+    to_plateau_end=None
+):
+    """
+    Detect and validate the peaks of one plateau, as in `identify_peak_flexion`.
+
+    The optional arguments `candidates`, `cum_movement` and `to_plateau_end` give intermediate results that do not 
+    depend on the peak detection parameters, so that they can be computed once when the plateau is processed with 
+    several parameters (see `sweep_parameters`).
+
+    Parameters
+    ----------
+    movement : array
+        The movement signal (e.g., filtered goniometer data).
+    plateau_mov : array
+        Normalized movement of the plateau, between `plateau_start` and `plateau_end`.
+    plateau_start : int
+        Start index of the plateau in the movement signal.
+    plateau_end : int
+        End index of the plateau in the movement signal.
+    stim_freq : float
+        Stimulus frequency of the plateau in Hz.
+    plateau_idx : int, optional
+        Index of the plateau in the recording. Default is 0.
+    last_peak_idx : int, optional
+        Index of the last validated peak of the previous plateaus in the movement signal. Not used for the first 
+        plateau. Default is 0.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    peak_threshold : float, optional
+        Minimum height for peaks in normalized movement signal. Default is 50.
+    min_velocity_sum : float, optional
+        Minimum sum of absolute velocity between peaks to consider valid. Default is 60.
+    frequency_threshold : float, optional
+        Frequency threshold for direct peak detection. Default is 7.3 Hz.
+    candidates : tuple, optional
+        Indices and heights of the peaks of `plateau_mov` above a threshold lower than `peak_threshold`. If None, the 
+        peaks are detected in `plateau_mov`. Default is None.
+    cum_movement : array, optional
+        Cumulative index of `plateau_mov`. If None, it is computed. Default is None.
+    to_plateau_end : tuple, optional
+        Output of `movement_to_plateau_end` for `last_peak_idx` and `plateau_end`. If None, it is computed. Default is
+        None.
+
+    Returns
+    -------
+    peaks : array
+        Peak indices of the plateau in the movement signal.
+    last_peak_idx : int
+        Index of the last validated peak in the movement signal, for the next plateau.
+    """
+    # At low frequencies, movements can have shapes that prevent simple peak detection.
+    # In such cases, we need to validate the peaks by checking the total movement between them.
+    # This issue is more likely to occur when the frequency is below the specified threshold.
+    # For frequencies above this threshold, movements are more regular, allowing direct peak detection.
+    if stim_freq >= frequency_threshold:
+        min_distance = int(fs / stim_freq / 2)
+        return find_peaks(plateau_mov, distance=min_distance)[0] + plateau_start, last_peak_idx
+
+    if candidates is None:
+        initial_peaks = find_peaks(plateau_mov, height=peak_threshold)[0]
+    else:
+        initial_peaks = candidates[0][candidates[1] >= peak_threshold]
+
+    # For the first plateau, we consider that the first peak flexion is the first detected peak.
+    if plateau_idx == 0:
+        first_peak = initial_peaks[0]
 
-    for onset in stim_onset:
-        plt.axvline(onset / fs, color='b', alpha=0.5)
-    for (beg, end) in plateaus:
-        plt.axvline(stim_onset[beg] / fs, color='g', linewidth=2)
-        plt.axvline(stim_onset[end] / fs, color='orange', linewidth=2)
+    # For the other plateaus, calculate the total amount of movement between the last detected peak for the
+    # previous plateau and each detected peak for the current plateau.
+    # The first detected peak for which it exceeds a certain threshold is considered first peak flexion.
+    else:
+        if to_plateau_end is None:
+            to_plateau_end = movement_to_plateau_end(movement, last_peak_idx, plateau_end)
+
+        candidate_ends = initial_peaks + plateau_start - last_peak_idx
+        movement_to_candidates = movement_between(*to_plateau_end, 0, candidate_ends, min_velocity_sum)
+        above_threshold = np.flatnonzero(movement_to_candidates >= min_velocity_sum)
+        if len(above_threshold) == 0:
+            warnings.warn(f"No candidate peak reaches the minimal movement in plateau {plateau_idx + 1}.")
+            first_peak = initial_peaks[-1]
+        else:
+            first_peak = initial_peaks[above_threshold[0]]
 
-    plt.xlabel('Time (s)')
-    plt.ylabel('Normalized Movement')
-    plt.title('Detected Peaks on Movement Signal')
-    plt.show()
+    # Validate the other peaks by checking the total movement between them.
+    if cum_movement is None:
+        cum_movement = cumulative_movement(plateau_mov)
+    movement_between_candidates = movement_between(
+        plateau_mov, cum_movement, initial_peaks[:-1], initial_peaks[1:], min_velocity_sum
+    )
+    valid_peaks = np.concatenate((
+        [first_peak], initial_peaks[1:][movement_between_candidates > min_velocity_sum]
+    )).astype(int) + plateau_start
+
+    return valid_peaks, valid_peaks[-1]
+
+
+def plot_peak_on_movement(
+    movement, detected_peaks, stim_onset, plateaus, fs=5000, figure_size=(14, 5), ax=None, show=True
+):
+    """
+    Plot detected peaks on the movement signal.
+
+    The movement is drawn decimated to the width of the axes and decimated again when zooming, so that interactive
+    figures of long recordings stay responsive. Stimulus onsets and plateau limits are drawn as one collection each.
+
+    Parameters
+    ----------
+    movement : array
+        The movement signal.
+    detected_peaks : array
+        Detected peak indices.
+    stim_onset : array
+        Indices of stimulus onset times.
+    plateaus : array
+        Plateau start and end indices as (start, end) pairs.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    figure_size : tuple, optional
+        Size of the figure. Only used if `ax` is None. Default is (14, 5).
+    ax : matplotlib.axes.Axes, optional
+        Axes in which to plot. If None, a new figure is created. Default is None.
+    show : bool, optional
+        Whether to show the figure. Default is True.
+
+    Returns
+    -------
+    out : matplotlib.axes.Axes
+        Axes of the plot.
+    """
+    if ax is None:
+        _, ax = plt.subplots(figsize=figure_size)
+
+    movement = np.asarray(movement)
+    stim_onset = np.asarray(stim_onset)
+    plateaus = np.asarray(plateaus, dtype=int).reshape(-1, 2)
+    detected_peaks = np.asarray(detected_peaks, dtype=int)
+
+    plot_decimated(ax, movement, fs=fs, color='k')
+    ax.plot(detected_peaks / fs, movement[detected_peaks], 'ro')
+
+    # Vertical lines spanning the whole height of the axes
+    transform = ax.get_xaxis_transform()
+    ax.vlines(stim_onset / fs, 0, 1, transform=transform, color='b', alpha=0.5)
+    ax.vlines(stim_onset[plateaus[:, 0]] / fs, 0, 1, transform=transform, color='g', linewidth=2)
+    ax.vlines(stim_onset[plateaus[:, 1]] / fs, 0, 1, transform=transform, color='orange', linewidth=2)
+
+    ax.set_xlabel('Time (s)')
+    ax.set_ylabel('Normalized Movement')
+    ax.set_title('Detected Peaks on Movement Signal')
+    if show:
+        plt.show()
+
+    return ax
 
 
 def identify_peak_flexion(
@@ -124,7 +561,8 @@ def identify_peak_flexion(
     frequency_threshold=7.3, 
     debugging=False, 
     plot_verif=False,
-    figure_size=(14, 5)
+    figure_size=(14, 5),
+    detrend='recording'
 ):
     """
     Identify peak flexion moments in movement data.
@@ -160,6 +598,12 @@ def identify_peak_flexion(
         Whether to plot the detected peaks on the movement signal. Default is False.
     figure_size : tuple, optional
         Size of the figure when plotting the detected peaks. Default is (14, 5).
+    detrend : {'recording', 'plateau'}, optional
+        How the movement is detrended before peak detection. Default is 'recording'.
+            - 'recording': the baselines are read from a cumulative sum of the whole recording (see
+              `detrend_movement`). It gives the same peaks as 'plateau'.
+            - 'plateau': the baseline is computed separately for each plateau with `extract_and_normalize_movement`.
+              This is the reference implementation, compared with 'recording' by `detrend_regression`.
 
     Returns
     -------
@@ -167,135 +611,391 @@ def identify_peak_flexion(
         Detected peak indices in the movement signal.
     """
 
+    if detrend not in ('recording', 'plateau'):
+        raise ValueError("Detrend must be 'recording' or 'plateau'.")
+
+    segments = plateau_segments(stim_onset, plateaus, task, fs=fs)
+    if detrend == 'recording':
+        plateau_movs = [normalize_movement(centered) for centered in detrend_movement(movement, segments, fs=fs)]
+    else:
+        plateau_movs = [
+            extract_and_normalize_movement(movement, start, end, stim_freq, fs=fs) for start, end, stim_freq in segments
+        ]
+
+    detected_peaks = _segment_peaks(
+        movement, segments, plateau_movs, fs=fs, peak_threshold=peak_threshold, min_velocity_sum=min_velocity_sum,
+        frequency_threshold=frequency_threshold, debugging=debugging
+    )
+
+    if plot_verif:
+        plot_peak_on_movement(movement, detected_peaks, stim_onset, plateaus, fs=fs, figure_size=figure_size)
+        
+    return detected_peaks
+
+
+def _segment_peaks(
+    movement, segments, plateau_movs, fs=5000, peak_threshold=50, min_velocity_sum=60, frequency_threshold=7.3, 
+    debugging=False
+):
+    # Peak detection of `identify_peak_flexion` on the segments and normalized movements of the plateaus
     detected_peaks = []
     last_peak_idx = 0
 
     if debugging:
         print("BEGIN PEAK DETECTION...")
 
-    for plateau_idx in range(len(plateaus)):
+    for plateau_idx, ((plateau_start, plateau_end, stim_freq), plateau_mov) in enumerate(zip(segments, plateau_movs)):
 
-        # Calculate stimulus frequency for the current plateau. If there are no stimuli, set the frequency to 2 Hz.
-        # This approximates a typical movement frequency for this task. Having a frequency close to that of the movement
-        # is necessary for correct normalization of the movement.
-        if (task=='adapt' and plateau_idx in [0, 2]) or (task=='conti' and plateau_idx == 1) or (task=='SMT'):
-            stim_freq = 2
-        else: 
-            stim_freq = fs / np.mean(np.diff(stim_onset[plateaus[plateau_idx, 0]:plateaus[plateau_idx, 1]]))
-        
         if debugging:
             print(f"    Plateau {plateau_idx + 1} - Stimulus frequency: {stim_freq:.2f} Hz...")
 
-        plateau_end = stim_onset[plateaus[plateau_idx, 1]] + 1
-        if plateau_idx == 0:
-            plateau_start = stim_onset[0]
-        else:
-            plateau_start = stim_onset[plateaus[plateau_idx - 1, 1]] -1
+        peaks_in_plateau, last_peak_idx = plateau_peaks(
+            movement, plateau_mov, plateau_start, plateau_end, stim_freq, plateau_idx=plateau_idx,
+            last_peak_idx=last_peak_idx, fs=fs, peak_threshold=peak_threshold, min_velocity_sum=min_velocity_sum,
+            frequency_threshold=frequency_threshold
+        )
+        detected_peaks.extend(peaks_in_plateau)
+        
+        # Debugging information
+        if len(detected_peaks) == 0:
+            warnings.warn(f"No peaks detected in plateau {plateau_idx + 1}.")
+        if debugging:
+            print("        Done!")
+        
+    # Remove duplicates
+    return np.unique(detected_peaks[1:])
 
-        plateau_mov = extract_and_normalize_movement(movement, plateau_start, plateau_end, stim_freq)
 
-        # At low frequencies, movements can have shapes that prevent simple peak detection.
-        # In such cases, we need to validate the peaks by checking the total movement between them.
-        # This issue is more likely to occur when the frequency is below the specified threshold.
-        # For frequencies above this threshold, movements are more regular, allowing direct peak detection.
-        if stim_freq < frequency_threshold:
-            initial_peaks = find_peaks(plateau_mov, height=peak_threshold)[0]
+def refine_peaks(movement, coarse_peaks, factor, segments=None, fs=5000, half_window=None):
+    """
+    Refine peaks detected on a decimated signal to exact indices in the full-rate signal.
 
-            valid_peaks = []
+    Each peak is moved to the maximum of the full-rate signal in a small window around its full-rate position.
 
-            # For the first plateau, we consider that the first peak flexion is the first detected peak.
-            if plateau_idx == 0:
-                valid_peaks.append(int(initial_peaks[0]))
-                first_peak_idx = 1
+    Parameters
+    ----------
+    movement : array
+        The full-rate movement signal.
+    coarse_peaks : array
+        Peak indices in the decimated signal.
+    factor : int
+        Decimation factor.
+    segments : list, optional
+        Full-rate segments of the plateaus, as returned by `plateau_segments`. If given, the maximum is searched in the 
+        movement centered as in `detrend_movement`, within the segment of the peak (the last segment that contains its 
+        full-rate position). If None, the maximum of the raw movement is used. Default is None.
+    fs : int, optional
+        Sampling frequency of the full-rate signal in Hz. Default is 5000.
+    half_window : int, optional
+        Half width of the search window in full-rate samples. If None, the decimation factor is used. Default is None.
 
-            # For the other plateaus, calculate the total amount of movement between the last detected peak for the
-            # previous plateau and the first detected peak for the current plateau.
-            # If it exceeds a certain threshold, first peak detected is considered first peak flexion.
-            else:
-                mov_between_peaks = movement[last_peak_idx:plateau_end]
-                mov_between_peaks = mov_between_peaks - np.min(mov_between_peaks)
-                mov_between_peaks = mov_between_peaks / np.max(mov_between_peaks) * 100
+    Returns
+    -------
+    out : array
+        Peak indices in the full-rate signal.
+    """
+    half_window = factor if half_window is None else half_window
+    coarse_peaks = np.asarray(coarse_peaks, dtype=int)
+    movement = np.asarray(movement, dtype=float)
 
-                first_peak_idx = 0
+    # Indices of the search window of each peak, one row per peak
+    window_idx = coarse_peaks[:, None] * factor + np.arange(-half_window, half_window + 1)
+    window_idx = np.clip(window_idx, 0, len(movement) - 1)
 
-                temp_start = 0
-                temp_end = initial_peaks[first_peak_idx] + plateau_start - last_peak_idx
+    if segments is None:
+        values = movement[window_idx]
+    else:
+        # Exact full-rate baseline of each window, read from the cumulative sum of the recording
+        csum, offset = _movement_cumsum(movement)
+        starts = np.array([start for start, _, _ in segments])
+        segment_idx = np.clip(np.searchsorted(starts, coarse_peaks * factor, side='right') - 1, 0, len(segments) - 1)
 
-                while np.sum(np.abs(np.diff(mov_between_peaks[temp_start:temp_end]))) < min_velocity_sum:
-                    first_peak_idx += 1
-                    temp_end = initial_peaks[first_peak_idx] + plateau_start - last_peak_idx
+        values = np.empty(window_idx.shape)
+        for idx, (start, end, stim_freq) in enumerate(segments):
+            in_segment = segment_idx == idx
+            window_idx[in_segment] = np.clip(window_idx[in_segment], start, end - 1)
+            values[in_segment] = movement[window_idx[in_segment]] - _segment_baseline(
+                csum, offset, window_idx[in_segment], start, end, stim_freq, fs
+            )
 
-                    if first_peak_idx >= len(initial_peaks):
-                        break
+    refined_peaks = window_idx[np.arange(len(coarse_peaks)), np.argmax(values, axis=1)]
 
-                valid_peaks.append(int(initial_peaks[first_peak_idx]))
+    return np.unique(refined_peaks)
 
-            # Validate the other peaks by checking the total movement between them.
-            for peak_idx in range(1, len(initial_peaks)):
-                previous_peak = initial_peaks[peak_idx - 1]
-                current_peak = initial_peaks[peak_idx]
 
-                velocity = np.diff(plateau_mov[previous_peak:current_peak])
-                velocity_sum = np.sum(np.abs(velocity))
+def identify_peak_flexion_multiresolution(
+    movement, 
+    stim_onset, 
+    plateaus, 
+    task,
+    fs=5000, 
+    analysis_fs=250,
+    peak_threshold=50, 
+    min_velocity_sum=60, 
+    frequency_threshold=7.3, 
+    debugging=False, 
+    plot_verif=False,
+    figure_size=(14, 5)
+):
+    """
+    Identify peak flexion moments on a decimated copy of the movement, then refine them at full rate.
 
-                if velocity_sum > min_velocity_sum:
-                    valid_peaks.append(int(current_peak))
-            
-            # Update the last peak index for the next plateau
-            last_peak_idx = valid_peaks[-1] + plateau_start
-            detected_peaks.extend(valid_peaks + plateau_start)
-        
-        else:  # Frequency above fixed threshold
-            min_distance = int(fs / stim_freq / 2)
-            peaks_in_plateau = find_peaks(plateau_mov, distance=min_distance)[0]
-            detected_peaks.extend(peaks_in_plateau + plateau_start)
-        
-        # Debugging information
-        if len(detected_peaks) == 0:
-            warnings.warn(f"No peaks detected in plateau {plateau_idx + 1}.")
-        if debugging:
-            print("        Done!")
-        
-    # Remove duplicates
-    detected_peaks = np.unique(detected_peaks[1:])
+    The movement is low-pass filtered well below the analysis sampling frequency, so it can be decimated without 
+    aliasing. Peaks are detected with `identify_peak_flexion` on the decimated movement, then refined to exact indices 
+    of the full-rate movement with `refine_peaks`, after subtraction of the full-rate baseline of
+    `identify_peak_flexion`, so that a refined peak is the sample found by the full-rate detection. The peaks only
+    differ when the decimated detection selects other candidates, which can happen for a peak within a few decimated
+    samples of the edge of a plateau. Use `compare_peaks` to measure the agreement with the full-rate detection.
+
+    Parameters
+    ----------
+    movement : array
+        The movement signal (e.g., filtered goniometer data).
+    stim_onset : array
+        Indices of stimulus onset times.
+    plateaus : array
+        Plateau start and end indices as (start, end) pairs.
+    task : str
+        Task identifier.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    analysis_fs : float, optional
+        Sampling frequency in Hz of the decimated movement used for detection. It should stay well above the cutoff
+        frequency of the low-pass filter applied to the movement. Default is 250.
+    peak_threshold : float, optional
+        Minimum height for peaks in normalized movement signal. Default is 50.
+    min_velocity_sum : float, optional
+        Minimum sum of absolute velocity between peaks to consider valid. Default is 60.
+    frequency_threshold : float, optional
+        Frequency threshold for direct peak detection. Default is 7.3 Hz.
+    debugging : bool, optional
+        Whether to print debugging information. Default is False.
+    plot_verif : bool, optional
+        Whether to plot the detected peaks on the movement signal. Default is False.
+    figure_size : tuple, optional
+        Size of the figure when plotting the detected peaks. Default is (14, 5).
+
+    Returns
+    -------
+    out : array
+        Detected peak indices in the full-rate movement signal.
+    """
+    factor = int(round(fs / analysis_fs))
+    detection_parameters = dict(
+        peak_threshold=peak_threshold, min_velocity_sum=min_velocity_sum, frequency_threshold=frequency_threshold, 
+        debugging=debugging
+    )
+
+    if factor <= 1:
+        return identify_peak_flexion(
+            movement, stim_onset, plateaus, task, fs=fs, plot_verif=plot_verif, figure_size=figure_size, 
+            **detection_parameters
+        )
+
+    # Decimate the movement and the stimulus onsets
+    decimated_fs = fs / factor
+    decimated_movement = np.asarray(movement[::factor])
+    decimated_onset = np.round(np.asarray(stim_onset) / factor).astype(int)
+
+    # Same detection as `identify_peak_flexion` on the decimated movement
+    segments = plateau_segments(decimated_onset, plateaus, task, fs=decimated_fs)
+    coarse_peaks = _segment_peaks(
+        decimated_movement, segments,
+        [normalize_movement(centered) for centered in detrend_movement(decimated_movement, segments, fs=decimated_fs)],
+        fs=decimated_fs, **detection_parameters
+    )
+
+    # Refinement on the movement centered with the full-rate baseline used by `identify_peak_flexion`
+    detected_peaks = refine_peaks(
+        movement, coarse_peaks, factor, segments=plateau_segments(stim_onset, plateaus, task, fs=fs), fs=fs
+    )
 
     if plot_verif:
-        plot_peak_on_movement(movement, detected_peaks, stim_onset, plateaus, figure_size=figure_size)
-        
+        plot_peak_on_movement(movement, detected_peaks, stim_onset, plateaus, fs=fs, figure_size=figure_size)
+
     return detected_peaks
 
 
-def get_custom_parameters(file_name):
+def compare_peaks(reference_peaks, detected_peaks, fs=5000, tolerance=0.05):
+    """
+    Compare detected peaks with reference peaks (e.g., multiresolution detection against full-rate detection).
+
+    Each reference peak is matched to the closest detected peak, if it is closer than the tolerance.
+
+    Parameters
+    ----------
+    reference_peaks : array
+        Reference peak indices.
+    detected_peaks : array
+        Detected peak indices.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    tolerance : float, optional
+        Maximum distance in seconds between matched peaks. Default is 0.05.
+
+    Returns
+    -------
+    out : dict
+        Dictionary with the number of reference, detected and matched peaks, the mean and maximum absolute error of the
+        matched peaks in samples, the maximum absolute difference between the IOIs in ms (computed when all peaks are 
+        matched one to one) and whether the IOIs are identical.
+    """
+    reference_peaks = np.asarray(reference_peaks, dtype=int)
+    detected_peaks = np.asarray(detected_peaks, dtype=int)
+
+    errors = np.array([], dtype=int)
+    if len(reference_peaks) > 0 and len(detected_peaks) > 0:
+        # Closest detected peak to each reference peak
+        right = np.clip(np.searchsorted(detected_peaks, reference_peaks), 1, len(detected_peaks) - 1)
+        left = right - 1 if len(detected_peaks) > 1 else right
+        closest = np.where(
+            np.abs(detected_peaks[left] - reference_peaks) <= np.abs(detected_peaks[right] - reference_peaks),
+            detected_peaks[left], detected_peaks[right]
+        )
+        errors = closest - reference_peaks
+        errors = errors[np.abs(errors) <= tolerance * fs]
+
+    one_to_one = len(errors) == len(reference_peaks) == len(detected_peaks)
+    ioi_error = np.max(np.abs(np.diff(errors))) / fs * 1000 if one_to_one and len(errors) > 1 else np.nan
+
+    return {
+        'n_reference': len(reference_peaks),
+        'n_detected': len(detected_peaks),
+        'n_matched': len(errors),
+        'mean_abs_error': np.mean(np.abs(errors)) if len(errors) > 0 else np.nan,
+        'max_abs_error': np.max(np.abs(errors)) if len(errors) > 0 else np.nan,
+        'max_ioi_error_ms': ioi_error,
+        'identical_iois': bool(one_to_one and np.all(errors == errors[0])) if len(errors) > 0 else False,
+    }
+
+
+def custom_parameters_path(custom_params_path=None):
+    """
+    Resolve the location of the custom parameters file.
+
+    Parameters
+    ----------
+    custom_params_path : str or Path, optional
+        Path to the csv file containing custom parameters. If None, the `SMS_CUSTOM_PARAMETERS` environment variable is
+        used, or 'specific_parameters.csv' if it is not set. Default is None.
+
+    Returns
+    -------
+    out : Path
+        Absolute path to the custom parameters file.
+    """
+    if custom_params_path is None:
+        custom_params_path = os.getenv(CUSTOM_PARAMETERS_ENV, DEFAULT_CUSTOM_PARAMETERS)
+    return Path(custom_params_path).expanduser().resolve()
+
+
+def load_custom_parameters(custom_params_path=None):
+    """
+    Load the table of custom peak detection parameters.
+
+    The table is read once and kept in memory. It is read again only when the modification time of the file changes.
+
+    The first column of the csv file contains the keys of the rows, which are either file names (e.g., 'P01_synch__2'),
+    participants (e.g., 'P01'), or patterns with wildcards (e.g., 'P01_adapt__*', '*'). The other columns contain the
+    peak detection parameters. Empty cells are ignored, so that a row only overrides the parameters it defines.
+
+    Parameters
+    ----------
+    custom_params_path : str or Path, optional
+        Path to the csv file containing custom parameters. See `custom_parameters_path`. Default is None.
+
+    Returns
+    -------
+    out : dict
+        Custom parameters of each key, as dictionaries of floats. Empty if the file does not exist.
+
+    Raises
+    ------
+    ValueError
+        If the table has duplicated keys or non-numeric parameter values.
+    """
+    path = custom_parameters_path(custom_params_path)
+    if not path.is_file():
+        _CUSTOM_PARAMETERS_REGISTRY.pop(path, None)
+        return {}
+
+    mtime = path.stat().st_mtime_ns
+    cached = _CUSTOM_PARAMETERS_REGISTRY.get(path)
+    if cached is not None and cached['mtime'] == mtime:
+        return cached['table']
+
+    custom_params_df = pd.read_csv(path, index_col=0)
+    custom_params_df.index = custom_params_df.index.astype(str).str.strip()
+
+    # Validate the table
+    duplicated = custom_params_df.index[custom_params_df.index.duplicated()].unique()
+    if len(duplicated) > 0:
+        raise ValueError(f"Duplicated keys in {path}: {', '.join(duplicated)}")
+    unknown = [column for column in custom_params_df.columns if column not in CUSTOM_PARAMETERS]
+    if len(unknown) > 0:
+        warnings.warn(f"Ignored unknown columns in {path}: {', '.join(map(str, unknown))}")
+    custom_params_df = custom_params_df.reindex(columns=[c for c in CUSTOM_PARAMETERS if c in custom_params_df])
+    for column in custom_params_df.columns:
+        values = pd.to_numeric(custom_params_df[column], errors='coerce')
+        invalid = values.isna() & custom_params_df[column].notna()
+        if invalid.any():
+            raise ValueError(
+                f"Non-numeric values of {column} in {path} for: {', '.join(custom_params_df.index[invalid])}"
+            )
+        custom_params_df[column] = values.astype(float)
+
+    table = {
+        key: {name: value for name, value in row.items() if not np.isnan(value)}
+        for key, row in zip(custom_params_df.index, custom_params_df.to_dict('records'))
+    }
+    _CUSTOM_PARAMETERS_REGISTRY[path] = {'mtime': mtime, 'table': table, 'resolved': {}}
+
+    return table
+
+
+def get_custom_parameters(file_name, custom_params_path=None):
     """
     Retrieve custom peak detection parameters for a given file name.
 
+    The parameters defined for the file name override those of the patterns matching it and those of its participant,
+    the most specific key taking precedence (e.g., 'P01_adapt__*' over 'P01', and 'P01' over '*').
+
     Parameters
     ----------
     file_name : str
         The identifier for the file.
-    custom_params_df : pandas.DataFrame
-        DataFrame containing custom parameters indexed by file names.
+    custom_params_path : str or Path, optional
+        Path to the csv file containing custom parameters indexed by file names. See `load_custom_parameters`. Default
+        is None.
 
     Returns
     -------
     dict or None
         Custom parameters as a dictionary if available, otherwise None.
     """
-    # Load csv file with the custom parameters for peak_detection
-    path_base = []  # Set to none because the path is not needed for that repository
-    custom_params_path = path_base / 'specific_parameters.csv'
-    custom_params_df = pd.read_csv(custom_params_path, index_col=0)
-
-
-    try:
-        matching_row = custom_params_df.loc[file_name]
-    except KeyError:
+    table = load_custom_parameters(custom_params_path)
+    if len(table) == 0:
         return None
 
-    if isinstance(matching_row, pd.Series):
-        return matching_row.to_dict()
+    # Parameters already resolved for this file name since the last reading of the table
+    resolved = _CUSTOM_PARAMETERS_REGISTRY[custom_parameters_path(custom_params_path)]['resolved']
+    if file_name not in resolved:
+        # Keys matching the file name, from the least to the most specific
+        participant = file_name.split('__')[0].rsplit('_', 1)[0]
+        keys = [(len(participant), participant)] if participant in table else []
+        keys += [
+            (len(key.strip('*?')), key) for key in table
+            if any(char in key for char in '*?[') and fnmatch.fnmatchcase(file_name, key)
+        ]
+        keys = [key for _, key in sorted(keys, key=lambda item: item[0])] + [file_name]
 
-    return None
+        custom_parameters = {}
+        for key in keys:
+            custom_parameters.update(table.get(key, {}))
+        resolved[file_name] = custom_parameters or None
+
+    custom_parameters = resolved[file_name]
+    return None if custom_parameters is None else dict(custom_parameters)
 
 
 def identify_peaks_with_custom_parameters(
@@ -307,7 +1007,8 @@ def identify_peaks_with_custom_parameters(
     fs=5000, 
     debugging=False, 
     plot_verif=False, 
-    figure_size=(14, 5)
+    figure_size=(14, 5),
+    custom_params_path=None
 ):
     """
     Wrapper function that retrieves custom parameters (if available) and calls identify_peak_flexion.
@@ -332,6 +1033,8 @@ def identify_peaks_with_custom_parameters(
         Whether to plot the detected peaks on the movement signal. Default is False.
     figure_size : tuple, optional
         Size of the figure when plotting the detected peaks. Default is (14, 5).
+    custom_params_path : str or Path, optional
+        Path to the csv file containing custom parameters. See `load_custom_parameters`. Default is None.
     
     Returns
     -------
@@ -340,7 +1043,7 @@ def identify_peaks_with_custom_parameters(
     """
     print(f"Current file: {file_name}")
 
-    custom_parameters = get_custom_parameters(file_name)
+    custom_parameters = get_custom_parameters(file_name, custom_params_path)
     
     if custom_parameters:
         print("Using custom parameters for peak detection")
@@ -0,0 +1,329 @@
+"""
+PLAYBACK OF THE STIMULUS SEQUENCES WITH AN ONSET TIMING LOG
+===========================================================
+This script plays a rendered stimulus sequence through a callback audio stream, and logs when each stimulus onset was
+sent to the audio device. The sequence is streamed in small blocks, which are copied from the rendered samples without
+allocating memory, so the output is not delayed by the Python interpreter. For each onset, the log contains its intended
+time (the output time of the first sample plus the onset divided by the sampling frequency) and the output time reported
+by the device for the block containing it, so the timing error of each stimulus is known without detecting the stimuli
+in the recorded sound.
+
+Two backends are available: 'sounddevice', which plays the sequence on the sound card, and 'null', which replays the
+callbacks at the pace of the sound card without audio hardware and keeps the output samples (loopback), e.g., to test
+the playback or measure the scheduling jitter of the computer.
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Classes
+-------
+SequencePlayer(samples, fs, onsets=(), block_size=256, backend='sounddevice', device=None, latency='low')
+    Callback-driven player of a stimulus sequence, with an onset timing log.
+NullOutputStream(samplerate, blocksize, channels, dtype, callback, finished_callback=None, realtime=True)
+    Output stream without audio hardware, with the interface of `sounddevice.OutputStream`.
+
+Functions
+---------
+timing_summary(timing_log)
+    Summarize the timing errors of the onsets.
+
+Usage
+-----
+    samples, fs = cache.get(**trial)
+    player = SequencePlayer(samples, fs, trial_onsets(**trial))
+    player.play()
+    timing_summary(player.timing_log())
+
+Notes
+-----
+sounddevice is imported when a 'sounddevice' player is started, and thebeat (which imports sounddevice) only when
+SoundSequence objects are built (see `stimulus_generation`). The 'null' backend, `render_sequence` and `SequenceCache`
+therefore work on machines without PortAudio.
+"""
+
+
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+
+class CallbackStop(Exception):
+    """Raised by a callback of `NullOutputStream` to stop the stream, as `sounddevice.CallbackStop`."""
+
+
+class NullOutputStream:
+    """
+    Output stream without audio hardware, with the interface of `sounddevice.OutputStream`.
+
+    The callback is called in a background thread with blocks of `blocksize` frames. The output time of each block is
+    the time at which the callback is called, as for a sound card without output latency, so the timing log measures
+    the scheduling jitter of the computer. The output samples are kept in `recorded`.
+
+    Parameters
+    ----------
+    samplerate : int
+        Sampling frequency in Hz.
+    blocksize : int
+        Number of frames of each block.
+    channels : int
+        Number of channels.
+    dtype : str
+        Data type of the samples.
+    callback : callable
+        Function called for each block as `callback(outdata, frames, time, status)`.
+    finished_callback : callable, optional
+        Function called when the stream stops. Default is None.
+    realtime : bool, optional
+        Whether to call the callback when each block is due, as a sound card, or as fast as possible. Default is True.
+    """
+
+    def __init__(self, samplerate, blocksize, channels, dtype, callback, finished_callback=None, realtime=True):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.callback = callback
+        self.finished_callback = finished_callback
+        self.realtime = realtime
+        self.recorded = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def active(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        outdata = np.zeros((self.blocksize, self.channels), dtype=self.dtype)
+        time_info = SimpleNamespace(currentTime=0.0, outputBufferDacTime=0.0)
+        start = time.perf_counter()
+        n_frames = 0
+
+        try:
+            while not self._stop.is_set():
+                due = start + n_frames / self.samplerate
+                if self.realtime:
+                    time.sleep(max(0, due - time.perf_counter()))
+                time_info.currentTime = time.perf_counter() if self.realtime else due
+                time_info.outputBufferDacTime = time_info.currentTime
+                try:
+                    self.callback(outdata, self.blocksize, time_info, None)
+                except CallbackStop:
+                    self.recorded.append(outdata.copy())
+                    break
+                self.recorded.append(outdata.copy())
+                n_frames += self.blocksize
+        finally:
+            if self.finished_callback is not None:
+                self.finished_callback()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='null_output_stream', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def close(self):
+        self.stop()
+
+
+class SequencePlayer:
+    """
+    Callback-driven player of a stimulus sequence, with an onset timing log.
+
+    Parameters
+    ----------
+    samples : array
+        Samples of the sequence, e.g., from `SequenceCache.get`. They are converted to 32-bit floats.
+    fs : int
+        Sampling frequency of the sequence in Hz.
+    onsets : array, optional
+        Onsets of the stimuli in samples, e.g., from `sequence_onsets`. Default is ().
+    block_size : int, optional
+        Number of frames of each block sent to the device. Default is 256 (5.3 ms at 48 kHz).
+    backend : {'sounddevice', 'null'}, optional
+        Audio backend. Default is 'sounddevice'.
+    device : int or str, optional
+        Output device of the 'sounddevice' backend. If None, the default device is used. Default is None.
+    latency : float or {'low', 'high'}, optional
+        Latency of the 'sounddevice' backend. See `sounddevice.OutputStream`. Default is 'low'.
+
+    Attributes
+    ----------
+    stream : object
+        Stream of the last playback. For the 'null' backend, `stream.recorded` contains the output blocks.
+    n_xruns : int
+        Number of blocks for which the device reported an underflow.
+    """
+
+    __slots__ = (
+        'samples', 'fs', 'onsets', 'block_size', 'backend', 'device', 'latency', 'stream', 'n_xruns',
+        '_position', '_next_onset', '_start_time', '_reported', '_finished', '_stop_exception'
+    )
+
+    def __init__(self, samples, fs, onsets=(), block_size=256, backend='sounddevice', device=None, latency='low'):
+        if backend not in ('sounddevice', 'null'):
+            raise ValueError("Backend must be 'sounddevice' or 'null'.")
+
+        # Two-dimensional view of the samples, so that blocks are copied to the output buffer without reshaping
+        self.samples = np.ascontiguousarray(samples, dtype=np.float32).reshape(-1, 1)
+        self.fs = fs
+        self.onsets = np.asarray(onsets, dtype=int)
+        if np.any(np.diff(self.onsets) < 0):
+            raise ValueError("Onsets must be sorted.")
+        self.block_size = block_size
+        self.backend = backend
+        self.device = device
+        self.latency = latency
+        self.stream = None
+        self._reported = np.full(len(self.onsets), np.nan)
+        self._reset()
+
+    def _reset(self):
+        self._position = 0
+        self._next_onset = 0
+        self._start_time = np.nan
+        self._reported[:] = np.nan
+        self.n_xruns = 0
+        self._finished = threading.Event()
+
+    def _callback(self, outdata, frames, time_info, status):
+        if status:
+            self.n_xruns += 1
+
+        # Output time of the block, and of the first sample of the sequence
+        block_time = time_info.outputBufferDacTime
+        if self._position == 0:
+            self._start_time = block_time
+
+        start = self._position
+        end = min(start + frames, len(self.samples))
+        n = end - start
+        outdata[:n] = self.samples[start:end]
+        outdata[n:] = 0
+
+        # Reported output time of the onsets of the block
+        while self._next_onset < len(self.onsets) and self.onsets[self._next_onset] < end:
+            self._reported[self._next_onset] = block_time + (self.onsets[self._next_onset] - start) / self.fs
+            self._next_onset += 1
+
+        self._position = end
+        if end == len(self.samples):
+            raise self._stop_exception
+
+    def start(self):
+        """Start the playback and return immediately."""
+        self._reset()
+
+        if self.backend == 'null':
+            self._stop_exception = CallbackStop
+            self.stream = NullOutputStream(
+                self.fs, self.block_size, 1, 'float32', self._callback, finished_callback=self._finished.set
+            )
+        else:
+            import sounddevice
+
+            self._stop_exception = sounddevice.CallbackStop
+            self.stream = sounddevice.OutputStream(
+                samplerate=self.fs, blocksize=self.block_size, device=self.device, channels=1, dtype='float32',
+                latency=self.latency, callback=self._callback, finished_callback=self._finished.set
+            )
+
+        self.stream.start()
+
+    def wait(self, timeout=None):
+        """
+        Wait until the playback ends.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum waiting time in seconds. If None, wait until the end of the sequence. Default is None.
+
+        Returns
+        -------
+        out : bool
+            Whether the playback ended.
+        """
+        finished = self._finished.wait(timeout)
+        if finished:
+            self.stream.close()
+        return finished
+
+    def stop(self):
+        """Stop the playback before the end of the sequence."""
+        if self.stream is not None:
+            self.stream.close()
+
+    def play(self):
+        """Play the sequence and wait until it ends."""
+        self.start()
+        try:
+            self.wait()
+        except KeyboardInterrupt:
+            self.stop()
+            raise
+
+    def timing_log(self):
+        """
+        Intended and reported output times of the onsets of the last playback.
+
+        Returns
+        -------
+        out : DataFrame
+            One row per onset, with the onset in samples ('onset'), its intended and reported output times in s
+            ('intended_time', 'reported_time'), on the clock of the audio backend, and the difference between them in ms
+            ('error_ms'). Onsets that were not played have NaN times.
+        """
+        intended = self._start_time + self.onsets / self.fs
+        return pd.DataFrame({
+            'onset': self.onsets,
+            'intended_time': intended,
+            'reported_time': self._reported,
+            'error_ms': (self._reported - intended) * 1000,
+        })
+
+
+def timing_summary(timing_log):
+    """
+    Summarize the timing errors of the onsets.
+
+    Parameters
+    ----------
+    timing_log : DataFrame
+        Timing log, as returned by `SequencePlayer.timing_log`.
+
+    Returns
+    -------
+    out : dict
+        Number of played onsets, and mean, standard deviation (jitter) and maximum absolute value of the timing errors
+        in ms.
+    """
+    errors = timing_log['error_ms'].dropna().to_numpy()
+    if len(errors) == 0:
+        return {'n_onsets': 0, 'error_mean': np.nan, 'error_sd': np.nan, 'error_max': np.nan}
+    return {
+        'n_onsets': len(errors),
+        'error_mean': np.mean(errors),
+        'error_sd': np.std(errors),
+        'error_max': np.max(np.abs(errors)),
+    }
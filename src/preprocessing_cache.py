@@ -0,0 +1,328 @@
+"""
+CACHE OF PREPROCESSED RECORDINGS
+================================
+This script stores the output of `load_and_preprocess` (time, filtered movement and sound) on disk as binary `.npy`
+files, so that re-running an analysis does not parse the CSV files and filter the movement again.
+
+Each cache entry is keyed by the hash of the content of the CSV file and by the preprocessing parameters (sampling
+frequency, cutoff frequency, filter order and data type). An entry is therefore never reused if the file or the
+parameters changed. Cached arrays are opened memory-mapped. When the cache exceeds its maximum size, the least
+recently used entries are removed.
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Functions
+---------
+get_cache_dir(cache_dir=None)
+    Get the directory of the cache.
+file_hash(file_path, chunk_size=1048576)
+    Compute the hash of the content of a file.
+cache_key(file_path, fs=5000, cutoff=20, order=4, dtype=np.float64)
+    Compute the key of a cache entry.
+load_and_preprocess_cached(file_path, fs=5000, cutoff=20, order=4, dtype=np.float64, cache_dir=None, max_size=DEFAULT_MAX_SIZE, mmap_mode='r')
+    Load and preprocess data from a CSV file, using the cache when possible.
+cache_info(cache_dir=None)
+    List the entries of the cache.
+evict(cache_dir=None, max_size=DEFAULT_MAX_SIZE)
+    Remove the least recently used entries until the cache fits in its maximum size.
+clear_cache(cache_dir=None)
+    Remove all the entries of the cache.
+
+Usage
+-----
+The cache can be inspected or cleared from the command line:
+    python -m src.preprocessing_cache info
+    python -m src.preprocessing_cache evict --max-size 2000
+    python -m src.preprocessing_cache clear
+
+Notes
+-----
+The location of the cache can be set with the `SMS_CACHE_DIR` environment variable. By default, the cache is stored in
+`~/.cache/protocol_sms`.
+"""
+
+
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import tempfile
+
+import numpy as np
+
+from src.stimulus_analysis import load_and_preprocess
+
+DEFAULT_MAX_SIZE = 5 * 1024**3  # 5 GB
+ARRAY_NAMES = ('t', 'mov', 'sound')
+
+
+def get_cache_dir(cache_dir=None):
+    """
+    Get the directory of the cache.
+
+    Parameters
+    ----------
+    cache_dir : str or Path, optional
+        Directory of the cache. If None, the `SMS_CACHE_DIR` environment variable is used, or `~/.cache/protocol_sms`
+        if it is not set. Default is None.
+
+    Returns
+    -------
+    out : Path
+        Directory of the cache.
+    """
+    if cache_dir is None:
+        cache_dir = os.getenv('SMS_CACHE_DIR', Path.home() / '.cache' / 'protocol_sms')
+    return Path(cache_dir)
+
+
+def file_hash(file_path, chunk_size=1024**2):
+    """
+    Compute the hash of the content of a file.
+
+    Parameters
+    ----------
+    file_path : str or Path
+        Path to the file.
+    chunk_size : int, optional
+        Number of bytes read at once. Default is 1 MB.
+
+    Returns
+    -------
+    out : str
+        Hexadecimal BLAKE2b digest of the content of the file.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(file_path, fs=5000, cutoff=20, order=4, dtype=np.float64):
+    """
+    Compute the key of a cache entry.
+
+    Parameters
+    ----------
+    file_path : str or Path
+        Path to the CSV file.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    cutoff : float, optional
+        Cutoff frequency for the low-pass filter in Hz. Default is 20.
+    order : int, optional
+        Order of the low-pass filter. Default is 4.
+    dtype : {np.float64, np.float32}, optional
+        Data type of the arrays. Default is np.float64.
+
+    Returns
+    -------
+    out : str
+        Key of the cache entry.
+    """
+    parameters = json.dumps(
+        {'file': file_hash(file_path), 'fs': fs, 'cutoff': cutoff, 'order': order, 'dtype': np.dtype(dtype).str},
+        sort_keys=True
+    )
+    return hashlib.blake2b(parameters.encode(), digest_size=20).hexdigest()
+
+
+def load_and_preprocess_cached(
+    file_path,
+    fs=5000,
+    cutoff=20,
+    order=4,
+    dtype=np.float64,
+    cache_dir=None,
+    max_size=DEFAULT_MAX_SIZE,
+    mmap_mode='r'
+):
+    """
+    Load and preprocess data from a CSV file, using the cache when possible.
+
+    If the cache has no entry for the file and the parameters, or if another process evicts the entry before it is
+    read, the file is processed with `load_and_preprocess`, and the result is stored in the cache and returned in memory.
+
+    Parameters
+    ----------
+    file_path : str or Path
+        Path to the CSV file.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    cutoff : float, optional
+        Cutoff frequency for the low-pass filter in Hz. Default is 20.
+    order : int, optional
+        Order of the low-pass filter. Default is 4.
+    dtype : {np.float64, np.float32}, optional
+        Data type of the arrays. Default is np.float64.
+    cache_dir : str or Path, optional
+        Directory of the cache. See `get_cache_dir`. Default is None.
+    max_size : int, optional
+        Maximum size of the cache in bytes. Default is 5 GB.
+    mmap_mode : {None, 'r', 'r+', 'c'}, optional
+        Memory-map mode used to open the cached arrays. If None, the arrays are loaded in memory. Default is 'r'.
+
+    Returns
+    -------
+    t : array
+        Time vector.
+    mov : array
+        Preprocessed goniometer data.
+    sound : array
+        Sound signal.
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    entry_dir = cache_dir / cache_key(file_path, fs=fs, cutoff=cutoff, order=order, dtype=dtype)
+
+    if entry_dir.is_dir():
+        try:
+            # Mark the entry as recently used
+            os.utime(entry_dir)
+            return tuple(np.load(entry_dir / f'{name}.npy', mmap_mode=mmap_mode) for name in ARRAY_NAMES)
+        except FileNotFoundError:
+            # Another process evicted the entry after the lookup, so the lookup is a miss
+            pass
+
+    arrays = load_and_preprocess(file_path, fs=fs, cutoff=cutoff, order=order, dtype=dtype)
+
+    # Write the entry in a temporary directory first, so that an interrupted write never leaves a partial entry
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=cache_dir, prefix='.tmp_'))
+    for name, array in zip(ARRAY_NAMES, arrays):
+        np.save(tmp_dir / f'{name}.npy', np.asarray(array))
+    try:
+        tmp_dir.rename(entry_dir)
+    except OSError:
+        # Another process stored the same entry in the meantime
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    evict(cache_dir, max_size=max_size)
+
+    return arrays
+
+
+def cache_info(cache_dir=None):
+    """
+    List the entries of the cache.
+
+    Parameters
+    ----------
+    cache_dir : str or Path, optional
+        Directory of the cache. See `get_cache_dir`. Default is None.
+
+    Returns
+    -------
+    out : list
+        List of dictionaries with the key, size in bytes and time of last use of each entry, from the least to the most
+        recently used.
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    if not cache_dir.is_dir():
+        return []
+
+    entries = []
+    for entry_dir in cache_dir.iterdir():
+        if not entry_dir.is_dir() or entry_dir.name.startswith('.'):
+            continue
+        try:
+            entries.append({
+                'key': entry_dir.name,
+                'size': sum(file.stat().st_size for file in entry_dir.iterdir()),
+                'last_used': entry_dir.stat().st_mtime,
+            })
+        except FileNotFoundError:
+            # Another process removed the entry during the scan
+            continue
+
+    return sorted(entries, key=lambda entry: entry['last_used'])
+
+
+def evict(cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+    """
+    Remove the least recently used entries until the cache fits in its maximum size.
+
+    The most recently used entry is always kept.
+
+    Parameters
+    ----------
+    cache_dir : str or Path, optional
+        Directory of the cache. See `get_cache_dir`. Default is None.
+    max_size : int, optional
+        Maximum size of the cache in bytes. Default is 5 GB.
+
+    Returns
+    -------
+    out : int
+        Number of removed entries.
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    entries = cache_info(cache_dir)
+    total_size = sum(entry['size'] for entry in entries)
+
+    n_removed = 0
+    for entry in entries[:-1]:
+        if total_size <= max_size:
+            break
+        shutil.rmtree(cache_dir / entry['key'], ignore_errors=True)
+        total_size -= entry['size']
+        n_removed += 1
+
+    return n_removed
+
+
+def clear_cache(cache_dir=None):
+    """
+    Remove all the entries of the cache.
+
+    Parameters
+    ----------
+    cache_dir : str or Path, optional
+        Directory of the cache. See `get_cache_dir`. Default is None.
+
+    Returns
+    -------
+    out : int
+        Number of removed entries.
+    """
+    cache_dir = get_cache_dir(cache_dir)
+    entries = cache_info(cache_dir)
+    for entry in entries:
+        shutil.rmtree(cache_dir / entry['key'], ignore_errors=True)
+
+    return len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or clear the cache of preprocessed recordings.")
+    parser.add_argument('command', choices=['info', 'evict', 'clear'])
+    parser.add_argument('--cache-dir', default=None, help="Directory of the cache.")
+    parser.add_argument('--max-size', type=float, default=DEFAULT_MAX_SIZE / 1024**2,
+                        help="Maximum size of the cache in MB, used by the 'evict' command.")
+    args = parser.parse_args(argv)
+
+    cache_dir = get_cache_dir(args.cache_dir)
+
+    if args.command == 'info':
+        entries = cache_info(cache_dir)
+        total_size = sum(entry['size'] for entry in entries)
+        print(f"Cache directory: {cache_dir}")
+        print(f"{len(entries)} entries, {total_size / 1024**2:.1f} MB")
+    elif args.command == 'evict':
+        n_removed = evict(cache_dir, max_size=int(args.max_size * 1024**2))
+        print(f"{n_removed} entries removed")
+    else:
+        n_removed = clear_cache(cache_dir)
+        print(f"{n_removed} entries removed")
+
+
+if __name__ == '__main__':
+    main()
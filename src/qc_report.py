@@ -0,0 +1,285 @@
+"""
+QUALITY CONTROL REPORT OF THE PROCESSED TRIALS
+==============================================
+This script renders the verification figures of every processed trial (detected peaks on the movement signal and
+detected stimuli on the sound signal) to PNG files, without displaying them, using several processes. It then writes one
+static HTML page per participant with the figures and the summary numbers of each trial, and an index page linking the
+participants, so that a whole cohort can be reviewed by scrolling.
+
+The trials are those processed by `batch_processing` or `manifest`, whose detected peaks and stimuli are saved as
+`<file name>.npz` in the results directory.
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Functions
+---------
+trial_summary(peaks, stim_onset, fs=5000)
+    Compute the summary numbers of a processed trial.
+render_trial(trial, results_dir='results', report_dir='report', fs=5000, use_cache=False, dpi=80)
+    Render the verification figures of one processed trial to PNG files.
+write_participant_page(participant, rendered, report_dir='report')
+    Write the HTML page of a participant.
+generate_report(data_dir='data', results_dir='results', report_dir='report', participants=None, tasks=None, max_workers=None, fs=5000, use_cache=False)
+    Render the verification figures of all the processed trials and write the HTML pages.
+
+Usage
+-----
+    python -m src.batch_processing data --results-dir results
+    python -m src.qc_report data results report --workers 4
+
+Notes
+-----
+Figures are drawn on figures that are not managed by pyplot, with the Agg canvas, so the report can be generated on a
+machine without display and the figures are freed as soon as they are saved.
+"""
+
+
+import argparse
+import html
+from pathlib import Path
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
+
+from src.batch_processing import discover_trials, ioi_statistics, load_trial, map_trials
+from src.peak_detection import plot_peak_on_movement
+from src.stimulus_analysis import plot_stimuli_on_sound_signal
+
+INDEX_NAME = 'index.html'
+PAGE_STYLE = """
+body { font-family: sans-serif; margin: 2em; }
+.trial { border-top: 1px solid #ccc; padding: 1em 0; }
+.error { color: #b00; }
+table { border-collapse: collapse; margin-bottom: 0.5em; }
+td, th { padding: 0.2em 0.8em; text-align: left; }
+img { max-width: 100%; display: block; }
+"""
+
+
+def trial_summary(peaks, stim_onset, fs=5000):
+    """
+    Compute the summary numbers of a processed trial.
+
+    Parameters
+    ----------
+    peaks : array
+        Detected peak indices.
+    stim_onset : array
+        Indices of stimulus onset times.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+
+    Returns
+    -------
+    out : dict
+        Number of stimuli and peaks, and statistics of the IOIs and movement frequencies. See `ioi_statistics`.
+    """
+    return {'n_stimuli': len(stim_onset), 'n_peaks': len(peaks), **ioi_statistics(peaks, fs=fs)}
+
+
+def render_trial(trial, results_dir='results', report_dir='report', fs=5000, use_cache=False, dpi=80):
+    """
+    Render the verification figures of one processed trial to PNG files.
+
+    A trial whose results or recording cannot be read gets an error message instead of its figures.
+
+    Parameters
+    ----------
+    trial : dict
+        Trial description, as returned by `discover_trials`.
+    results_dir : str or Path, optional
+        Directory containing the `<file name>.npz` results of the trial. Default is 'results'.
+    report_dir : str or Path, optional
+        Directory of the report. The figures are saved in one subdirectory per participant. Default is 'report'.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    use_cache : bool, optional
+        Whether to load the preprocessed recordings from the cache. See `load_and_preprocess_cached`. Default is False.
+    dpi : int, optional
+        Resolution of the figures. Default is 80.
+
+    Returns
+    -------
+    out : dict
+        Trial description, summary numbers, names of the figure files relative to the participant directory, and error
+        message if the figures could not be rendered.
+    """
+    file_path = Path(trial['file_path'])
+    file_name = file_path.stem
+    participant_dir = Path(report_dir) / trial['participant']
+    rendered = {**trial, 'file_name': file_name, 'figures': [], 'error': ''}
+
+    try:
+        with np.load(Path(results_dir) / f'{file_name}.npz') as results:
+            peaks, stim_onset, plateaus = results['peaks'], results['stim_onset'], results['plateaus']
+            task_onset = results['task_onset'] if 'task_onset' in results else stim_onset[0]
+            task_offset = results['task_offset'] if 'task_offset' in results else stim_onset[-1]
+        rendered.update(trial_summary(peaks, stim_onset, fs=fs))
+
+        mov, sound = load_trial(file_path, fs=fs, use_cache=use_cache)
+
+        participant_dir.mkdir(parents=True, exist_ok=True)
+
+        figure = Figure(figsize=(14, 5))
+        FigureCanvasAgg(figure)
+        plot_peak_on_movement(mov, peaks, stim_onset, plateaus, fs=fs, ax=figure.add_subplot(), show=False)
+        figure.savefig(participant_dir / f'{file_name}_peaks.png', dpi=dpi, bbox_inches='tight')
+        rendered['figures'].append(f'{file_name}_peaks.png')
+
+        figure = Figure(figsize=(14, 3))
+        FigureCanvasAgg(figure)
+        plot_stimuli_on_sound_signal(sound, stim_onset, task_onset, task_offset, fs=fs, ax=figure.add_subplot(),
+                                     show=False)
+        figure.savefig(participant_dir / f'{file_name}_sound.png', dpi=dpi, bbox_inches='tight')
+        rendered['figures'].append(f'{file_name}_sound.png')
+
+    except Exception as error:
+        rendered['error'] = f'{type(error).__name__}: {error}'
+
+    return rendered
+
+
+def write_participant_page(participant, rendered, report_dir='report'):
+    """
+    Write the HTML page of a participant.
+
+    Parameters
+    ----------
+    participant : str
+        Participant identifier.
+    rendered : list
+        Rendered trials of the participant, as returned by `render_trial`.
+    report_dir : str or Path, optional
+        Directory of the report. Default is 'report'.
+
+    Returns
+    -------
+    out : Path
+        Path of the HTML page.
+    """
+    participant_dir = Path(report_dir) / participant
+    participant_dir.mkdir(parents=True, exist_ok=True)
+
+    sections = []
+    for trial in rendered:
+        summary = ''.join(
+            f'<td>{trial[name]:.3f}</td>' if name.startswith('ioi') else f'<td>{trial[name]}</td>'
+            for name in ('n_stimuli', 'n_peaks', 'ioi_mean', 'ioi_sd', 'ioi_cv') if name in trial
+        )
+        figures = ''.join(f'<img src="{html.escape(figure)}" loading="lazy">' for figure in trial['figures'])
+        error = f'<p class="error">{html.escape(trial["error"])}</p>' if trial['error'] else ''
+        sections.append(
+            f'<div class="trial" id="{html.escape(trial["file_name"])}">'
+            f'<h2>{html.escape(trial["file_name"])}</h2>'
+            f'<table><tr><th>Stimuli</th><th>Peaks</th><th>IOI mean (s)</th><th>IOI SD (s)</th><th>IOI CV (%)</th>'
+            f'</tr><tr>{summary}</tr></table>{error}{figures}</div>'
+        )
+
+    page_path = participant_dir / INDEX_NAME
+    page_path.write_text(
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(participant)}</title>'
+        f'<style>{PAGE_STYLE}</style></head><body><h1>{html.escape(participant)}</h1>'
+        f'<p><a href="../{INDEX_NAME}">All participants</a></p>{"".join(sections)}</body></html>'
+    )
+
+    return page_path
+
+
+def generate_report(
+    data_dir='data',
+    results_dir='results',
+    report_dir='report',
+    participants=None,
+    tasks=None,
+    max_workers=None,
+    fs=5000,
+    use_cache=False
+):
+    """
+    Render the verification figures of all the processed trials and write the HTML pages.
+
+    Trials without results in the results directory are ignored. Trials are rendered in parallel in a pool of processes.
+
+    Parameters
+    ----------
+    data_dir : str or Path, optional
+        Directory containing one subdirectory per participant. Default is 'data'.
+    results_dir : str or Path, optional
+        Directory containing the `<file name>.npz` results of the trials. Default is 'results'.
+    report_dir : str or Path, optional
+        Directory of the report. Default is 'report'.
+    participants : list, optional
+        Participants to include. If None, all participants are included. Default is None.
+    tasks : list, optional
+        Tasks to include, as written in the file names (e.g., 'Pref', 'synch'). If None, all tasks are included.
+        Default is None.
+    max_workers : int, optional
+        Number of processes. See `map_trials`. Default is None.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    use_cache : bool, optional
+        Whether to load the preprocessed recordings from the cache. Default is False.
+
+    Returns
+    -------
+    out : Path
+        Path of the index page of the report.
+    """
+    trials = [
+        trial for trial in discover_trials(data_dir, participants=participants, tasks=tasks)
+        if (Path(results_dir) / f'{Path(trial["file_path"]).stem}.npz').is_file()
+    ]
+    rendered = map_trials(
+        render_trial, trials, max_workers=max_workers, results_dir=results_dir, report_dir=report_dir, fs=fs,
+        use_cache=use_cache
+    )
+
+    # One page per participant, and an index of the participants
+    links = []
+    for participant in sorted({trial['participant'] for trial in rendered}):
+        participant_trials = [trial for trial in rendered if trial['participant'] == participant]
+        write_participant_page(participant, participant_trials, report_dir=report_dir)
+        n_errors = sum(trial['error'] != '' for trial in participant_trials)
+        links.append(
+            f'<li><a href="{html.escape(participant)}/{INDEX_NAME}">{html.escape(participant)}</a> '
+            f'({len(participant_trials)} trials{f", {n_errors} errors" if n_errors else ""})</li>'
+        )
+
+    index_path = Path(report_dir) / INDEX_NAME
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    index_path.write_text(
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Quality control</title>'
+        f'<style>{PAGE_STYLE}</style></head><body><h1>Quality control</h1><ul>{"".join(links)}</ul></body></html>'
+    )
+
+    return index_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the verification figures of the processed trials.")
+    parser.add_argument('data_dir', nargs='?', default='data', help="Directory containing one folder per participant.")
+    parser.add_argument('results_dir', nargs='?', default='results', help="Directory of the results.")
+    parser.add_argument('report_dir', nargs='?', default='report', help="Directory of the report.")
+    parser.add_argument('--participants', nargs='+', default=None, help="Participants to include.")
+    parser.add_argument('--tasks', nargs='+', default=None, help="Tasks to include.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of processes.")
+    parser.add_argument('--fs', type=int, default=5000, help="Sampling frequency in Hz.")
+    parser.add_argument('--cache', action='store_true', help="Load the preprocessed recordings from the cache.")
+    args = parser.parse_args(argv)
+
+    index_path = generate_report(
+        args.data_dir, args.results_dir, args.report_dir, participants=args.participants, tasks=args.tasks,
+        max_workers=args.workers, fs=args.fs, use_cache=args.cache
+    )
+    print(f"Report written to {index_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+RECORDING OF A TRIAL
+====================
+This script defines the `Recording` class, which wraps the CSV file of one trial and gives access to the stages of the
+analysis pipeline (preprocessed movement and sound, detected stimuli and plateaus, detected peaks) as attributes.
+
+Each stage is computed the first time it is accessed and kept in memory, so that no stage is computed twice. When a
+parameter changes, only the stages that depend on it are computed again. Arrays are stored compactly: indices as 32-bit
+integers, signals as 32-bit floats when the conversion is lossless, and the time vector is computed on demand from the
+sampling frequency instead of being stored.
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Classes
+-------
+Recording(file_path, task=None, fs=5000, cutoff=20, order=4, peak_parameters=None, custom_params_path=None)
+    Trial recording with lazily computed analysis stages.
+
+Functions
+---------
+compact(array)
+    Convert an array to the smallest data type that represents it exactly.
+
+Usage
+-----
+    recording = Recording('data/P01/P01_synch__1.csv')
+    recording.peaks                                 # Loads, filters, detects the stimuli and the peaks
+    recording.set_parameters(peak_threshold=40)     # Only the peaks are detected again
+    recording.peaks
+"""
+
+
+from pathlib import Path
+
+import numpy as np
+
+from src.batch_processing import FILE_PATTERN, TASKS
+from src.peak_detection import get_custom_parameters, identify_peak_flexion
+from src.stimulus_analysis import load_and_preprocess, detect_stimuli
+
+
+def compact(array):
+    """
+    Convert an array to the smallest data type that represents it exactly.
+
+    Integer arrays are converted to 32-bit integers if their values fit, and float arrays to 32-bit floats if the
+    conversion does not change any value. Other arrays are returned unchanged.
+
+    Parameters
+    ----------
+    array : array_like
+        The input array.
+
+    Returns
+    -------
+    out : ndarray
+        The array, converted if possible.
+    """
+    array = np.asarray(array)
+
+    if np.issubdtype(array.dtype, np.integer) and array.dtype.itemsize > 4:
+        info = np.iinfo(np.int32)
+        if array.size == 0 or (array.min() >= info.min and array.max() <= info.max):
+            return array.astype(np.int32)
+
+    elif np.issubdtype(array.dtype, np.floating) and array.dtype.itemsize > 4:
+        converted = array.astype(np.float32)
+        if np.array_equal(converted, array, equal_nan=True):
+            return converted
+
+    return array
+
+
+class Recording:
+    """
+    Trial recording with lazily computed analysis stages.
+
+    Parameters
+    ----------
+    file_path : str or Path
+        Path to the CSV file of the trial.
+    task : {'synch', 'adapt', 'conti', 'SMT'}, optional
+        Task identifier. If None, it is deduced from the file name (e.g., 'P01_Pref__1.csv' is an 'SMT' trial). Default
+        is None.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    cutoff : float, optional
+        Cutoff frequency for the low-pass filter of the movement in Hz. Default is 20.
+    order : int, optional
+        Order of the low-pass filter. Default is 4.
+    peak_parameters : dict, optional
+        Peak detection parameters passed to `identify_peak_flexion`. If None, the custom parameters of the file are used
+        (see `get_custom_parameters`). Default is None.
+    custom_params_path : str or Path, optional
+        Path to the csv file containing custom peak detection parameters. See `load_custom_parameters`. Default is
+        None.
+
+    Attributes
+    ----------
+    t : ndarray
+        Time vector in seconds, computed on demand.
+    movement : ndarray
+        Preprocessed goniometer data.
+    sound : ndarray
+        Sound signal.
+    stim_onset : ndarray
+        Indices of stimulus onset times.
+    plateaus : ndarray
+        Plateau start and end indices as (start, end) pairs.
+    frequencies : array
+        Stimulus frequencies for each plateau.
+    task_onset, task_offset : int
+        Indices of task onset and offset.
+    peaks : ndarray
+        Detected peak indices.
+    iois : ndarray
+        Inter-onset intervals of the peaks in seconds.
+    """
+
+    __slots__ = (
+        'file_path', 'task', '_fs', '_cutoff', '_order', '_peak_parameters', '_movement', '_sound', '_stimuli', '_peaks'
+    )
+
+    def __init__(
+        self, file_path, task=None, fs=5000, cutoff=20, order=4, peak_parameters=None, custom_params_path=None
+    ):
+        self.file_path = Path(file_path)
+        if task is None:
+            match = FILE_PATTERN.match(self.file_path.name)
+            if match is None or match['task'] not in TASKS:
+                raise ValueError(f"Cannot deduce the task from the file name {self.file_path.name}.")
+            task = TASKS[match['task']]
+        self.task = task
+
+        self._fs = fs
+        self._cutoff = cutoff
+        self._order = order
+        if peak_parameters is None:
+            peak_parameters = get_custom_parameters(self.file_path.stem, custom_params_path) or {}
+        self._peak_parameters = dict(peak_parameters)
+        self.invalidate()
+
+    def __repr__(self):
+        stages = [name for name, value in (
+            ('movement', self._movement), ('stimuli', self._stimuli), ('peaks', self._peaks)
+        ) if value is not None]
+        return f"Recording('{self.file_path}', task='{self.task}', computed={stages})"
+
+    def invalidate(self, stage='movement'):
+        """
+        Discard a computed stage and the stages that depend on it.
+
+        Parameters
+        ----------
+        stage : {'movement', 'stimuli', 'peaks'}, optional
+            First stage to discard. 'movement' discards the loaded signals and all the stages. Default is 'movement'.
+        """
+        if stage not in ('movement', 'stimuli', 'peaks'):
+            raise ValueError("Stage must be 'movement', 'stimuli' or 'peaks'.")
+        if stage == 'movement':
+            self._movement = None
+            self._sound = None
+        if stage in ('movement', 'stimuli'):
+            self._stimuli = None
+        self._peaks = None
+
+    def set_parameters(self, fs=None, cutoff=None, order=None, task=None, **peak_parameters):
+        """
+        Change parameters and discard the stages that depend on them.
+
+        Parameters
+        ----------
+        fs : int, optional
+            Sampling frequency in Hz. Discards all the stages.
+        cutoff : float, optional
+            Cutoff frequency for the low-pass filter in Hz. Discards all the stages.
+        order : int, optional
+            Order of the low-pass filter. Discards all the stages.
+        task : str, optional
+            Task identifier. Discards the stimuli and the peaks.
+        **peak_parameters
+            Peak detection parameters (e.g., peak_threshold=40). They update the current ones. Discard the peaks.
+        """
+        preprocessing = {'_fs': fs, '_cutoff': cutoff, '_order': order}
+        if any(value is not None and value != getattr(self, name) for name, value in preprocessing.items()):
+            for name, value in preprocessing.items():
+                if value is not None:
+                    setattr(self, name, value)
+            self.invalidate('movement')
+
+        if task is not None and task != self.task:
+            self.task = task
+            self.invalidate('stimuli')
+
+        if any(self._peak_parameters.get(name) != value for name, value in peak_parameters.items()):
+            self._peak_parameters.update(peak_parameters)
+            self.invalidate('peaks')
+
+    @property
+    def fs(self):
+        return self._fs
+
+    @property
+    def peak_parameters(self):
+        return dict(self._peak_parameters)
+
+    @property
+    def t(self):
+        return np.arange(len(self.movement)) / self._fs
+
+    @property
+    def movement(self):
+        if self._movement is None:
+            _, movement, sound = load_and_preprocess(
+                self.file_path, fs=self._fs, cutoff=self._cutoff, order=self._order, with_time=False
+            )
+            self._movement = compact(movement)
+            self._sound = compact(sound)
+        return self._movement
+
+    @property
+    def sound(self):
+        if self._sound is None:
+            self.movement
+        return self._sound
+
+    def _detect_stimuli(self):
+        if self._stimuli is None:
+            stim_onset, _, plateaus, frequencies, task_onset, task_offset = detect_stimuli(
+                self.sound, task=self.task, fs=self._fs
+            )
+            self._stimuli = {
+                'stim_onset': compact(stim_onset),
+                'plateaus': compact(plateaus),
+                'frequencies': frequencies,
+                'task_onset': int(task_onset),
+                'task_offset': int(task_offset),
+            }
+        return self._stimuli
+
+    @property
+    def stim_onset(self):
+        return self._detect_stimuli()['stim_onset']
+
+    @property
+    def plateaus(self):
+        return self._detect_stimuli()['plateaus']
+
+    @property
+    def frequencies(self):
+        return self._detect_stimuli()['frequencies']
+
+    @property
+    def task_onset(self):
+        return self._detect_stimuli()['task_onset']
+
+    @property
+    def task_offset(self):
+        return self._detect_stimuli()['task_offset']
+
+    @property
+    def peaks(self):
+        if self._peaks is None:
+            self._peaks = compact(identify_peak_flexion(
+                self.movement, self.stim_onset, self.plateaus, self.task, fs=self._fs, **self._peak_parameters
+            ))
+        return self._peaks
+
+    @property
+    def iois(self):
+        return np.diff(self.peaks) / self._fs
+
+    @property
+    def nbytes(self):
+        """Memory used by the computed arrays in bytes."""
+        arrays = [self._movement, self._sound, self._peaks]
+        if self._stimuli is not None:
+            arrays += [self._stimuli['stim_onset'], self._stimuli['plateaus']]
+        return sum(array.nbytes for array in arrays if array is not None)
@@ -0,0 +1,413 @@
+"""
+ROUND-TRIP BENCHMARK OF THE STIMULUS DETECTION
+==============================================
+This script checks that the stimulus sequences of the protocol come back correctly through the stimulus detection. Each
+sequence is rendered as it is played (see `render_sequence`), acquired at the sampling frequency of the recordings with
+a configurable noise and clock drift, and analyzed with `detect_stimuli`. The detected onsets and plateaus are compared
+with those of the schedule, and the time taken by the detection is measured, so that the detection parameters (e.g.,
+`decimation`, `plateau_tolerance`) can be tuned without losing accuracy.
+
+The configurations span all the tasks and the whole range of stimulus frequencies of the protocol (0.9 to 7 Hz).
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Functions
+---------
+acquire(samples, fs_audio=48000, fs=5000, noise=0, drift=0, delay=1, seed=None)
+    Simulate the acquisition of a rendered sequence.
+acquired_times(onsets, fs_audio=48000, drift=0, delay=1)
+    Times of the onsets of a rendered sequence on the clock of the acquisition.
+expected_plateaus(frequencies, n_stimuli_per_plateau, n_stimuli_first_plateau=None)
+    Plateaus of a 'synch' sequence, as returned by `identify_plateaus`.
+roundtrip_parameters(task, frequency=None, condition=None)
+    Parameters of the sequence of a configuration.
+roundtrip_configurations(frequencies=FREQUENCIES)
+    Configurations spanning all the tasks and the range of stimulus frequencies.
+roundtrip_trial(parameters, samples, onsets, fs=5000, noise=0, drift=0, delay=1, seed=None, **detection)
+    Acquire and analyze one sequence, and compare the detection with the schedule.
+roundtrip_benchmark(configurations=None, noise=(0,), drift=(0,), decimation=(1,), fs=5000, seed=0, output_path=None)
+    Run the round trip for each configuration and acquisition condition.
+
+Usage
+-----
+    python -m src.roundtrip_benchmark --noise 0 0.01 0.03 --drift 0 200 --decimation 1 10 --output roundtrip.csv
+
+Notes
+-----
+The onset errors include the delay of the detection threshold on the ramp of the tones (about 0.5 ms for a 5 ms ramp and
+a threshold of 0.1), so their mean is slightly positive even without noise.
+"""
+
+
+import argparse
+from math import gcd
+from pathlib import Path
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy.signal import resample_poly
+
+from src.schedule import trial_parameters
+from src.sequence_cache import FS, render_sequence, trial_onsets
+from src.stimulus_analysis import detect_stimuli
+
+
+# Stimulus frequencies of the 'adapt' and 'conti' configurations, in Hz
+FREQUENCIES = (0.9, 1.5, 2.5, 4, 5.5, 7)
+
+
+def acquire(samples, fs_audio=FS, fs=5000, noise=0, drift=0, delay=1, seed=None):
+    """
+    Simulate the acquisition of a rendered sequence.
+
+    The sequence is resampled to the acquisition frequency with an anti-aliasing filter, delayed, and a Gaussian noise
+    is added. With a clock drift, the acquisition samples are taken at `(1 + drift * 1e-6) / fs` s intervals of the
+    clock of the audio output, i.e., the acquisition clock is slower than the audio clock for a positive drift.
+
+    Parameters
+    ----------
+    samples : array
+        Samples of the sequence, as returned by `render_sequence`.
+    fs_audio : int, optional
+        Sampling frequency of the sequence in Hz. Default is 48000.
+    fs : int, optional
+        Sampling frequency of the acquisition in Hz. Default is 5000.
+    noise : float, optional
+        Standard deviation of the noise, relative to the maximum absolute value of the sequence. Default is 0.
+    drift : float, optional
+        Drift of the acquisition clock relative to the audio clock in parts per million. Default is 0.
+    delay : float, optional
+        Time in s between the start of the acquisition and the start of the sequence. Default is 1.
+    seed : int, optional
+        Seed of the noise. Default is None.
+
+    Returns
+    -------
+    sound : ndarray
+        Acquired sound signal.
+    """
+    divisor = gcd(fs, fs_audio)
+    sound = resample_poly(np.asarray(samples, dtype=float), fs // divisor, fs_audio // divisor)
+    sound = np.concatenate((np.zeros(int(round(delay * fs))), sound, np.zeros(fs)))
+
+    if drift:
+        positions = np.arange(int(len(sound) / (1 + drift * 1e-6))) * (1 + drift * 1e-6)
+        sound = np.interp(positions, np.arange(len(sound)), sound)
+
+    if noise:
+        scale = noise * np.max(np.abs(samples))
+        sound = sound + np.random.default_rng(seed).normal(0, scale, len(sound))
+
+    return sound
+
+
+def acquired_times(onsets, fs_audio=FS, drift=0, delay=1):
+    """
+    Times of the onsets of a rendered sequence on the clock of the acquisition.
+
+    Parameters
+    ----------
+    onsets : array
+        Onsets of the sounds of the sequence in samples of the audio output, as returned by `trial_onsets`.
+    fs_audio : int, optional
+        Sampling frequency of the sequence in Hz. Default is 48000.
+    drift, delay : float, optional
+        Clock drift in ppm and delay in s of the acquisition. See `acquire`. Default is 0 and 1.
+
+    Returns
+    -------
+    out : ndarray
+        Times of the onsets in s, from the start of the acquisition.
+    """
+    return (delay + np.asarray(onsets) / fs_audio) / (1 + drift * 1e-6)
+
+
+def expected_plateaus(frequencies, n_stimuli_per_plateau, n_stimuli_first_plateau=None):
+    """
+    Plateaus of a 'synch' sequence, as returned by `identify_plateaus`.
+
+    Parameters
+    ----------
+    frequencies : array
+        Frequencies of the plateaus in Hz.
+    n_stimuli_per_plateau : int
+        Number of stimuli per plateau.
+    n_stimuli_first_plateau : int, optional
+        Number of stimuli of the first plateau. If None, `n_stimuli_per_plateau` is used. Default is None.
+
+    Returns
+    -------
+    plateaus : ndarray
+        Plateau start and end indices in the stimuli (without the start and end bips) as (start, end) pairs. The last
+        plateau includes the stimulus that ends its last interval.
+    """
+    n_stimuli = np.full(len(frequencies), n_stimuli_per_plateau)
+    if n_stimuli_first_plateau is not None:
+        n_stimuli[:1] = n_stimuli_first_plateau
+
+    starts = np.concatenate(([0], np.cumsum(n_stimuli)[:-1]))
+    ends = np.concatenate((starts[1:] - 1, [np.sum(n_stimuli)]))
+    return np.column_stack((starts, ends))
+
+
+def roundtrip_parameters(task, frequency=None, condition=None):
+    """
+    Parameters of the sequence of a configuration.
+
+    Parameters
+    ----------
+    task : {'SMT', 'adapt', 'conti', 'synch'}
+        Task of the sequence.
+    frequency : float, optional
+        Stimulus frequency in Hz of the 'adapt' and 'conti' sequences, reached in the faster condition of a participant
+        whose SMT is `frequency / 1.5`. Not used for 'SMT' and 'synch'. Default is None.
+    condition : {'I', 'D'}, optional
+        Condition of the 'synch' sequences. Default is None.
+
+    Returns
+    -------
+    out : dict
+        Arguments of `render_sequence`, as returned by `trial_parameters`.
+    """
+    if task in ('adapt', 'conti'):
+        return trial_parameters(task, 'F', smt=np.round(frequency / 1.5, 2))
+    return trial_parameters(task, condition)
+
+
+def roundtrip_configurations(frequencies=FREQUENCIES):
+    """
+    Configurations spanning all the tasks and the range of stimulus frequencies.
+
+    Parameters
+    ----------
+    frequencies : list, optional
+        Stimulus frequencies of the 'adapt' and 'conti' configurations in Hz. Default is `FREQUENCIES`.
+
+    Returns
+    -------
+    out : list of dict
+        Configurations, with a label ('label') and the arguments of `render_sequence` ('parameters').
+    """
+    configurations = [{'label': 'SMT', 'parameters': roundtrip_parameters('SMT')}]
+    for task in ('adapt', 'conti'):
+        configurations += [
+            {'label': f"{task}_{frequency:g}Hz", 'parameters': roundtrip_parameters(task, frequency)}
+            for frequency in frequencies
+        ]
+    configurations += [
+        {'label': f"synch_{condition}", 'parameters': roundtrip_parameters('synch', condition=condition)}
+        for condition in ('I', 'D')
+    ]
+    return configurations
+
+
+def roundtrip_trial(parameters, samples, onsets, fs=5000, noise=0, drift=0, delay=1, seed=None, **detection):
+    """
+    Acquire and analyze one sequence, and compare the detection with the schedule.
+
+    Parameters
+    ----------
+    parameters : dict
+        Arguments of `render_sequence` of the sequence.
+    samples : array
+        Samples of the sequence, as returned by `render_sequence`.
+    onsets : array
+        Onsets of the sounds of the sequence in samples of the audio output, as returned by `trial_onsets`.
+    fs : int, optional
+        Sampling frequency of the acquisition in Hz. Default is 5000.
+    noise, drift, delay, seed : float, optional
+        Acquisition conditions. See `acquire`.
+    **detection
+        Parameters of `detect_stimuli` (e.g., decimation=10, plateau_tolerance=0.003).
+
+    Returns
+    -------
+    out : dict
+        Number of expected, missed and extra stimuli, mean, standard deviation and maximum absolute value of the onset
+        errors in ms, and detection time in s and speed (duration of the recording divided by the detection time). For
+        'synch' sequences, also the number of expected and detected plateaus, the proportion of plateaus detected
+        exactly (`plateau_accuracy`), and the largest error of the plateau frequencies in Hz. For 'adapt' and 'conti'
+        sequences, the error of the stimulus frequency in Hz.
+    """
+    task = parameters['task']
+    sound = acquire(samples, fs=fs, noise=noise, drift=drift, delay=delay, seed=seed)
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        start = time.perf_counter()
+        _, stim_times, plateaus, frequencies, _, _ = detect_stimuli(
+            sound, task=task, fs=fs, subsample=True, **detection
+        )
+        detection_time = time.perf_counter() - start
+
+    # The start and end bips of 'synch' sequences are not returned among the stimuli
+    true_times = acquired_times(onsets, drift=drift, delay=delay)
+    if task == 'synch':
+        true_times = true_times[1:-1]
+
+    # Each expected stimulus is matched with the nearest detected one, within 50 ms and half of the shortest interval
+    max_error = min(np.min(np.diff(true_times)) / 2, 0.05)
+    if len(stim_times):
+        after = np.clip(np.searchsorted(stim_times, true_times), 0, len(stim_times) - 1)
+        before = np.maximum(after - 1, 0)
+        errors_before, errors_after = stim_times[before] - true_times, stim_times[after] - true_times
+        errors = np.where(np.abs(errors_before) < np.abs(errors_after), errors_before, errors_after)
+    else:
+        errors = np.full(len(true_times), np.inf)
+    matched = np.abs(errors) <= max_error
+    errors = errors[matched] * 1000
+
+    result = {
+        'n_expected': len(true_times),
+        'n_missed': int(np.count_nonzero(~matched)),
+        'n_extra': len(stim_times) - int(np.count_nonzero(matched)),
+        'onset_error_mean': np.mean(errors) if len(errors) else np.nan,
+        'onset_error_sd': np.std(errors) if len(errors) else np.nan,
+        'onset_error_max': np.max(np.abs(errors)) if len(errors) else np.nan,
+        'n_warnings': len(caught),
+        'detection_time': detection_time,
+        'speed': len(sound) / fs / detection_time,
+    }
+
+    if task == 'synch':
+        expected = expected_plateaus(
+            parameters['frequencies'], parameters['n_stimuli_per_plateau'], parameters.get('n_stimuli_first_plateau')
+        )
+        detected = {tuple(plateau) for plateau in np.asarray(plateaus).tolist()}
+        result['n_plateaus'] = len(expected)
+        result['n_plateaus_detected'] = len(plateaus)
+        result['plateau_accuracy'] = np.mean([tuple(plateau) in detected for plateau in expected.tolist()])
+        result['frequency_error'] = (
+            np.max(np.abs(np.asarray(frequencies) - parameters['frequencies']))
+            if len(frequencies) == len(expected) else np.nan
+        )
+    elif task == 'conti':
+        result['frequency_error'] = abs(frequencies - parameters['frequencies'][0])
+    elif task == 'adapt':
+        # The second frequency is that of the adaptation, after the reminder of the SMT
+        result['frequency_error'] = abs(frequencies - parameters['frequencies'][1])
+
+    return result
+
+
+def roundtrip_benchmark(
+    configurations=None, noise=(0,), drift=(0,), decimation=(1,), fs=5000, seed=0, output_path=None, **detection
+):
+    """
+    Run the round trip for each configuration and acquisition condition.
+
+    Each sequence is rendered once, and acquired and analyzed for each combination of noise, clock drift and decimation.
+
+    Parameters
+    ----------
+    configurations : list of dict, optional
+        Configurations, as returned by `roundtrip_configurations`. If None, all the default configurations are used.
+        Default is None.
+    noise : list, optional
+        Noise levels, relative to the maximum absolute value of the sequences. Default is (0,).
+    drift : list, optional
+        Clock drifts of the acquisition in ppm. Default is (0,).
+    decimation : list, optional
+        Decimation factors of the onset detection. See `detect_onsets`. Default is (1,).
+    fs : int, optional
+        Sampling frequency of the acquisition in Hz. Default is 5000.
+    seed : int, optional
+        Seed of the noise. Default is 0.
+    output_path : str or Path, optional
+        Csv file in which the results are written. If None, the results are not written. Default is None.
+    **detection
+        Other parameters of `detect_stimuli` (e.g., plateau_tolerance=0.003).
+
+    Returns
+    -------
+    results : DataFrame
+        One row per configuration and acquisition condition, with the results of `roundtrip_trial` and the time taken
+        to render the sequence in s.
+    """
+    if configurations is None:
+        configurations = roundtrip_configurations()
+
+    rows = []
+    for configuration in configurations:
+        parameters = configuration['parameters']
+
+        start = time.perf_counter()
+        samples, _ = render_sequence(**parameters)
+        render_time = time.perf_counter() - start
+        onsets = trial_onsets(**parameters)
+
+        # Sequences of 'synch' trials are checked with their own plateau lengths
+        if parameters['task'] == 'synch':
+            n_stimuli = {
+                'n_stimuli_per_plateau': parameters['n_stimuli_per_plateau'],
+                'n_stimuli_first_plateau': parameters.get('n_stimuli_first_plateau') or
+                                           parameters['n_stimuli_per_plateau'],
+            }
+        else:
+            n_stimuli = {}
+
+        for noise_level in noise:
+            for drift_ppm in drift:
+                for factor in decimation:
+                    result = roundtrip_trial(
+                        parameters, samples, onsets, fs=fs, noise=noise_level, drift=drift_ppm, seed=seed,
+                        decimation=factor, **n_stimuli, **detection
+                    )
+                    rows.append({
+                        'label': configuration['label'], 'task': parameters['task'], 'noise': noise_level,
+                        'drift': drift_ppm, 'decimation': factor, 'duration': len(samples) / FS,
+                        'render_time': render_time, **result
+                    })
+
+    results = pd.DataFrame(rows)
+    if output_path is not None:
+        results.to_csv(output_path, index=False)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the stimulus detection on rendered and acquired sequences.")
+    parser.add_argument('--frequencies', nargs='+', type=float, default=list(FREQUENCIES),
+                        help="Stimulus frequencies of the 'adapt' and 'conti' sequences in Hz.")
+    parser.add_argument('--tasks', nargs='+', default=['SMT', 'adapt', 'conti', 'synch'],
+                        choices=['SMT', 'adapt', 'conti', 'synch'], help="Tasks to include.")
+    parser.add_argument('--noise', nargs='+', type=float, default=[0], help="Noise levels.")
+    parser.add_argument('--drift', nargs='+', type=float, default=[0], help="Clock drifts in ppm.")
+    parser.add_argument('--decimation', nargs='+', type=int, default=[1], help="Decimation factors of the detection.")
+    parser.add_argument('--plateau-tolerance', type=float, default=0.003,
+                        help="Largest change in s of the interval within a plateau.")
+    parser.add_argument('--fs', type=int, default=5000, help="Sampling frequency of the acquisition in Hz.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the noise.")
+    parser.add_argument('--output', default=None, help="Csv file in which the results are written.")
+    args = parser.parse_args(argv)
+
+    configurations = [
+        configuration for configuration in roundtrip_configurations(args.frequencies)
+        if configuration['parameters']['task'] in args.tasks
+    ]
+    results = roundtrip_benchmark(
+        configurations, noise=args.noise, drift=args.drift, decimation=args.decimation, fs=args.fs, seed=args.seed,
+        output_path=args.output, plateau_tolerance=args.plateau_tolerance
+    )
+
+    columns = [
+        'label', 'noise', 'drift', 'decimation', 'n_expected', 'n_missed', 'n_extra', 'onset_error_mean',
+        'onset_error_max', 'plateau_accuracy', 'frequency_error', 'speed'
+    ]
+    with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.precision', 3):
+        print(results.reindex(columns=columns).to_string(index=False))
+    if args.output is not None:
+        print(f"Results written to {Path(args.output)}")
+
+
+if __name__ == '__main__':
+    main()
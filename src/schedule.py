@@ -0,0 +1,332 @@
+"""
+SCHEDULE OF THE STIMULI OF A SESSION
+====================================
+This script builds the inter-onset intervals (IOIs) and onsets of the stimulus sequences as NumPy arrays, and the
+schedule of all the trials of a participant's session in one call, in the order given by `randomize_conditions`. The
+onsets are given in samples at the sampling frequency of the audio output, so that they can be used directly to render
+and play the sequences (see `render_sequence_samples` and `SequencePlayer`).
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Functions
+---------
+synch_frequencies(condition, low=1, high=7, step=0.3)
+    Frequencies of the plateaus of a 'synch' trial.
+sequence_onsets_ms(ioi_list)
+    Onsets of a sequence in ms, rounded as by thebeat.
+sequence_onsets(ioi_list, fs=48000)
+    Onsets of a sequence in samples.
+trial_iois(task, frequencies=(), n_stimuli_per_plateau=0, n_stimuli_first_plateau=None, silence_around_stim=None, jitter=0, seed=None)
+    Inter-onset intervals of a stimulus sequence.
+trial_parameters(task, condition=None, smt=None)
+    Parameters of the stimulus sequence of a trial, as in `generate_stimuli.ipynb`.
+trial_schedule(task, condition=None, smt=None, fs=48000)
+    Schedule of the stimulus sequence of a trial.
+build_session(participant_number, smt, fs=48000, n_smt_trials=5)
+    Schedules of all the trials of a participant, in the randomized order.
+
+Usage
+-----
+    session = build_session(participant_number, SMT)
+    trial = session['synch'][0]
+    trial['condition'], trial['iois'], trial['onsets']
+"""
+
+
+import numpy as np
+
+from src.condition_randomization import randomize_conditions
+
+
+def synch_frequencies(condition, low=1, high=7, step=0.3):
+    """
+    Frequencies of the plateaus of a 'synch' trial.
+
+    The frequencies are the same as `np.arange(low, high + step / 3, step)` for increasing frequencies, and
+    `np.arange(high, low - step / 3, -step)` for decreasing frequencies, without the risk of a missing or extra plateau
+    due to rounding.
+
+    Parameters
+    ----------
+    condition : {'I', 'D'}
+        Increasing ('I') or decreasing ('D') frequencies.
+    low, high : float, optional
+        Lowest and highest frequencies in Hz. Default is 1 and 7.
+    step : float, optional
+        Frequency difference between consecutive plateaus in Hz. Default is 0.3.
+
+    Returns
+    -------
+    out : ndarray
+        Frequencies of the plateaus in Hz.
+    """
+    if condition not in ('I', 'D'):
+        raise ValueError("Condition must be 'I' or 'D'.")
+
+    # Same arithmetic as np.arange, so that the frequencies are identical to those of the notebook
+    steps = np.arange(int(round((high - low) / step)) + 1)
+    if condition == 'I':
+        return low + steps * ((low + step) - low)
+    return high + steps * ((high - step) - high)
+
+
+def sequence_onsets_ms(ioi_list):
+    """
+    Onsets of a sequence in ms, rounded as by thebeat.
+
+    The onsets are rounded to the ms as by `Sequence.round_onsets` in `create_sequence`, and computed again from the
+    rounded IOIs as by `Sequence.onsets`.
+
+    Parameters
+    ----------
+    ioi_list : list or array
+        List of inter-onset intervals in ms.
+
+    Returns
+    -------
+    out : ndarray
+        Onsets of the `len(ioi_list) + 1` sounds of the sequence, in ms.
+    """
+    onsets = np.round(np.cumsum(np.concatenate(([0], np.asarray(ioi_list, dtype=float)))))
+    return np.cumsum(np.concatenate(([onsets[0]], np.diff(onsets))))
+
+
+def sequence_onsets(ioi_list, fs=48000):
+    """
+    Onsets of a sequence in samples.
+
+    The onsets in ms of `sequence_onsets_ms` are converted to samples as in thebeat's `SoundSequence`, so they are the
+    sample indices of the sounds in the rendered sequence.
+
+    Parameters
+    ----------
+    ioi_list : list or array
+        List of inter-onset intervals in ms.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 48000.
+
+    Returns
+    -------
+    out : ndarray
+        Onsets of the `len(ioi_list) + 1` sounds of the sequence, in samples.
+    """
+    return (sequence_onsets_ms(ioi_list) * fs / 1000).astype(int)
+
+
+def _silences(silence_around_stim):
+    # Silences before and after the stimuli, in ms
+    if silence_around_stim is None:
+        return 0, 0
+    if isinstance(silence_around_stim, int):
+        return silence_around_stim * 1000, silence_around_stim * 1000
+    if isinstance(silence_around_stim, (list, tuple)):
+        if len(silence_around_stim) == 1:
+            return silence_around_stim[0] * 1000, silence_around_stim[0] * 1000
+        if len(silence_around_stim) == 2:
+            return silence_around_stim[0] * 1000, silence_around_stim[1] * 1000
+        raise ValueError("silence_around_stim must have 1 or 2 elements.")
+    raise TypeError("silence_around_stim must be None, an int, or a list/tuple.")
+
+
+def trial_iois(
+    task,
+    frequencies=(),
+    n_stimuli_per_plateau=0,
+    n_stimuli_first_plateau=None,
+    silence_around_stim=None,
+    jitter=0,
+    seed=None
+):
+    """
+    Inter-onset intervals of a stimulus sequence.
+
+    The IOIs are the same as those of `generate_iois`, which returns them as a list.
+
+    Parameters
+    ----------
+    task : {'adapt', 'conti', 'synch', 'SMT'}
+        Task of the sequence. For 'SMT', the sequence is a start and an end bip separated by `silence_around_stim`.
+    frequencies : list or array, optional
+        Frequencies in Hz. If the task is 'adapt', 2 frequencies must be provided. If the task is 'conti', 1 frequency
+        must be provided. If the task is 'synch', one frequency per plateau. Not used for 'SMT'. Default is ().
+    n_stimuli_per_plateau : int, optional
+        Number of stimuli per plateau. Not used for 'SMT'. Default is 0.
+    n_stimuli_first_plateau : int, optional
+        Number of stimuli in the first plateau of 'synch' sequences. If None, `n_stimuli_per_plateau` is used. Default
+        is None.
+    silence_around_stim : int or list, optional
+        Silence in s around the stimuli. If an int, the same duration is used before and after the stimuli. If a list,
+        the silences before and after the stimuli. If None, no silence is added. Default is None.
+    jitter : float, optional
+        Standard deviation in ms of a Gaussian noise added to the IOIs of the stimuli (not to the silences and to the
+        SMT reminder). Default is 0.
+    seed : int, optional
+        Seed of the noise, so that a jittered sequence can be generated again. Default is None.
+
+    Returns
+    -------
+    out : ndarray
+        IOIs in ms.
+    """
+    silence_beg, silence_end = _silences(silence_around_stim)
+    frequencies = np.asarray(frequencies, dtype=float)
+
+    # Segments of the sequence, and whether they are stimuli of the task (to be jittered)
+    if task == 'adapt':
+        if len(frequencies) != 2:
+            raise ValueError("For task 'adapt', 2 frequencies must be provided.")
+
+        # 3 stimuli at the preferred frequency + silence of the remainder of the first silence
+        initial_ioi = 1000 / frequencies[0]
+        segments = [
+            ([1000, initial_ioi, initial_ioi, max(0, silence_beg - 3 * initial_ioi)], False),
+            (np.full(n_stimuli_per_plateau, 1000 / frequencies[1]), True),
+            ([silence_end], False),
+        ]
+
+    elif task == 'conti':
+        if len(frequencies) != 1:
+            raise ValueError("For task 'conti', 1 frequency must be provided.")
+        segments = [
+            ([silence_beg], False),
+            (np.full(n_stimuli_per_plateau, 1000 / frequencies[0]), True),
+            ([silence_end], False),
+        ]
+
+    elif task == 'synch':
+        n_stimuli_first_plateau = n_stimuli_per_plateau if n_stimuli_first_plateau is None else n_stimuli_first_plateau
+        n_events = np.full(len(frequencies), n_stimuli_per_plateau)
+        n_events[:1] = n_stimuli_first_plateau
+        segments = [
+            ([silence_beg], False),
+            (np.repeat(1000 / frequencies, n_events), True),
+            ([silence_end], False),
+        ]
+
+    elif task == 'SMT':
+        segments = [([silence_beg], False)]
+
+    else:
+        raise ValueError("Invalid task. Must be 'adapt', 'conti', 'synch', or 'SMT'.")
+
+    iois = np.concatenate([np.asarray(values, dtype=float) for values, _ in segments])
+    if jitter > 0:
+        is_stimulus = np.concatenate([np.full(len(values), jittered) for values, jittered in segments])
+        iois[is_stimulus] += np.random.default_rng(seed).normal(0, jitter, np.count_nonzero(is_stimulus))
+
+    return iois
+
+
+def trial_parameters(task, condition=None, smt=None):
+    """
+    Parameters of the stimulus sequence of a trial, as in `generate_stimuli.ipynb`.
+
+    Parameters
+    ----------
+    task : {'SMT', 'adapt', 'conti', 'synch'}
+        Task of the trial.
+    condition : {'S', 'F', 'I', 'D'}, optional
+        Condition of the trial: slower ('S') or faster ('F') than the SMT for 'adapt' and 'conti', increasing ('I') or
+        decreasing ('D') frequencies for 'synch'. Not used for 'SMT'. Default is None.
+    smt : float, optional
+        Spontaneous motor tempo in Hz. Required for 'adapt' and 'conti'. Default is None.
+
+    Returns
+    -------
+    out : dict
+        Arguments of `trial_iois` (and of `render_sequence`).
+    """
+    if task == 'SMT':
+        return {'task': 'SMT', 'silence_around_stim': 30}
+
+    if task in ('adapt', 'conti'):
+        if smt is None:
+            raise ValueError(f"The SMT is required for task '{task}'.")
+        freq = np.round(0.5 * smt, 2) if condition == 'S' else np.round(1.5 * smt, 2)
+        return {
+            'task': task,
+            'frequencies': [smt, freq] if task == 'adapt' else [freq],
+            'n_stimuli_per_plateau': int(np.round(20 * freq)),
+            'silence_around_stim': [20, 40] if task == 'adapt' else [1, 40],
+        }
+
+    if task == 'synch':
+        return {
+            'task': 'synch',
+            'frequencies': synch_frequencies(condition),
+            'n_stimuli_per_plateau': 15,
+            'n_stimuli_first_plateau': 20,
+            'silence_around_stim': 1,
+        }
+
+    raise ValueError("Invalid task. Must be 'SMT', 'adapt', 'conti', or 'synch'.")
+
+
+def trial_schedule(task, condition=None, smt=None, fs=48000):
+    """
+    Schedule of the stimulus sequence of a trial.
+
+    Parameters
+    ----------
+    task : {'SMT', 'adapt', 'conti', 'synch'}
+        Task of the trial.
+    condition : {'S', 'F', 'I', 'D'}, optional
+        Condition of the trial. See `trial_parameters`. Default is None.
+    smt : float, optional
+        Spontaneous motor tempo in Hz. Required for 'adapt' and 'conti'. Default is None.
+    fs : int, optional
+        Sampling frequency of the audio output in Hz. Default is 48000.
+
+    Returns
+    -------
+    out : dict
+        Task ('task'), condition ('condition'), arguments of `trial_iois` ('parameters'), IOIs in ms ('iois'), and
+        onsets of the start bip, the stimuli and the end bip in samples ('onsets').
+    """
+    parameters = trial_parameters(task, condition, smt)
+    iois = trial_iois(**parameters)
+
+    return {
+        'task': task,
+        'condition': condition,
+        'parameters': parameters,
+        'iois': iois,
+        'onsets': sequence_onsets(iois, fs=fs),
+    }
+
+
+def build_session(participant_number, smt, fs=48000, n_smt_trials=5):
+    """
+    Schedules of all the trials of a participant, in the randomized order.
+
+    Parameters
+    ----------
+    participant_number : int
+        Participant number, used to randomize the conditions. See `randomize_conditions`.
+    smt : float
+        Spontaneous motor tempo of the participant in Hz.
+    fs : int, optional
+        Sampling frequency of the audio output in Hz. Default is 48000.
+    n_smt_trials : int, optional
+        Number of SMT trials. Default is 5.
+
+    Returns
+    -------
+    out : dict
+        List of the schedules of the trials (see `trial_schedule`) for each task ('SMT', 'adapt', 'conti', 'synch').
+    """
+    order_adapt, order_conti, order_synch = randomize_conditions(participant_number)
+    smt_schedule = trial_schedule('SMT', fs=fs)
+
+    return {
+        'SMT': [smt_schedule] * n_smt_trials,
+        'adapt': [trial_schedule('adapt', condition, smt, fs=fs) for condition in order_adapt],
+        'conti': [trial_schedule('conti', condition, smt, fs=fs) for condition in order_conti],
+        'synch': [trial_schedule('synch', condition, fs=fs) for condition in order_synch],
+    }
@@ -0,0 +1,396 @@
+"""
+CACHE OF THE STIMULUS SEQUENCES OF A SESSION
+============================================
+This script keeps the rendered stimulus sequences of a session in memory, and optionally as WAV files on disk, so that a
+sequence is never synthesized twice (e.g., the five SMT trials, or identical 'synch' trials). While a trial is played,
+the sequence of the next trial in the randomized order is rendered in a background thread, so that the next trial can
+start as soon as the current one ends.
+
+Sequences are identified by their task, frequencies, number of stimuli, silences and tone parameters, i.e., the
+arguments of `generate_iois` and `generate_stimuli`.
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+2026-10-18: v1.1.0.
+    Sequences are rendered with `render_sequence_samples` instead of thebeat's SoundSequence objects.
+2026-10-18: v1.2.0.
+    `play_sequence` plays the sequences with `SequencePlayer` and returns the timing log of the onsets. Added
+    `trial_onsets`.
+2026-10-18: v1.3.0.
+    The IOIs and the parameters of the trials are built by `schedule`. Sequences can be jittered.
+
+Classes
+-------
+SequenceCache(cache_dir=None)
+    Cache of rendered stimulus sequences, with background rendering.
+
+Functions
+---------
+sequence_key(task, frequencies=(), n_stimuli_per_plateau=0, n_stimuli_first_plateau=None, silence_around_stim=None, jitter=0, seed=None, **tone_parameters)
+    Build the key identifying a stimulus sequence.
+render_sequence(task, frequencies=(), n_stimuli_per_plateau=0, n_stimuli_first_plateau=None, silence_around_stim=None, jitter=0, seed=None, **tone_parameters)
+    Synthesize a stimulus sequence.
+trial_onsets(task, frequencies=(), n_stimuli_per_plateau=0, n_stimuli_first_plateau=None, silence_around_stim=None, jitter=0, seed=None, **tone_parameters)
+    Onsets of the sounds of a stimulus sequence in samples.
+session_trials(participant_number, smt)
+    Parameters of the stimulus sequences of all the trials of a participant, in the randomized order.
+play_sequence(samples, fs, onsets=(), backend='sounddevice')
+    Play a stimulus sequence, wait until it ends and return the timing log of its onsets.
+
+Usage
+-----
+    cache = SequenceCache('stimuli')
+    trials = session_trials(participant_number, SMT)
+    samples, fs = cache.get(**trials['adapt'][0])
+    cache.prefetch(**trials['adapt'][1])        # Rendered while the first trial is played
+    timing = play_sequence(samples, fs, trial_onsets(**trials['adapt'][0]))
+"""
+
+
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import inspect
+from pathlib import Path
+import threading
+
+from scipy.io import wavfile
+
+from src.playback import SequencePlayer
+from src.schedule import build_session, sequence_onsets, trial_iois
+from src.stimulus_generation import generate_stimuli, generate_tone, render_sequence_samples
+
+# Sampling frequency of the sequences, the default of thebeat
+FS = 48000
+
+# Default tone parameters, so that a sequence has the same key whether they are given or not
+TONE_PARAMETERS = {
+    name: parameter.default for name, parameter in inspect.signature(generate_stimuli).parameters.items()
+    if name != 'ioi_list'
+}
+
+
+def sequence_key(
+    task,
+    frequencies=(),
+    n_stimuli_per_plateau=0,
+    n_stimuli_first_plateau=None,
+    silence_around_stim=None,
+    jitter=0,
+    seed=None,
+    **tone_parameters
+):
+    """
+    Build the key identifying a stimulus sequence.
+
+    Parameters
+    ----------
+    task : {'adapt', 'conti', 'synch', 'SMT'}
+        Task of the sequence.
+    frequencies, n_stimuli_per_plateau, n_stimuli_first_plateau, silence_around_stim, jitter, seed
+        Arguments of `trial_iois`. See `render_sequence`.
+    **tone_parameters
+        Arguments of `generate_stimuli` (e.g., stimulus_duration=40).
+
+    Returns
+    -------
+    out : tuple
+        Hashable key. Two sequences with the same key are identical.
+
+    Raises
+    ------
+    TypeError
+        If a tone parameter is not an argument of `generate_stimuli`.
+    """
+    unknown = set(tone_parameters) - set(TONE_PARAMETERS)
+    if len(unknown) > 0:
+        raise TypeError(f"Unknown tone parameters: {', '.join(sorted(unknown))}.")
+
+    if silence_around_stim is not None and not isinstance(silence_around_stim, int):
+        silence_around_stim = tuple(silence_around_stim)
+    tone_parameters = {**TONE_PARAMETERS, **tone_parameters}
+
+    return (
+        task,
+        tuple(float(freq) for freq in frequencies),
+        int(n_stimuli_per_plateau),
+        None if n_stimuli_first_plateau is None else int(n_stimuli_first_plateau),
+        silence_around_stim,
+        float(jitter),
+        None if jitter == 0 else seed,
+        tuple(sorted(tone_parameters.items())),
+    )
+
+
+def render_sequence(
+    task,
+    frequencies=(),
+    n_stimuli_per_plateau=0,
+    n_stimuli_first_plateau=None,
+    silence_around_stim=None,
+    jitter=0,
+    seed=None,
+    **tone_parameters
+):
+    """
+    Synthesize a stimulus sequence.
+
+    Parameters
+    ----------
+    task : {'adapt', 'conti', 'synch', 'SMT'}
+        Task of the sequence. For 'SMT', the sequence is a start and an end bip separated by `silence_around_stim`
+        seconds.
+    frequencies : list, optional
+        Frequencies in Hz. See `trial_iois`. Not used for 'SMT'. Default is ().
+    n_stimuli_per_plateau : int, optional
+        Number of stimuli per plateau. See `trial_iois`. Not used for 'SMT'. Default is 0.
+    n_stimuli_first_plateau : int, optional
+        Number of stimuli in the first plateau of 'synch' sequences. See `trial_iois`. Default is None.
+    silence_around_stim : int or list, optional
+        Silence in s around the stimuli. See `trial_iois`. Default is None.
+    jitter : float, optional
+        Standard deviation of the jitter of the IOIs in ms. See `trial_iois`. Default is 0.
+    seed : int, optional
+        Seed of the jitter. A jittered sequence without seed is different at each rendering, so it should not be
+        cached. Default is None.
+    **tone_parameters
+        Arguments of `generate_stimuli` (e.g., stimulus_duration=40).
+
+    Returns
+    -------
+    samples : ndarray
+        Samples of the sequence, as 32-bit floats.
+    fs : int
+        Sampling frequency of the sequence in Hz.
+    """
+    ioi_list = trial_iois(
+        task, frequencies, n_stimuli_per_plateau, n_stimuli_first_plateau, silence_around_stim, jitter=jitter, seed=seed
+    )
+    tone_parameters = {**TONE_PARAMETERS, **tone_parameters}
+    stimulus, bip_start_end = [
+        generate_tone(
+            duration, tone_parameters['sound_frequency'], tone_parameters['ramp_duration'], fs=FS
+        ) for duration in (tone_parameters['stimulus_duration'], tone_parameters['duration_bip_start_end'])
+    ]
+
+    return render_sequence_samples(ioi_list, stimulus, bip_start_end, fs=FS), FS
+
+
+def trial_onsets(
+    task,
+    frequencies=(),
+    n_stimuli_per_plateau=0,
+    n_stimuli_first_plateau=None,
+    silence_around_stim=None,
+    jitter=0,
+    seed=None,
+    **tone_parameters
+):
+    """
+    Onsets of the sounds of a stimulus sequence in samples.
+
+    Parameters
+    ----------
+    task, frequencies, n_stimuli_per_plateau, n_stimuli_first_plateau, silence_around_stim, jitter, seed, **tone_parameters
+        Arguments of `render_sequence`.
+
+    Returns
+    -------
+    out : ndarray
+        Onsets of the start bip, the stimuli and the end bip of the sequence rendered by `render_sequence`, in samples.
+    """
+    ioi_list = trial_iois(
+        task, frequencies, n_stimuli_per_plateau, n_stimuli_first_plateau, silence_around_stim, jitter=jitter, seed=seed
+    )
+    return sequence_onsets(ioi_list, fs=FS)
+
+
+class SequenceCache:
+    """
+    Cache of rendered stimulus sequences, with background rendering.
+
+    Sequences are rendered when they are first requested with `get`, or in a background thread when they are announced
+    with `prefetch`. A sequence requested while it is rendered in the background is not rendered again: `get` waits for
+    the background rendering to finish.
+
+    Parameters
+    ----------
+    cache_dir : str or Path, optional
+        Directory of the WAV files of the rendered sequences. Sequences found in this directory are loaded instead of
+        rendered, so that they are also reused across sessions. If None, sequences are only kept in memory. Default is
+        None.
+
+    Attributes
+    ----------
+    n_rendered : int
+        Number of sequences synthesized by this cache.
+    """
+
+    __slots__ = ('cache_dir', 'n_rendered', '_sequences', '_lock', '_executor')
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        self.n_rendered = 0
+        self._sequences = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sequence_prefetch')
+
+    def __len__(self):
+        return len(self._sequences)
+
+    def __contains__(self, key):
+        return key in self._sequences
+
+    def wav_path(self, key):
+        """
+        Path of the WAV file of a sequence.
+
+        Parameters
+        ----------
+        key : tuple
+            Key of the sequence, as returned by `sequence_key`.
+
+        Returns
+        -------
+        out : Path or None
+            Path of the WAV file, or None if the cache has no directory.
+        """
+        if self.cache_dir is None:
+            return None
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        return self.cache_dir / f'{key[0]}_{digest}.wav'
+
+    def _load_or_render(self, key, parameters):
+        wav_path = self.wav_path(key)
+        if wav_path is not None and wav_path.is_file():
+            fs, samples = wavfile.read(wav_path)
+            return samples, fs
+
+        samples, fs = render_sequence(**parameters)
+        with self._lock:
+            self.n_rendered += 1
+
+        if wav_path is not None:
+            wav_path.parent.mkdir(parents=True, exist_ok=True)
+            # Written to a temporary file first, so that an interrupted session does not leave a truncated file
+            temporary_path = wav_path.with_suffix('.tmp')
+            wavfile.write(temporary_path, fs, samples)
+            temporary_path.replace(wav_path)
+
+        return samples, fs
+
+    def prefetch(self, **parameters):
+        """
+        Render a sequence in the background thread, if it is not already rendered or being rendered.
+
+        Parameters
+        ----------
+        **parameters
+            Arguments of `render_sequence`.
+
+        Returns
+        -------
+        out : Future
+            Future of the (samples, fs) pair of the sequence.
+        """
+        key = sequence_key(**parameters)
+        with self._lock:
+            if key not in self._sequences:
+                self._sequences[key] = self._executor.submit(self._load_or_render, key, parameters)
+            return self._sequences[key]
+
+    def get(self, **parameters):
+        """
+        Get a sequence, rendering it in the current thread if it was not prefetched.
+
+        Parameters
+        ----------
+        **parameters
+            Arguments of `render_sequence`.
+
+        Returns
+        -------
+        samples : ndarray
+            Samples of the sequence, as 32-bit floats.
+        fs : int
+            Sampling frequency of the sequence in Hz.
+        """
+        key = sequence_key(**parameters)
+        with self._lock:
+            future = self._sequences.get(key)
+            owner = future is None
+            if owner:
+                future = self._sequences[key] = Future()
+
+        if owner:
+            try:
+                future.set_result(self._load_or_render(key, parameters))
+            except Exception as error:
+                future.set_exception(error)
+
+        # A failed rendering is not cached, so that it is attempted again at the next request
+        if future.exception() is not None:
+            with self._lock:
+                if self._sequences.get(key) is future:
+                    del self._sequences[key]
+        return future.result()
+
+    def clear(self):
+        """Discard the sequences kept in memory. WAV files are kept."""
+        with self._lock:
+            self._sequences.clear()
+
+    def close(self):
+        """Wait for the background rendering to finish and stop the background thread."""
+        self._executor.shutdown(wait=True)
+
+
+def session_trials(participant_number, smt):
+    """
+    Parameters of the stimulus sequences of all the trials of a participant, in the randomized order.
+
+    Parameters
+    ----------
+    participant_number : int
+        Participant number, used to randomize the conditions. See `randomize_conditions`.
+    smt : float
+        Spontaneous motor tempo of the participant in Hz.
+
+    Returns
+    -------
+    out : dict
+        List of the arguments of `render_sequence` of each trial, for each task ('SMT', 'adapt', 'conti', 'synch').
+    """
+    return {
+        task: [trial['parameters'] for trial in trials]
+        for task, trials in build_session(participant_number, smt, fs=FS).items()
+    }
+
+
+def play_sequence(samples, fs, onsets=(), backend='sounddevice'):
+    """
+    Play a stimulus sequence, wait until it ends and return the timing log of its onsets.
+
+    Parameters
+    ----------
+    samples : ndarray
+        Samples of the sequence.
+    fs : int
+        Sampling frequency of the sequence in Hz.
+    onsets : array, optional
+        Onsets of the sounds in samples, e.g., from `trial_onsets`. Default is ().
+    backend : {'sounddevice', 'null'}, optional
+        Audio backend. See `SequencePlayer`. Default is 'sounddevice'.
+
+    Returns
+    -------
+    out : DataFrame
+        Timing log of the onsets. See `SequencePlayer.timing_log`.
+    """
+    player = SequencePlayer(samples, fs, onsets, backend=backend)
+    player.play()
+    return player.timing_log()
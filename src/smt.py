@@ -0,0 +1,185 @@
+"""
+SPONTANEOUS MOTOR TEMPO OF A PARTICIPANT
+========================================
+This script computes the spontaneous motor tempo (SMT) of a participant from the five `<participant>_Pref__<trial>.csv`
+recordings of its folder. The trials are processed concurrently, so that the SMT is available in about the time needed
+to process one trial, and the result has the structure expected by `api_elab.text_preferred`.
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Functions
+---------
+process_smt_trial(file_path, fs=5000, parameters=None, drop_first_peak=False, return_signals=False, custom_params_path=None)
+    Detect the peaks of one SMT trial and compute its inter-onset intervals.
+compute_smt(participant_dir, n_trials=5, fs=5000, parameters=None, drop_first_peak=(), max_workers=None, return_signals=False, custom_params_path=None)
+    Compute the spontaneous motor tempo of a participant.
+
+Usage
+-----
+    smt = compute_smt(Path('data') / ID)
+    text_preferred(ID, smt['IOI_mean'], smt['IOI_sd'], smt['CV_mean'])
+
+Notes
+-----
+As in `calculate_SMT.ipynb`, the tempo of each trial is the mean of the instantaneous frequencies (inverse of the IOIs),
+and the SMT is the mean of the tempos of the trials. The slow and fast conditions are 20% below and above the SMT.
+"""
+
+
+from pathlib import Path
+
+import numpy as np
+
+from src.batch_processing import load_trial, map_trials
+from src.peak_detection import get_custom_parameters, identify_peak_flexion
+from src.stimulus_analysis import detect_stimuli
+
+
+def process_smt_trial(
+    file_path,
+    fs=5000,
+    parameters=None,
+    drop_first_peak=False,
+    return_signals=False,
+    custom_params_path=None
+):
+    """
+    Detect the peaks of one SMT trial and compute its inter-onset intervals.
+
+    Parameters
+    ----------
+    file_path : str or Path
+        Path to the CSV file of the trial.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    parameters : dict, optional
+        Peak detection parameters passed to `identify_peak_flexion` (e.g., {'peak_threshold': 40}). They override the
+        custom parameters of the file (see `get_custom_parameters`). Default is None.
+    drop_first_peak : bool, optional
+        Whether to remove the first detected peak, which is sometimes a false positive. Default is False.
+    return_signals : bool, optional
+        Whether to return the movement signal, stimulus onsets and plateaus, e.g., to plot the detected peaks. Default
+        is False.
+    custom_params_path : str or Path, optional
+        Path to the csv file containing custom peak detection parameters. See `load_custom_parameters`. Default is
+        None.
+
+    Returns
+    -------
+    out : dict
+        Detected peaks ('peaks'), IOIs in seconds ('IOI'), and, if `return_signals` is True, the movement signal
+        ('mov'), stimulus onsets ('stim_onset') and plateaus ('plateaus').
+    """
+    file_path = Path(file_path)
+    peak_parameters = {**(get_custom_parameters(file_path.stem, custom_params_path) or {}), **(parameters or {})}
+
+    mov, sound = load_trial(file_path, fs=fs)
+    stim_onset, _, plateaus, _, _, _ = detect_stimuli(sound, task="SMT", fs=fs)
+    peaks = identify_peak_flexion(mov, stim_onset, plateaus, "SMT", fs=fs, **peak_parameters)
+
+    if drop_first_peak:
+        peaks = peaks[1:]
+
+    result = {'peaks': peaks, 'IOI': np.diff(peaks) / fs}
+    if return_signals:
+        result.update({'mov': mov, 'stim_onset': stim_onset, 'plateaus': plateaus})
+
+    return result
+
+
+def compute_smt(
+    participant_dir,
+    n_trials=5,
+    fs=5000,
+    parameters=None,
+    drop_first_peak=(),
+    max_workers=None,
+    return_signals=False,
+    custom_params_path=None
+):
+    """
+    Compute the spontaneous motor tempo of a participant.
+
+    The trials are processed concurrently in a pool of processes.
+
+    Parameters
+    ----------
+    participant_dir : str or Path
+        Folder of the participant, containing the `<participant>_Pref__<trial>.csv` files. The participant identifier is
+        the name of the folder.
+    n_trials : int, optional
+        Number of SMT trials. Default is 5.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    parameters : dict, optional
+        Peak detection parameters of some trials, indexed by trial number (e.g., {2: {'peak_threshold': 40}}). See
+        `process_smt_trial`. Default is None.
+    drop_first_peak : collection, optional
+        Trial numbers for which the first detected peak is removed. Default is ().
+    max_workers : int, optional
+        Number of processes. If None, one process per trial is used. If 1, trials are processed in the current process.
+        Default is None.
+    return_signals : bool, optional
+        Whether to return the signals of each trial. See `process_smt_trial`. Default is False.
+    custom_params_path : str or Path, optional
+        Path to the csv file containing custom peak detection parameters. See `load_custom_parameters`. Default is
+        None.
+
+    Returns
+    -------
+    out : dict
+        SMT summary:
+            - 'IOI_mean': mean tapping frequency of each trial in Hz.
+            - 'IOI_sd': standard deviation of the tapping frequency of each trial in Hz.
+            - 'CV_mean': coefficient of variation of the mean frequencies between trials in %.
+            - 'CV_all': coefficient of variation of all the frequencies in %.
+            - 'mean_freq': SMT, i.e., mean of the trial frequencies in Hz.
+            - 'slow' and 'fast': frequencies of the slow and fast conditions in Hz.
+            - 'trials': results of each trial, as returned by `process_smt_trial`.
+        'IOI_mean', 'IOI_sd' and 'CV_mean' are the arguments of `api_elab.text_preferred`.
+
+    Raises
+    ------
+    FileNotFoundError
+        If a trial file is missing.
+    """
+    participant_dir = Path(participant_dir)
+    participant = participant_dir.name
+    trial_numbers = range(1, n_trials + 1)
+    file_paths = [participant_dir / f"{participant}_Pref__{trial}.csv" for trial in trial_numbers]
+
+    missing = [file_path.name for file_path in file_paths if not file_path.is_file()]
+    if len(missing) > 0:
+        raise FileNotFoundError(f"Missing SMT trials in {participant_dir}: {', '.join(missing)}")
+
+    parameters = parameters or {}
+    arguments = [
+        (file_path, fs, parameters.get(trial), trial in drop_first_peak, return_signals, custom_params_path)
+        for trial, file_path in zip(trial_numbers, file_paths)
+    ]
+
+    trials = map_trials(process_smt_trial, *zip(*arguments), max_workers=max_workers or n_trials)
+
+    # Tapping frequencies of each trial
+    frequencies = [1 / trial['IOI'] for trial in trials]
+    all_frequencies = np.concatenate(frequencies)
+    IOI_mean = np.array([np.mean(trial_frequencies) for trial_frequencies in frequencies])
+    IOI_sd = np.array([np.std(trial_frequencies) for trial_frequencies in frequencies])
+    mean_freq = np.mean(IOI_mean)
+
+    return {
+        'IOI_mean': IOI_mean,
+        'IOI_sd': IOI_sd,
+        'CV_mean': np.std(IOI_mean) / mean_freq * 100,
+        'CV_all': np.std(all_frequencies) / np.mean(all_frequencies) * 100,
+        'mean_freq': mean_freq,
+        'slow': mean_freq * 0.8,
+        'fast': mean_freq * 1.2,
+        'trials': dict(zip(trial_numbers, trials)),
+    }
@@ -1,12 +1,162 @@
-import csv
+from pathlib import Path
+import tempfile
 import warnings
 
 import pandas as pd
 import numpy as np
-from scipy.signal import butter, filtfilt
+from scipy.signal import butter, filtfilt, sosfilt, sosfilt_zi
 import matplotlib.pyplot as plt
 
-def load_and_preprocess(file_path, fs=5000, cutoff=20, order=4):
+from src.utils import plot_decimated
+
+def sniff_csv_format(file_path, n_header_lines=4):
+    """
+    Identify the delimiter and the decimal symbol of an acquisition CSV file from its header.
+
+    Only the first lines of the file are read.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the CSV file.
+    n_header_lines : int, optional
+        Number of lines read from the beginning of the file. Default is 4.
+
+    Returns
+    -------
+    delimiter : str
+        Symbol used to separate the columns.
+    decimal_symbol : str
+        Symbol used for decimals.
+    """
+    with open(file_path, "r") as file:
+        lines = [file.readline() for _ in range(n_header_lines + 1)]
+
+    # The header lines are written as "key=;value", the data lines use the same delimiter
+    delimiter = next((symbol for symbol in (';', '\t') if symbol in lines[1]), ',')
+
+    # The second line holds a number, whose second character is the symbol used for decimal
+    value = lines[1].split(delimiter)[1] if delimiter in lines[1] else ''
+    if len(value) > 1 and value[1] in '.,':
+        decimal_symbol = value[1]
+    else:
+        decimal_symbol = ',' if delimiter != ',' and ',' in lines[-1] else '.'
+
+    return delimiter, decimal_symbol
+
+
+def read_acquisition_csv(file_path, with_time=True, dtype=np.float64, engine=None):
+    """
+    Read the time, goniometer and sound columns of an acquisition CSV file.
+
+    The file has three lines of header, a line with the column titles, and four columns: time, goniometer, time (again)
+    and sound. The duplicated time column is never parsed.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the CSV file.
+    with_time : bool, optional
+        Whether to read the time column. Default is True.
+    dtype : {np.float64, np.float32}, optional
+        Data type of the returned arrays. Default is np.float64.
+    engine : {'pyarrow', 'c'}, optional
+        Parser used by pandas. If None, the pyarrow engine is used when it is installed, otherwise the C engine. 
+        Default is None.
+
+    Returns
+    -------
+    t : array or None
+        Time vector, or None if `with_time` is False.
+    gonio : array
+        Raw goniometer data.
+    sound : array
+        Sound signal.
+    """
+    delimiter, decimal_symbol = sniff_csv_format(file_path)
+
+    columns = [0, 1, 3] if with_time else [1, 3]
+    names = ['time', 'goniometer', 'stimulus'] if with_time else ['goniometer', 'stimulus']
+
+    if engine is None:
+        try:
+            import pyarrow  # noqa: F401
+            engine = 'pyarrow'
+        except ImportError:
+            engine = 'c'
+
+    read_options = dict(
+        sep=delimiter, decimal=decimal_symbol, skiprows=4, header=None, usecols=columns, names=names, 
+        dtype={name: dtype for name in names}, engine=engine
+    )
+    try:
+        data = pd.read_csv(file_path, **read_options)
+    except ValueError:
+        # Fall back on the C engine for options that are not supported by the pyarrow engine
+        if engine == 'c':
+            raise
+        data = pd.read_csv(file_path, **{**read_options, 'engine': 'c'})
+
+    t = data['time'].to_numpy() if with_time else None
+
+    return t, data['goniometer'].to_numpy(), data['stimulus'].to_numpy()
+
+
+def write_acquisition_csv(
+    file_path, gonio, sound, fs=5000, decimal_symbol='.', delimiter=';', float_format='%.6f', block_size=2**16
+):
+    """
+    Write goniometer and sound signals in the format of the acquisition CSV files.
+
+    The file can be read with `read_acquisition_csv`: three lines of header, a line with the column titles, and four
+    columns (time, goniometer, time and sound). The lines are formatted block by block, and the time of each line is
+    formatted once for both time columns.
+
+    Parameters
+    ----------
+    file_path : str or Path
+        Path to the CSV file.
+    gonio : array
+        Goniometer signal.
+    sound : array
+        Sound signal.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    decimal_symbol : {'.', ','}, optional
+        Symbol used for decimals. Default is '.'.
+    delimiter : str, optional
+        Symbol used to separate the columns. Default is ';'.
+    float_format : str, optional
+        Format of the values. Default is '%.6f'.
+    block_size : int, optional
+        Number of lines formatted at once. Default is 65536.
+    """
+    excel_date = (pd.Timestamp.now() - pd.Timestamp('1899-12-30')) / pd.Timedelta(days=1)
+    header = [
+        f"Interval={delimiter}{1 / fs:g} s",
+        f"ExcelDateTime={delimiter}{excel_date:.10e}",
+        f"TimeFormat={delimiter}StartOfBlock",
+        f"ChannelTitle={delimiter}Goniometer{delimiter}{delimiter}Sound",
+    ]
+    if decimal_symbol != '.':
+        header = [line.replace('.', decimal_symbol) for line in header]
+
+    with open(file_path, 'w', newline='') as file:
+        file.write('\n'.join(header) + '\n')
+
+        for start in range(0, len(gonio), block_size):
+            end = min(start + block_size, len(gonio))
+            columns = [
+                [float_format % value for value in np.asarray(values, dtype=float).tolist()]
+                for values in (np.arange(start, end) / fs, gonio[start:end], sound[start:end])
+            ]
+            block = ''.join(
+                f"{t}{delimiter}{g}{delimiter}{t}{delimiter}{s}\n" for t, g, s in zip(*columns)
+            )
+            file.write(block if decimal_symbol == '.' else block.replace('.', decimal_symbol))
+
+
+def load_and_preprocess(file_path, fs=5000, cutoff=20, order=4, with_time=True, dtype=np.float64):
     """
     Load and preprocess data from a CSV file.
 
@@ -20,41 +170,274 @@ def load_and_preprocess(file_path, fs=5000, cutoff=20, order=4):
         Cutoff frequency for the low-pass filter in Hz. Default is 20.
     order : int, optional
         Order of the low-pass filter. Default is 4.
+    with_time : bool, optional
+        Whether to read the time column. Default is True.
+    dtype : {np.float64, np.float32}, optional
+        Data type of the returned arrays. Default is np.float64.
 
     Returns
     -------
-    t : array
-        Time vector.
+    t : array or None
+        Time vector, or None if `with_time` is False.
     mov : array
         Preprocessed goniometer data.
     sound : array
         Sound signal.
     """
 
-    # Identify the symbol used for decimal
-    with open(file_path, "r") as file:
-        csv_file = csv.reader(file)
-        for line_idx, line in enumerate(csv_file):
-            if line_idx == 1:
-                decimal_symbol = str.split(line[0],";")[1][1]
-
     # Load the data
-    data = pd.read_csv(file_path, delimiter=';', decimal=decimal_symbol, skiprows=3)
-    data.columns = ['time', 'goniometer', 'time_2', 'stimulus']
-    data = data.drop(columns=['time_2'])
-
-    # Create a variable for each column
-    t = data['time']
-    gonio = data['goniometer']
-    sound = data['stimulus']
+    t, gonio, sound = read_acquisition_csv(file_path, with_time=with_time, dtype=dtype)
 
     # Apply low-pass filter to goniometer data
     b, a = butter(order, cutoff / (fs / 2), btype='low')
-    mov = filtfilt(b, a, gonio)
+    mov = filtfilt(b, a, gonio).astype(dtype, copy=False)
 
     return t, mov, sound
 
-def detect_stimuli(sound, task="synch", fs=5000, plot_verif=False):
+
+def filtfilt_chunked(x, sos, out, block_size=2**18, padlen=None):
+    """
+    Apply a zero-phase filter in second-order sections form to a signal, block by block.
+
+    The signal is filtered forward then backward as in `scipy.signal.filtfilt`: it is extended at both ends by odd
+    reflection and the filter states are initialized to the steady state of the first sample of each pass. The states
+    are carried from one block to the next, so the result does not depend on the block size and matches the 
+    whole-signal filter within numerical precision. Only one block is held in memory at a time, so `x` and `out` can be
+    memory-mapped arrays. `out` can be the same array as `x`.
+
+    Parameters
+    ----------
+    x : array
+        Signal to filter.
+    sos : array
+        Filter in second-order sections form, as returned by `scipy.signal.butter(..., output='sos')`.
+    out : array
+        Array of the same length as `x` in which the filtered signal is written.
+    block_size : int, optional
+        Number of samples filtered at once. Default is 262144.
+    padlen : int, optional
+        Number of samples used to extend the signal at both ends. If None, `3 * (2 * len(sos) + 1)` is used, which is the
+        default of `scipy.signal.filtfilt` for the equivalent transfer function. Default is None.
+
+    Returns
+    -------
+    out : array
+        The filtered signal.
+    """
+    n = len(x)
+    if padlen is None:
+        padlen = 3 * (2 * len(sos) + 1)
+    if n <= padlen:
+        raise ValueError(f"The signal must have more than {padlen} samples.")
+
+    # Odd extension of the signal at both ends
+    left_ext = 2 * x[0] - np.asarray(x[padlen:0:-1])
+    right_ext = 2 * x[n - 1] - np.asarray(x[n - padlen - 1:n - 1])[::-1]
+    zi = sosfilt_zi(sos)
+
+    # Forward pass
+    _, state = sosfilt(sos, left_ext, zi=zi * left_ext[0])
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        out[start:end], state = sosfilt(sos, x[start:end], zi=state)
+    right_filtered, state = sosfilt(sos, right_ext, zi=state)
+
+    # Backward pass, starting from the end of the extension
+    _, state = sosfilt(sos, right_filtered[::-1], zi=zi * right_filtered[-1])
+    for start in reversed(range(0, n, block_size)):
+        end = min(start + block_size, n)
+        block, state = sosfilt(sos, out[start:end][::-1], zi=state)
+        out[start:end] = block[::-1]
+
+    return out
+
+
+def load_and_preprocess_chunked(
+    file_path, 
+    out_dir,
+    fs=5000, 
+    cutoff=20, 
+    order=4, 
+    with_time=True, 
+    chunksize=500_000
+):
+    """
+    Load and preprocess data from a CSV file with a memory usage that does not depend on the length of the recording.
+
+    The CSV file is read in chunks that are written to memory-mapped files. The goniometer data is then low-pass 
+    filtered block by block with `filtfilt_chunked`. The result matches `load_and_preprocess` within numerical 
+    precision. This is intended for long continuous sessions that do not fit comfortably in memory.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the CSV file.
+    out_dir : str or Path
+        Directory in which the memory-mapped files are written, in a new subdirectory for each call so that the arrays
+        of earlier calls are not overwritten. The files back the returned arrays, so they are not removed
+        automatically; use a `tempfile.TemporaryDirectory` to remove them once the arrays are no longer used.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    cutoff : float, optional
+        Cutoff frequency for the low-pass filter in Hz. Default is 20.
+    order : int, optional
+        Order of the low-pass filter. Default is 4.
+    with_time : bool, optional
+        Whether to read the time column. Default is True.
+    chunksize : int, optional
+        Number of lines read at once from the CSV file. Default is 500000.
+
+    Returns
+    -------
+    t : memmap or None
+        Time vector, or None if `with_time` is False.
+    mov : memmap
+        Preprocessed goniometer data.
+    sound : memmap
+        Sound signal.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_dir = Path(tempfile.mkdtemp(prefix=f'{Path(file_path).stem}_', dir=out_dir))
+
+    delimiter, decimal_symbol = sniff_csv_format(file_path)
+    columns = [0, 1, 3] if with_time else [1, 3]
+    names = ['time', 'mov', 'stimulus'] if with_time else ['mov', 'stimulus']
+
+    # Write the columns to binary files, one chunk at a time
+    raw_paths = {name: out_dir / f'{name}.raw' for name in names}
+    raw_files = {name: open(path, 'wb') for name, path in raw_paths.items()}
+    n = 0
+    try:
+        reader = pd.read_csv(
+            file_path, sep=delimiter, decimal=decimal_symbol, skiprows=4, header=None, usecols=columns, names=names,
+            dtype=np.float64, chunksize=chunksize
+        )
+        for chunk in reader:
+            for name in names:
+                chunk[name].to_numpy().tofile(raw_files[name])
+            n += len(chunk)
+    finally:
+        for raw_file in raw_files.values():
+            raw_file.close()
+
+    arrays = {name: np.memmap(path, dtype=np.float64, mode='r', shape=(n,)) for name, path in raw_paths.items()}
+
+    # Apply low-pass filter to goniometer data, in place
+    sos = butter(order, cutoff / (fs / 2), btype='low', output='sos')
+    mov = np.memmap(raw_paths['mov'], dtype=np.float64, mode='r+', shape=(n,))
+    filtfilt_chunked(mov, sos, mov, padlen=3 * (order + 1))
+    mov.flush()
+
+    t = arrays['time'] if with_time else None
+
+    return t, mov, arrays['stimulus']
+
+
+def detect_onsets(sound, threshold=0.1, min_gap=100, decimation=1, block_size=2**16):
+    """
+    Detect the onsets of the stimuli in a sound signal.
+
+    The sound is normalized between -1 and 1, and a stimulus onset is the first sample whose absolute value exceeds the 
+    threshold after at least `min_gap` samples below it. The onsets are found from the rising edges of the thresholded
+    signal, block by block, so the memory used does not depend on the length of the signal. Optionally, the edges are
+    first searched on an envelope decimated by taking the maximum over `decimation` samples, then refined at full 
+    rate; this gives the same onsets.
+
+    Parameters
+    ----------
+    sound : array
+        Sound signal.
+    threshold : float, optional
+        Detection threshold, relative to the maximum absolute value of the sound. Default is 0.1.
+    min_gap : int, optional
+        Number of samples below the threshold separating two stimuli. Default is 100.
+    decimation : int, optional
+        Decimation factor of the envelope. It must not exceed `(min_gap + 1) // 2`, so that any gap between stimuli
+        contains at least one full decimated sample. Default is 1 (no decimation).
+    block_size : int, optional
+        Number of samples processed at once. Default is 65536.
+
+    Returns
+    -------
+    onsets : array
+        Indices of the stimulus onsets.
+    precise_onsets : array
+        Sub-sample positions of the stimulus onsets, obtained by linear interpolation of the threshold crossing between
+        the onset and the previous sample.
+    """
+    n = len(sound)
+    if not 1 <= decimation <= (min_gap + 1) // 2:
+        raise ValueError(f"Decimation must be between 1 and {(min_gap + 1) // 2}.")
+    block_size = max(block_size // decimation, 1) * decimation
+
+    def exact_edges(group_starts, last=False):
+        # First (or last) full-rate sample above the threshold in groups of `decimation` samples
+        group_idx = np.asarray(group_starts)[:, None] + np.arange(decimation)
+        above = np.abs(np.asarray(sound[np.minimum(group_idx, n - 1)]) / amplitude) > threshold
+        above &= group_idx < n
+        if last:
+            return group_idx[:, 0] + decimation - 1 - np.argmax(above[:, ::-1], axis=1)
+        return group_idx[:, 0] + np.argmax(above, axis=1)
+
+    amplitude = max(np.max(np.abs(sound[start:start + block_size])) for start in range(0, n, block_size))
+
+    onsets = []
+    last_above = -np.inf  # Index of the last sample above the threshold
+    previous_state = False  # Whether the last envelope sample of the previous block is above the threshold
+
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+
+        # Envelope of the block: maximum absolute value over groups of `decimation` samples
+        block = np.abs(sound[start:end])
+        if decimation > 1:
+            block = np.maximum.reduceat(block, np.arange(0, end - start, decimation))
+        envelope_above = block / amplitude > threshold
+
+        # Rising edges (first envelope sample above the threshold) and falling edges (last sample above it)
+        edges = np.diff(np.concatenate(([previous_state], envelope_above)).astype(np.int8))
+        rising = np.flatnonzero(edges == 1)
+        falling = np.flatnonzero(edges == -1) - 1
+
+        # Full-rate indices of the first sample above the threshold after each rising edge, and of the last sample
+        # above the threshold before each falling edge
+        if decimation > 1:
+            rising = exact_edges(start + rising * decimation)
+            falling = exact_edges(start + falling * decimation, last=True)
+        else:
+            rising = rising + start
+            falling = falling + start
+
+        # A rising edge is a stimulus onset if the previous sample above the threshold is far enough
+        previous_falling = np.searchsorted(falling, rising) - 1
+        previous_above = np.where(previous_falling >= 0, falling[np.maximum(previous_falling, 0)], last_above) \
+            if len(falling) > 0 else np.full(len(rising), last_above)
+        onsets.append(rising[rising - previous_above > min_gap])
+
+        # Carry the last sample above the threshold to the next block
+        if envelope_above[-1]:
+            last_above = exact_edges([start + (len(envelope_above) - 1) * decimation], last=True)[0]
+        elif len(falling) > 0:
+            last_above = falling[-1]
+        previous_state = envelope_above[-1]
+
+    onsets = np.concatenate(onsets).astype(int)
+
+    # Linear interpolation of the threshold crossing between the sample before the onset and the onset
+    has_previous = onsets > 0
+    before = np.abs(np.asarray(sound[onsets - has_previous])) / amplitude
+    after = np.abs(np.asarray(sound[onsets])) / amplitude
+    fraction = np.divide(threshold - before, after - before, out=np.ones(len(onsets)), where=has_previous)
+    precise_onsets = onsets - has_previous + fraction
+
+    return onsets, precise_onsets
+
+
+def detect_stimuli(
+    sound, task="synch", fs=5000, plot_verif=False, subsample=False, decimation=1, n_stimuli_first_plateau=20,
+    n_stimuli_per_plateau=15, plateau_tolerance=0.003
+):
     """
     Detect stimulus onset from the sound signal.
 
@@ -62,19 +445,31 @@ def detect_stimuli(sound, task="synch", fs=5000, plot_verif=False):
     ----------
     sound : array
         Sound signal.
-    task : {'synch', 'adapt', 'SMT'}, optional
-        Task type. Default is 'synchro'.
+    task : {'synch', 'adapt', 'conti', 'SMT'}, optional
+        Task type. 'synchro' is accepted as an alias of 'synch'. Default is 'synch'.
     fs : int, optional
         Sampling frequency in Hz. Default is 5000.
     plot_verif : bool, optional
         Whether to plot the detected stimuli. Default is False.
+    subsample : bool, optional
+        Whether to compute the stimulus onset times with sub-sample precision. Default is False.
+    decimation : int, optional
+        Decimation factor of the envelope used to detect the onsets. See `detect_onsets`. Default is 1.
+    n_stimuli_first_plateau : int, optional
+        Number of stimuli of the first plateau of a 'synch' sequence, used to check the number of detected stimuli. 
+        Default is 20.
+    n_stimuli_per_plateau : int, optional
+        Number of stimuli of the other plateaus of a 'synch' sequence. Default is 15.
+    plateau_tolerance : float, optional
+        Largest change in s of the inter-onset interval between consecutive stimuli of the same plateau. See 
+        `identify_plateaus`. Default is 0.003.
 
     Returns
     -------
     stim_onset : array
         Indices of stimulus onset times.
     stim_times : array
-        Stimulus onset times in seconds.
+        Stimulus onset times in seconds. If `subsample` is True, they are interpolated between samples.
     plateaus : array
         Plateau start and end indices as (start, end) pairs.
     frequencies : array
@@ -84,74 +479,85 @@ def detect_stimuli(sound, task="synch", fs=5000, plot_verif=False):
     task_offset : int
         Index of task offset.
     """
-    # Normalize the sound signal between -1 and 1
-    sound = sound / np.max(np.abs(sound))
-
-    # Find the onset of each stimuli by converting continuous values to 0 or 1
-    sound_logical = np.where(np.abs(sound) > 0.1)[0]
-    diff_logical = np.where(np.diff(sound_logical) > 100)[0]
-    diff_logical = np.insert(diff_logical, 0, 0) + 1
-    stim_onset = sound_logical[diff_logical]
+    # Find the onset of each stimuli from the rising edges of the thresholded sound signal
+    stim_onset, precise_onset = detect_onsets(sound, threshold=0.1, min_gap=100, decimation=decimation)
 
     task_onset = stim_onset[0]
     task_offset = stim_onset[-1]
 
-    if task == "synchro":
+    if task in ("synch", "synchro"):
         # First detected stimulus indicates the beginning of the task and the last indicates the end
         # They are not real stimuli, but we keep them in another array for later use
         stim_onset = stim_onset[1:-1]
+        precise_onset = precise_onset[1:-1]
 
         # Identify plateaus based on stimulus onset
-        plateaus = identify_plateaus(stim_onset)
+        plateaus = identify_plateaus(stim_onset, tolerance=plateau_tolerance * fs)
 
-        # The expected number of stimuli can be calculated according to the number of plateaus: the first plateau has 20
-        # stimuli, and the rest have 15 stimuli each
-        expected_stimuli = 20 + 15 * (len(plateaus) - 1) + 1
+        # The expected number of stimuli can be calculated according to the number of plateaus: the first plateau has
+        # `n_stimuli_first_plateau` stimuli, and the rest have `n_stimuli_per_plateau` stimuli each
+        expected_stimuli = n_stimuli_first_plateau + n_stimuli_per_plateau * (len(plateaus) - 1) + 1
         # Display a warning if the number of detected stimuli does not match the expected number
         if len(stim_onset) != expected_stimuli:
             warnings.warn(f"Warning: Detected {len(stim_onset)} stimuli, but expected {expected_stimuli}.")
 
         # Calculate the stimulus frequencies for each plateau
-        frequencies = [np.round(1/np.mean(np.diff(stim_onset[idx_start:idx_end])),1) for idx_start, idx_end in plateaus] / fs
+        frequencies = np.array([
+            np.round(fs / np.mean(np.diff(stim_onset[idx_start:idx_end])), 1) for idx_start, idx_end in plateaus
+        ])
     
     elif task == "adapt":
         plateaus = np.array([[0, 1], [2, len(stim_onset)-3], [len(stim_onset)-2, len(stim_onset)-1]])
 
-        frequencies = np.round(1/np.mean(np.diff(stim_onset[1:len(stim_onset)-1])),1) / fs
+        # Stimuli at the adaptation frequency, after the start bip and the 3 stimuli at the preferred frequency, and
+        # before the end bip
+        frequencies = np.round(fs / np.mean(np.diff(stim_onset[4:len(stim_onset)-1])), 1)
     
+    elif task == "conti":
+        # Synchronization with the stimuli, then continuation until the last stimulus indicating the end of the task
+        plateaus = np.array([[1, len(stim_onset)-2], [len(stim_onset)-2, len(stim_onset)-1]])
+
+        frequencies = np.round(fs / np.mean(np.diff(stim_onset[1:len(stim_onset)-1])), 1)
+
     elif task == "SMT":
         plateaus = np.array([[0,1]])
 
         frequencies = [1]
 
     else:
-        raise ValueError("Task must be either 'synchro' or 'adapt'.")
+        raise ValueError("Task must be either 'synch', 'adapt', 'conti' or 'SMT'.")
 
     # Convert to time
-    stim_times = stim_onset / fs 
+    stim_times = (precise_onset if subsample else stim_onset) / fs
 
     if plot_verif:
-        plot_stimuli_on_sound_signal(sound, stim_times, fs, task_onset, task_offset)
+        plot_stimuli_on_sound_signal(sound, stim_times * fs, task_onset, task_offset, fs=fs)
          
 
     return stim_onset, stim_times, plateaus, frequencies, task_onset, task_offset
 
 
-def identify_plateaus(stim_onset):
+def identify_plateaus(stim_onset, tolerance=2):
     """
     Identify plateaus based on stimulus onset.
 
+    A new plateau starts when the inter-onset interval changes by more than `tolerance` samples. The onsets of the 
+    sequences are rounded to the ms (see `sequence_onsets_ms`), so the intervals of a plateau differ by up to 1 ms, 
+    plus one sample for the quantization of each onset.
+
     Parameters
     ----------
     stim_onset : array
         Indices of stimulus onset times.
+    tolerance : float, optional
+        Largest change in samples of the inter-onset interval within a plateau. Default is 2.
 
     Returns
     -------
     plateaus : array
         Plateau start and end indices as (start, end) pairs.
     """
-    plateau_changes = np.where(np.abs(np.diff(np.diff(stim_onset))) > 2)[0]
+    plateau_changes = np.where(np.abs(np.diff(np.diff(stim_onset))) > tolerance)[0]
     plateau_start = np.concatenate(([0], plateau_changes + 1, [len(stim_onset)]))
     plateaus = np.array([
         (plateau_start[i], plateau_start[i+1] - 1)
@@ -160,46 +566,53 @@ def identify_plateaus(stim_onset):
 
     return plateaus
 
-def plot_stimuli_on_sound_signal(sound, stim_onset, task_onset, task_offset, fs=5000):
+def plot_stimuli_on_sound_signal(sound, stim_onset, task_onset, task_offset, fs=5000, ax=None, show=True):
     """
     Plot the sound signal with the detected stimuli.
 
+    The sound is drawn decimated to the width of the axes and decimated again when zooming, so that interactive figures
+    of long recordings stay responsive.
+
     Parameters
     ----------
     sound : array
         Sound signal.
     stim_onset : array
-        Indices of stimulus onset times.
+        Indices of stimulus onset times. They can be fractional (sub-sample onsets).
     task_onset : int
         Index of task onset.
     task_offset : int
         Index of task offset.
     fs : int, optional
         Sampling frequency in Hz. Default is 5000.
+    ax : matplotlib.axes.Axes, optional
+        Axes in which to plot. If None, a new figure is created. Default is None.
+    show : bool, optional
+        Whether to show the figure. Default is True.
 
     Returns
     -------
-    None
+    out : matplotlib.axes.Axes
+        Axes of the plot.
     """
-    # Create a time vector
-    t = np.arange(len(sound)) / fs
+    if ax is None:
+        _, ax = plt.subplots()
 
     # Plot the sound signal
-    plt.figure()
-    plt.plot(t, sound, 'k')
-    plt.xlabel('Time (s)')
-    plt.ylabel('Amplitude')
-    plt.title('Sound Signal with Detected Stimuli')
-
-    # Plot vertical lines for each stimulus
-    for stim in stim_onset:
-        plt.axvline(stim, color='r')
+    plot_decimated(ax, sound, fs=fs, color='k')
+    ax.set_xlabel('Time (s)')
+    ax.set_ylabel('Amplitude')
+    ax.set_title('Sound Signal with Detected Stimuli')
 
-    # Plot vertical lines for the beginning and end of the task
-    plt.axvline(task_onset / fs, color='b', label='Task onset')
-    plt.axvline(task_offset / fs, color='g', label='Task offset')
+    # Plot vertical lines for each stimulus, and for the beginning and end of the task
+    transform = ax.get_xaxis_transform()
+    ax.vlines(np.asarray(stim_onset) / fs, 0, 1, transform=transform, color='r')
+    ax.vlines(task_onset / fs, 0, 1, transform=transform, color='b', label='Task onset')
+    ax.vlines(task_offset / fs, 0, 1, transform=transform, color='g', label='Task offset')
 
-    plt.legend()
+    ax.legend()
 
-    plt.show()
+    if show:
+        plt.show()
 
+    return ax
@@ -10,6 +10,9 @@ The three tasks supported:
 - **"conti"**: Isochronous stimuli for a fixed duration followed by silence.
 - **"synch"**: A sequence of stimuli with frequency plateaus.
 
+thebeat is only imported by `generate_stimuli` and `create_sequence`, because it imports sounddevice, which requires the
+PortAudio library. The other functions work on machines without PortAudio.
+
 Functions:
 ----------
 1. `generate_iois(frequencies, n_stimuli_per_plateau, task, ...)`
@@ -21,6 +24,15 @@ Functions:
 3. `create_sequence(ioi_list, stimuli)`
    - Combines the IOI list and stimuli into a SoundSequence.
 
+4. `generate_tone(duration, sound_frequency=440, ramp_duration=5, fs=48000)`
+   - Synthesizes a tone with linear on- and off-ramps, as `SoundStimulus.generate`.
+
+5. `sequence_onsets(ioi_list, fs=48000)`
+   - Computes the onsets of a sequence in samples, as `create_sequence`. Defined in `schedule`.
+
+6. `render_sequence_samples(ioi_list, stimulus, bip_start_end, fs=48000)`
+   - Renders the samples of a full sequence directly into one float32 array, without SoundSequence objects.
+
 Example Usage:
 --------------
 # Task 1: "adapt" (Preferred frequency reminder, sync, then silence)
@@ -55,9 +67,14 @@ ioi_list = generate_iois(
 )
 stimuli = generate_stimuli(ioi_list)
 sequence = create_sequence(ioi_list, stimuli)
+
+# Same sequence, rendered directly as an array ready for playback or export
+samples = render_sequence_samples(ioi_list, generate_tone(40), generate_tone(500))
 """
 
-from thebeat.core import Sequence, SoundStimulus, SoundSequence
+import numpy as np
+
+from src.schedule import sequence_onsets, sequence_onsets_ms, trial_iois
 
 
 def generate_iois(
@@ -93,67 +110,17 @@ def generate_iois(
         List of IOIs in ms.
     """
     
-    # Get silence around stimulus
-    if silence_around_stim is None:
-        silence_beg = silence_end = 0
-    elif isinstance(silence_around_stim, int):
-        silence_beg = silence_end = silence_around_stim * 1000
-    elif isinstance(silence_around_stim, (list, tuple)):
-        if len(silence_around_stim) == 1:
-            silence_beg = silence_end = silence_around_stim[0] * 1000
-        elif len(silence_around_stim) == 2:
-            silence_beg, silence_end = [s * 1000 for s in silence_around_stim]
-        else:
-            raise ValueError("silence_around_stim must have 1 or 2 elements.")
-    else:
-        raise TypeError("silence_around_stim must be None, an int, or a list/tuple.")
-
-
-    if task == "adapt":
-        # 2 frequencies should be provided
-        if len(frequencies) != 2:
-            raise ValueError("For task 'adapt', 2 frequencies must be provided.")
-        
-        # 3 stimuli at the preferred frequency + silence of remainder 20s
-        initial_ioi = 1000 / frequencies[0]
-        initial_stim_duration = 3 * initial_ioi
-        silence_after_initial_stim = max(0, (silence_beg) - initial_stim_duration)
-        ioi_list = [1000] + [initial_ioi] * 2 + [silence_after_initial_stim]
-
-        # Stimuli at the modified frequency
-        ioi_list.extend([1000 / frequencies[1]] * n_stimuli_per_plateau)
-
-        # Silence at the end
-        ioi_list.append(silence_end)
-    
-    elif task == "conti":
-        # 1 frequency should be provided
-        if len(frequencies) != 1:
-            raise ValueError("For task 'conti', 1 frequency must be provided.")
-        
-        # Generate IOI list
-        ioi_list = [silence_beg]
-        ioi_list.extend([1000 / frequencies[0]] * n_stimuli_per_plateau)
-        ioi_list.append(silence_end)
-
-    elif task == "synch":
-        # If n_stimuli_first_plateau is not provided, use n_stimuli_per_plateau
-        n_stimuli_first_plateau = n_stimuli_per_plateau if n_stimuli_first_plateau is None else n_stimuli_first_plateau
-
-        # Generate IOI list
-        ioi_list = [silence_beg]
-        for i, freq in enumerate(frequencies):
-            ioi = 1000 / freq  # Calculate IOI in ms
-            n_events = n_stimuli_first_plateau if i == 0 else n_stimuli_per_plateau
-            ioi_list.extend([ioi] * n_events)
-
-        ioi_list.append(silence_end)
-
-    else:
+    if task not in ("adapt", "conti", "synch"):
         raise ValueError("Invalid task. Must be 'adapt', 'conti', or 'synch'.")
-       
 
-    return ioi_list
+    # The IOIs are built as an array by `trial_iois`
+    return trial_iois(
+        task,
+        frequencies,
+        n_stimuli_per_plateau,
+        n_stimuli_first_plateau=n_stimuli_first_plateau,
+        silence_around_stim=silence_around_stim
+    ).tolist()
 
 
 def generate_stimuli(
@@ -184,6 +151,8 @@ def generate_stimuli(
     out : list
         List of SoundStimulus objects.
     """
+    from thebeat.core import SoundStimulus
+
     stimulus = SoundStimulus.generate(
         freq=sound_frequency,
         duration_ms=stimulus_duration,
@@ -217,6 +186,88 @@ def create_sequence(ioi_list, stimuli):
     out : SoundSequence
         SoundSequence object.
     """
+    from thebeat.core import Sequence, SoundSequence
+
     full_sequence = Sequence(ioi_list)
     full_sequence.round_onsets()  # Avoid warning about rounding off onsets
     return SoundSequence(stimuli, full_sequence)
+
+
+def generate_tone(duration, sound_frequency=440, ramp_duration=5, fs=48000):
+    """
+    Synthesizes a tone with linear on- and off-ramps.
+
+    The samples are the same as those of `SoundStimulus.generate` with the same parameters, which is used by
+    `generate_stimuli`.
+
+    Parameters
+    ----------
+    duration : float
+        Duration of the tone in ms.
+    sound_frequency : float, optional
+        Frequency of the sound in Hz.
+    ramp_duration : float, optional
+        Duration of the on- and off-ramps in ms.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 48000, the default of thebeat.
+
+    Returns
+    -------
+    out : ndarray
+        Samples of the tone.
+    """
+    n_samples = int(np.ceil(fs * duration / 1000))
+    tone = np.sin(2 * np.pi * sound_frequency * (np.arange(n_samples) / fs))
+
+    n_ramp = int(ramp_duration / 1000 * fs)
+    if n_ramp > n_samples:
+        raise ValueError("The ramps are longer than the tone.")
+    if n_ramp > 0:
+        tone[:n_ramp] *= np.linspace(0, 1, n_ramp)
+        tone[n_samples - n_ramp:] *= np.linspace(1, 0, n_ramp)
+
+    return tone
+
+
+def render_sequence_samples(ioi_list, stimulus, bip_start_end, fs=48000):
+    """
+    Renders the samples of a full sequence directly into one float32 array.
+
+    The bip is placed at the first and last onsets, and the stimulus at the other onsets, as with `generate_stimuli`.
+    The onsets are those of `sequence_onsets`, and the samples are the same as those of the SoundSequence of
+    `create_sequence`, within float32 rounding.
+
+    Parameters
+    ----------
+    ioi_list : list or array
+        List of inter-onset intervals in ms.
+    stimulus : array
+        Samples of the stimulus, e.g., from `generate_tone`.
+    bip_start_end : array
+        Samples of the bip at the start and end of the sequence.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 48000.
+
+    Returns
+    -------
+    out : ndarray
+        Samples of the sequence, as 32-bit floats.
+    """
+    onsets = sequence_onsets_ms(ioi_list)
+    starts = (onsets * fs / 1000).astype(int)
+
+    stimulus = np.asarray(stimulus, dtype=np.float32)
+    bip_start_end = np.asarray(bip_start_end, dtype=np.float32)
+
+    samples = np.zeros(int(np.ceil(onsets[-1] / 1000 * fs + len(bip_start_end))), dtype=np.float32)
+    samples[starts[0]:starts[0] + len(bip_start_end)] += bip_start_end
+    for start in starts[1:-1]:
+        samples[start:start + len(stimulus)] += stimulus
+    samples[starts[-1]:starts[-1] + len(bip_start_end)] += bip_start_end
+
+    # Overlapping sounds are normalized, as in SoundSequence. The maximum is found without a temporary array.
+    maximum = max(samples.max(), -samples.min())
+    if maximum > 1:
+        samples /= maximum
+
+    return samples
@@ -0,0 +1,545 @@
+"""
+REAL-TIME ANALYSIS OF A TRIAL DURING ACQUISITION
+================================================
+This script analyzes the movement and sound signals of a trial while they are acquired, so that the inter-onset
+intervals (IOIs) and the tapping frequency are known as soon as the trial ends. Samples are consumed in blocks from a
+source: a CSV file replayed at real-time speed, a local socket, or a queue fed by another thread.
+
+For each block, the movement is filtered with a causal low-pass filter, stimulus onsets are detected with the
+thresholds of `detect_stimuli`, and flexion peaks are detected and validated with the rules of `identify_peak_flexion`.
+The work done for each block only depends on the block size and on the length of the detrending window, so the latency
+of each block is bounded.
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Classes
+-------
+OnlineAnalysis(fs=5000, task='SMT', cutoff=20, order=4, peak_threshold=50, min_velocity_sum=60, frequency_threshold=7.3, threshold=0.1, min_gap=100, amplitude=1.0)
+    Incremental detection of the stimulus onsets and flexion peaks of a trial.
+
+Functions
+---------
+file_source(file_path, block_size=250, fs=5000, realtime=True)
+    Replay the movement and sound signals of a CSV file in blocks.
+socket_source(address, block_size=250, dtype='<f4')
+    Receive the movement and sound signals in blocks from a socket.
+queue_source(blocks, timeout=None)
+    Get the movement and sound signals in blocks from a queue.
+analyze_stream(source, **kwargs)
+    Analyze the blocks of a source and yield the running estimates after each block.
+
+Usage
+-----
+    python -m src.streaming data/P01/P01_Pref__1.csv --task SMT
+    python -m src.streaming data/P01/P01_Pref__1.csv --task SMT --fast
+
+Notes
+-----
+The online detection differs from the offline detection in four ways. The causal filter delays the movement by its
+group delay, which is subtracted from the reported peak indices. The movement is detrended and normalized over the last
+three movement periods instead of the whole plateau; as this window may only contain the rest before the first
+movements, the peaks of the first window after the task onset are only accepted once the window is complete, if their
+height is above the threshold over the whole window. At high stimulus frequencies, a peak is accepted if it is at least
+half a period after the previous one, instead of keeping the highest peak within half a period. Finally, the end of the
+task is only known once the source is exhausted, so the peaks after it are removed by `OnlineAnalysis.finish`.
+
+Compared with `identify_peak_flexion` on the 75 trials of 3 synthetic participants (`synthetic_trial`, blocks of 250
+samples), the online detection found the same number of peaks in the 15 'SMT' trials, with a mean IOI within 0.05%;
+the individual IOIs differed by up to 5 ms at 2.8 Hz and up to 22 ms at 1.2 Hz, where the flexion dwell flattens the
+peaks. In the 'adapt', 'conti' and 'synch' trials, 53 of 60 had the same number of peaks and the others one peak less,
+the mean IOI was within 0.6%, and the individual IOIs differed by up to 45 ms.
+"""
+
+
+import argparse
+from collections import deque
+import socket
+import time
+
+import numpy as np
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+from scipy.signal import butter, find_peaks, group_delay, sosfilt, sosfilt_zi
+
+from src.batch_processing import ioi_statistics
+from src.stimulus_analysis import read_acquisition_csv
+
+# Lowest movement frequency, which sets the length of the history kept for the detrending window
+MIN_FREQUENCY = 0.5
+
+
+class OnlineAnalysis:
+    """
+    Incremental detection of the stimulus onsets and flexion peaks of a trial.
+
+    Blocks of samples are passed to `process`, which returns the onsets and peaks detected in the block and the
+    running IOI estimates.
+
+    Parameters
+    ----------
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    task : {'synch', 'adapt', 'conti', 'SMT'}, optional
+        Task identifier. For 'SMT', the peaks are counted between the first and second stimuli. For other tasks, they
+        are counted from the first stimulus of the task (see `task_onset`) to the last one (see `finish`). Default is
+        'SMT'.
+    cutoff : float, optional
+        Cutoff frequency for the low-pass filter in Hz. Default is 20.
+    order : int, optional
+        Order of the low-pass filter. Default is 4.
+    peak_threshold : float, optional
+        Minimum height for peaks in normalized movement signal. See `identify_peak_flexion`. Default is 50.
+    min_velocity_sum : float, optional
+        Minimum sum of absolute velocity between peaks to consider valid. See `identify_peak_flexion`. Default is 60.
+    frequency_threshold : float, optional
+        Frequency threshold for direct peak detection. See `identify_peak_flexion`. Default is 7.3 Hz.
+    threshold : float, optional
+        Detection threshold of the stimuli, relative to `amplitude`. See `detect_onsets`. Default is 0.1.
+    min_gap : int, optional
+        Number of samples below the threshold separating two stimuli. See `detect_onsets`. Default is 100.
+    amplitude : float, optional
+        Maximum absolute value of the sound signal. Offline, it is measured on the whole recording; online, it must be
+        known in advance. Default is 1.0.
+    """
+
+    __slots__ = (
+        'fs', 'task', 'peak_threshold', 'min_velocity_sum', 'frequency_threshold', 'threshold', 'min_gap', 'amplitude',
+        'delay', '_sos', '_zi', '_history', '_window', '_filtered', '_centered', '_tail', '_cum_movement', '_n_samples',
+        '_last_above', '_above', '_pending', '_startup_range', '_last_candidate', '_candidate_movement', '_last_valid',
+        'onsets', 'peaks'
+    )
+
+    def __init__(
+        self,
+        fs=5000,
+        task='SMT',
+        cutoff=20,
+        order=4,
+        peak_threshold=50,
+        min_velocity_sum=60,
+        frequency_threshold=7.3,
+        threshold=0.1,
+        min_gap=100,
+        amplitude=1.0
+    ):
+        self.fs = fs
+        self.task = task
+        self.peak_threshold = peak_threshold
+        self.min_velocity_sum = min_velocity_sum
+        self.frequency_threshold = frequency_threshold
+        self.threshold = threshold
+        self.min_gap = min_gap
+        self.amplitude = amplitude
+
+        # Causal filter, and its delay at a typical movement frequency (2 Hz), subtracted from the peak indices
+        self._sos = butter(order, cutoff, fs=fs, output='sos')
+        self._zi = None
+        self.delay = int(round(group_delay(butter(order, cutoff, fs=fs), w=[2], fs=fs)[1][0]))
+
+        self._history = int(3 / MIN_FREQUENCY * fs)
+        self._window = self._history
+        self._filtered = np.empty(0)
+        self._centered = np.empty(0)
+        self._tail = np.empty((0, 2))
+        self._cum_movement = 0.0
+        self._n_samples = 0
+
+        self._last_above = -np.inf
+        self._above = False
+        self._pending = []
+        self._startup_range = (np.inf, -np.inf)
+        self._last_candidate = None
+        self._candidate_movement = 0.0
+        self._last_valid = None
+
+        self.onsets = []
+        self.peaks = []
+
+    @property
+    def stim_freq(self):
+        """Stimulus frequency estimated from the last onsets, 2 Hz if it is unknown (as in `plateau_segments`)."""
+        onsets = self.onsets[1:] if self.task != 'SMT' else []
+        if len(onsets) < 2:
+            return 2
+        return self.fs / np.median(np.diff(onsets[-5:]))
+
+    @property
+    def task_onset(self):
+        """Index of the first stimulus of the task, as in `detect_stimuli` (None until it is detected)."""
+        # The start bip is not a stimulus of 'synch' sequences
+        first = 1 if self.task == 'synch' else 0
+        return self.onsets[first] if len(self.onsets) > first else None
+
+    def _detect_onsets(self, sound):
+        # Same rule as detect_onsets: first sample above the threshold after at least min_gap samples below it
+        above = np.abs(sound) / self.amplitude > self.threshold
+        edges = np.diff(np.concatenate(([self._above], above)).astype(np.int8))
+        rising = np.flatnonzero(edges == 1) + self._n_samples
+        falling = np.flatnonzero(edges == -1) - 1 + self._n_samples
+
+        previous_falling = np.searchsorted(falling, rising) - 1
+        previous_above = np.where(previous_falling >= 0, falling[np.maximum(previous_falling, 0)], self._last_above) \
+            if len(falling) > 0 else np.full(len(rising), self._last_above)
+        onsets = rising[rising - previous_above > self.min_gap]
+
+        if len(above) > 0:
+            if above[-1]:
+                self._last_above = self._n_samples + len(above) - 1
+            elif len(falling) > 0:
+                self._last_above = falling[-1]
+            self._above = above[-1]
+
+        self.onsets.extend(onsets.tolist())
+        return onsets
+
+    def _normalize(self, filtered):
+        # Detrending and normalization over the last three movement periods. The trailing mean shifts the peaks unless it
+        # covers whole periods, so the period is measured on the last peaks once they are known.
+        if len(self.peaks) > 2:
+            period = np.median(np.diff(self.peaks[-5:]))
+        else:
+            period = self.fs / self.stim_freq
+        window = int(min(3 * period, self._history))
+        self._window = window
+        n_history = len(self._filtered)
+
+        extended = np.concatenate((self._filtered, filtered))
+        cumsum = np.concatenate(([0], np.cumsum(extended)))
+        idx = np.arange(n_history, len(extended))
+        start = np.maximum(idx + 1 - window, 0)
+        centered = filtered - (cumsum[idx + 1] - cumsum[start]) / (idx + 1 - start)
+
+        # Only the last samples of the history are in the windows of the block
+        extended_centered = np.concatenate((self._centered, centered))
+        recent = extended_centered[max(n_history - window + 1, 0):]
+        origin = (window - 1) // 2
+        maximum = maximum_filter1d(recent, window, origin=origin, mode='nearest')[-len(centered):]
+        minimum = minimum_filter1d(recent, window, origin=origin, mode='nearest')[-len(centered):]
+        amplitude = maximum - minimum
+        normalized = np.divide(centered - minimum, amplitude, out=np.full(len(centered), 0.5), where=amplitude > 0) * 100
+
+        self._filtered = extended[-self._history:]
+        self._centered = extended_centered[-self._history:]
+        return centered, normalized
+
+    def _detect_peaks(self, centered, normalized):
+        # Local maxima of the detrended movement whose normalized height is above the threshold. The normalized movement
+        # is flat at 100 while the movement rises above its past maximum, so the maxima are located on the detrended
+        # movement. The last two samples of the previous block are prepended, so that maxima at the end of a block are
+        # found in the next one.
+        extended = np.concatenate((self._tail[:, 0], centered)) if len(self._tail) > 0 else centered
+        extended_normalized = np.concatenate((self._tail[:, 1], normalized)) if len(self._tail) > 0 else normalized
+        start = self._n_samples - len(self._tail)
+        candidates = find_peaks(extended)[0]
+        candidates = candidates[extended_normalized[candidates] >= self.peak_threshold] + start
+
+        # Cumulative movement (sum of absolute velocity) of the normalized signal at each sample of the extended block
+        previous = self._tail[-1, 1] if len(self._tail) > 0 else normalized[0]
+        cum_movement = self._cum_movement + np.cumsum(np.abs(np.diff(np.concatenate(([previous], normalized)))))
+        cum_movement = np.concatenate((np.full(len(self._tail), np.nan), cum_movement))
+        cum_movement[len(self._tail) - 1:len(self._tail)] = self._cum_movement
+
+        task_onset = self.task_onset if self.task_onset is not None else np.inf
+        task_offset = self.onsets[1] if self.task == 'SMT' and len(self.onsets) > 1 else np.inf
+        last = self._pending[-1][0] if len(self._pending) > 0 else self._last_candidate
+        candidates = [
+            (candidate, cum_movement[candidate - start], extended[candidate - start]) for candidate in candidates
+            if task_onset <= candidate - self.delay <= task_offset and (last is None or candidate > last)
+        ]
+
+        # Until a full normalization window has been seen from the task onset, the trailing window may only contain the
+        # rest before the first movements, whose jitter is scaled up to full flexions. The candidates of this window are
+        # kept, and their height is checked against the range of the whole window once it is complete, as the offline
+        # detection normalizes the whole plateau.
+        startup_end = task_onset + self._window
+        if self._startup_range is not None and task_onset < np.inf:
+            in_startup = np.arange(start, start + len(extended)) - self.delay
+            in_startup = (in_startup >= task_onset) & (in_startup < startup_end)
+            if np.any(in_startup):
+                self._startup_range = (
+                    min(self._startup_range[0], np.min(extended[in_startup])),
+                    max(self._startup_range[1], np.max(extended[in_startup]))
+                )
+            self._pending.extend(candidate for candidate in candidates if candidate[0] - self.delay < startup_end)
+            candidates = [candidate for candidate in candidates if candidate[0] - self.delay >= startup_end]
+            if self._n_samples + len(centered) - self.delay >= startup_end:
+                candidates = self._release_pending() + candidates
+
+        peaks = self._validate(candidates)
+
+        self._tail = np.column_stack((extended, extended_normalized))[-2:]
+        self._cum_movement = cum_movement[-1]
+        return peaks
+
+    def _release_pending(self):
+        # Candidates of the startup window whose height is above the threshold over the range of the window
+        minimum, maximum = self._startup_range
+        pending, self._pending, self._startup_range = self._pending, [], None
+        return [
+            candidate for candidate in pending
+            if maximum > minimum and (candidate[2] - minimum) / (maximum - minimum) * 100 >= self.peak_threshold
+        ]
+
+    def _validate(self, candidates):
+        # Rules of identify_peak_flexion for (index, cumulative movement, height) candidates in increasing order
+        min_distance = int(self.fs / self.stim_freq / 2)
+
+        peaks = []
+        for candidate, movement, _ in candidates:
+
+            # The first peak is always valid; the next ones must follow a full flexion-extension cycle (low frequencies)
+            # or be far enough from the previous peak (high frequencies)
+            if self._last_candidate is None:
+                valid = True
+            elif self.stim_freq < self.frequency_threshold:
+                valid = movement - self._candidate_movement > self.min_velocity_sum
+            else:
+                valid = candidate - self._last_valid >= min_distance
+            self._last_candidate, self._candidate_movement = candidate, movement
+
+            # As in identify_peak_flexion, the first valid peak is removed
+            if valid:
+                if self._last_valid is not None:
+                    peaks.append(candidate - self.delay)
+                self._last_valid = candidate
+
+        self.peaks.extend(peaks)
+        return np.array(peaks, dtype=int)
+
+    def process(self, movement, sound):
+        """
+        Process a block of samples.
+
+        Parameters
+        ----------
+        movement : array
+            Raw goniometer data of the block.
+        sound : array
+            Sound signal of the block.
+
+        Returns
+        -------
+        out : dict
+            Onsets ('onsets') and peaks ('peaks') detected in the block, and running estimates over all the peaks: number
+            of peaks ('n_peaks'), mean and standard deviation of the IOIs in seconds ('ioi_mean', 'ioi_sd'), mean and
+            standard deviation of the tapping frequency in Hz ('freq_mean', 'freq_sd'), coefficient of variation of the
+            IOIs in % ('ioi_cv'), time at the end of the block ('time') and processing time of the block ('latency').
+        """
+        block_start = time.perf_counter()
+        movement = np.asarray(movement, dtype=float)
+        sound = np.asarray(sound, dtype=float)
+
+        onsets = self._detect_onsets(sound)
+
+        peaks = np.array([], dtype=int)
+        if len(movement) > 0:
+            if self._zi is None:
+                self._zi = sosfilt_zi(self._sos) * movement[0]
+            filtered, self._zi = sosfilt(self._sos, movement, zi=self._zi)
+            peaks = self._detect_peaks(*self._normalize(filtered))
+        self._n_samples += len(movement)
+
+        return {
+            'onsets': onsets,
+            'peaks': peaks,
+            **self.summary(),
+            'time': self._n_samples / self.fs,
+            'latency': time.perf_counter() - block_start,
+        }
+
+    def finish(self):
+        """
+        End the trial once the source is exhausted.
+
+        The candidates still waiting for the end of the first normalization window are validated, and the peaks after 
+        the end of the task are removed. Except for 'SMT', the end of the task is only known once the last stimulus is 
+        detected: it is the end bip ('adapt' and 'conti') or the last stimulus before it ('synch'), as in 
+        `detect_stimuli` and `plateau_segments`.
+
+        Returns
+        -------
+        out : dict
+            Same as `process`, with the peaks validated by this call ('peaks') and the running estimates after the 
+            removal of the peaks after the end of the task.
+        """
+        block_start = time.perf_counter()
+        peaks = self._validate(self._release_pending()) if self._startup_range is not None else np.array([], dtype=int)
+
+        # Index of the last stimulus of the task in the detected onsets
+        last = {'SMT': 1, 'synch': len(self.onsets) - 2}.get(self.task, len(self.onsets) - 1)
+        if 0 <= last < len(self.onsets):
+            self.peaks = [peak for peak in self.peaks if peak <= self.onsets[last]]
+            peaks = peaks[peaks <= self.onsets[last]]
+
+        return {
+            'onsets': np.array([], dtype=int),
+            'peaks': peaks,
+            **self.summary(),
+            'time': self._n_samples / self.fs,
+            'latency': time.perf_counter() - block_start,
+        }
+
+    def summary(self):
+        """
+        Compute the running IOI estimates over all the detected peaks.
+
+        Returns
+        -------
+        out : dict
+            Number of peaks, mean, standard deviation and coefficient of variation of the IOIs, and mean and standard
+            deviation of the tapping frequency. NaN if less than two peaks were detected.
+        """
+        return {'n_peaks': len(self.peaks), **ioi_statistics(self.peaks, fs=self.fs)}
+
+
+def file_source(file_path, block_size=250, fs=5000, realtime=True):
+    """
+    Replay the movement and sound signals of a CSV file in blocks.
+
+    Parameters
+    ----------
+    file_path : str or Path
+        Path to the CSV file.
+    block_size : int, optional
+        Number of samples of each block. Default is 250 (50 ms at 5 kHz).
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    realtime : bool, optional
+        Whether to yield each block only when it would have been acquired. Default is True.
+
+    Yields
+    ------
+    movement, sound : array
+        Raw goniometer data and sound signal of each block.
+    """
+    _, gonio, sound = read_acquisition_csv(file_path, with_time=False)
+
+    replay_start = time.monotonic()
+    for start in range(0, len(gonio), block_size):
+        end = min(start + block_size, len(gonio))
+        if realtime:
+            time.sleep(max(0, replay_start + end / fs - time.monotonic()))
+        yield gonio[start:end], sound[start:end]
+
+
+def socket_source(address, block_size=250, dtype='<f4'):
+    """
+    Receive the movement and sound signals in blocks from a socket.
+
+    The sender writes the samples as interleaved binary pairs (movement, sound) of type `dtype`. The source stops when
+    the sender closes the connection.
+
+    Parameters
+    ----------
+    address : tuple
+        Host and port of the sender, e.g., ('localhost', 5000).
+    block_size : int, optional
+        Number of samples of each block. Default is 250.
+    dtype : str, optional
+        Data type of the samples. Default is '<f4' (little-endian 32-bit floats).
+
+    Yields
+    ------
+    movement, sound : array
+        Raw goniometer data and sound signal of each block.
+    """
+    dtype = np.dtype(dtype)
+    frame_size = 2 * dtype.itemsize
+
+    with socket.create_connection(address) as connection:
+        buffer = b''
+        while True:
+            data = connection.recv(block_size * frame_size - len(buffer))
+            buffer += data
+            if len(buffer) == block_size * frame_size or (not data and len(buffer) >= frame_size):
+                n_frames = len(buffer) // frame_size
+                samples = np.frombuffer(buffer[:n_frames * frame_size], dtype=dtype).reshape(-1, 2)
+                buffer = buffer[n_frames * frame_size:]
+                yield samples[:, 0].astype(float), samples[:, 1].astype(float)
+            if not data:
+                break
+
+
+def queue_source(blocks, timeout=None):
+    """
+    Get the movement and sound signals in blocks from a queue.
+
+    Parameters
+    ----------
+    blocks : queue.Queue
+        Queue of (movement, sound) blocks, filled by another thread. None marks the end of the trial.
+    timeout : float, optional
+        Maximum waiting time for a block in seconds. If None, wait indefinitely. Default is None.
+
+    Yields
+    ------
+    movement, sound : array
+        Raw goniometer data and sound signal of each block.
+    """
+    while (block := blocks.get(timeout=timeout)) is not None:
+        yield block
+
+
+def analyze_stream(source, **kwargs):
+    """
+    Analyze the blocks of a source and yield the running estimates after each block.
+
+    Parameters
+    ----------
+    source : iterable
+        Source of (movement, sound) blocks, e.g., `file_source`, `socket_source` or `queue_source`.
+    **kwargs
+        Keyword arguments passed to `OnlineAnalysis`.
+
+    Yields
+    ------
+    out : dict
+        Result of `OnlineAnalysis.process` for each block, then of `OnlineAnalysis.finish` once the source is 
+        exhausted.
+    """
+    analysis = OnlineAnalysis(**kwargs)
+    update = None
+    for movement, sound in source:
+        update = analysis.process(movement, sound)
+        yield update
+
+    if update is not None:
+        yield analysis.finish()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a trial file and print the running IOI estimates.")
+    parser.add_argument('file_path', help="CSV file of the trial.")
+    parser.add_argument('--task', default='SMT', choices=['synch', 'adapt', 'conti', 'SMT'], help="Task identifier.")
+    parser.add_argument('--fs', type=int, default=5000, help="Sampling frequency in Hz.")
+    parser.add_argument('--block-size', type=int, default=250, help="Number of samples of each block.")
+    parser.add_argument('--amplitude', type=float, default=1.0, help="Maximum absolute value of the sound signal.")
+    parser.add_argument('--fast', action='store_true', help="Replay the file as fast as possible.")
+    args = parser.parse_args(argv)
+
+    source = file_source(args.file_path, block_size=args.block_size, fs=args.fs, realtime=not args.fast)
+    latencies = deque(maxlen=1000)
+    update = None
+    for update in analyze_stream(source, fs=args.fs, task=args.task, amplitude=args.amplitude):
+        latencies.append(update['latency'])
+        for onset in update['onsets']:
+            print(f"{update['time']:7.2f} s  stimulus at {onset / args.fs:.3f} s")
+        if len(update['peaks']) > 0 and update['n_peaks'] > 1:
+            print(f"{update['time']:7.2f} s  {update['n_peaks']} peaks, IOI {update['ioi_mean']:.3f} s "
+                  f"(± {update['ioi_sd']:.3f}), {update['freq_mean']:.2f} Hz")
+
+    if update is None:
+        print("The source did not yield any block.")
+        return
+
+    print(f"Mean frequency: {update['freq_mean']:.2f} Hz (± {update['freq_sd']:.2f}), CV {update['ioi_cv']:.2f}%")
+    print(f"Maximum processing time per block: {max(latencies) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,431 @@
+"""
+SENSORIMOTOR SYNCHRONIZATION METRICS
+====================================
+This script computes the synchronization measures of the study from the detected peak flexions (`identify_peak_flexion`)
+and stimulus onsets (`detect_stimuli`): asynchronies between each stimulus and the nearest peak, relative phase,
+circular mean and vector strength, drift of the inter-onset intervals (IOIs), and time constant of the adaptation to a
+change of stimulus frequency.
+
+All the functions accept a single trial (1D arrays) or several trials at once (lists of arrays of different lengths).
+Several trials are processed in a single vectorized pass: their indices are shifted so that they do not overlap and
+concatenated, and the results are returned as 2D arrays padded with NaN, with one row per trial.
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Functions
+---------
+pad_trials(arrays, fill_value=np.nan)
+    Stack arrays of different lengths into a 2D array, one row per trial.
+match_peaks(peaks, stim_onset, plateaus=None)
+    Pair each stimulus with the nearest peak.
+synchronization_metrics(peaks, stim_onset, plateaus=None, fs=5000)
+    Compute the asynchrony and relative phase of each stimulus.
+circular_mean(phase, axis=-1)
+    Compute the circular mean of phases, ignoring NaN.
+vector_strength(phase, axis=-1)
+    Compute the vector strength (mean resultant length) of phases, ignoring NaN.
+plateau_statistics(metrics)
+    Compute the synchronization statistics of each plateau of each trial.
+ioi_drift(peaks, fs=5000, start=None, end=None)
+    Compute the drift of the inter-onset intervals of the peaks.
+adaptation_time_constant(values, target, t=None)
+    Estimate the time constant of the convergence of values to a target.
+
+Notes
+-----
+Asynchronies are computed as peak time minus stimulus time, so negative asynchronies mean that the peak flexion
+preceded the stimulus. A stimulus is paired with the nearest peak only if it is closer than half of the local
+inter-stimulus interval; otherwise, its asynchrony is NaN.
+"""
+
+
+import numpy as np
+import pandas as pd
+
+
+def pad_trials(arrays, fill_value=np.nan):
+    """
+    Stack arrays of different lengths into a 2D array, one row per trial.
+
+    Parameters
+    ----------
+    arrays : list
+        List of 1D arrays.
+    fill_value : float, optional
+        Value used after the end of the shorter arrays. Default is NaN.
+
+    Returns
+    -------
+    out : ndarray
+        2D array of floats of shape (number of arrays, length of the longest array).
+    """
+    lengths = np.array([len(array) for array in arrays], dtype=int)
+    padded = np.full((len(arrays), lengths.max(initial=0)), fill_value, dtype=float)
+    for idx, array in enumerate(arrays):
+        padded[idx, :lengths[idx]] = array
+    return padded
+
+
+def _as_trials(array):
+    # A single trial is a 1D array of numbers; several trials are a list of arrays
+    if len(array) > 0 and np.ndim(array[0]) > 0:
+        return [np.asarray(trial) for trial in array], False
+    return [np.asarray(array)], True
+
+
+def match_peaks(peaks, stim_onset, plateaus=None):
+    """
+    Pair each stimulus with the nearest peak.
+
+    A stimulus is paired with the nearest peak if it is closer than half of the local inter-stimulus interval, i.e.,
+    the mean of the intervals with the previous and next stimuli of the same plateau.
+
+    Parameters
+    ----------
+    peaks : array or list
+        Detected peak indices, or list of the detected peak indices of each trial.
+    stim_onset : array or list
+        Indices of stimulus onset times, or list of the stimulus onsets of each trial.
+    plateaus : array or list, optional
+        Plateau start and end indices as (start, end) pairs, or list of the plateaus of each trial. Intervals between
+        stimuli of different plateaus are not used as local intervals. If None, each trial is one plateau. Default is
+        None.
+
+    Returns
+    -------
+    matched_peaks : ndarray
+        Index of the peak paired with each stimulus, NaN if no peak is close enough.
+    local_ioi : ndarray
+        Local inter-stimulus interval of each stimulus in samples.
+    plateau : ndarray
+        Index of the plateau of each stimulus, -1 if the stimulus is in no plateau.
+    For several trials, the arrays have one row per trial and are padded with NaN (-1 for `plateau`).
+    """
+    peaks, single = _as_trials(peaks)
+    stim_onset, _ = _as_trials(stim_onset)
+    if plateaus is None:
+        plateaus = [np.array([[0, max(len(onsets) - 1, 0)]]) for onsets in stim_onset]
+    elif single:
+        plateaus = [plateaus]
+    plateaus = [np.asarray(trial_plateaus, dtype=int).reshape(-1, 2) for trial_plateaus in plateaus]
+
+    n_trials = len(stim_onset)
+    n_stimuli = np.array([len(onsets) for onsets in stim_onset], dtype=int)
+    n_peaks = np.array([len(trial_peaks) for trial_peaks in peaks], dtype=int)
+    n_plateaus = np.array([len(trial_plateaus) for trial_plateaus in plateaus], dtype=int)
+
+    # Shift the indices of each trial so that the trials do not overlap, and concatenate them
+    stride = max([np.max(array, initial=0) for array in peaks + stim_onset]) + 1
+    shift = np.arange(n_trials, dtype=np.int64) * int(stride)
+    stim_trial = np.repeat(np.arange(n_trials), n_stimuli)
+    peak_trial = np.repeat(np.arange(n_trials), n_peaks)
+    all_stimuli = np.concatenate([onsets.astype(np.int64) for onsets in stim_onset] + [[]]).astype(np.int64)
+    all_peaks = np.concatenate([trial_peaks.astype(np.int64) for trial_peaks in peaks] + [[]]).astype(np.int64)
+    all_stimuli += shift[stim_trial]
+    all_peaks += shift[peak_trial]
+
+    # Plateau of each stimulus: the last plateau starting before it, if the stimulus is not after its end. A last row
+    # of -1 is appended so that the stimuli before the first plateau (label -1) are in no plateau.
+    stim_start = np.concatenate(([0], np.cumsum(n_stimuli)[:-1]))
+    plateau_trial = np.append(np.repeat(np.arange(n_trials), n_plateaus), -1)
+    all_plateaus = np.concatenate(
+        [trial_plateaus + stim_start[idx] for idx, trial_plateaus in enumerate(plateaus)] + [[[-1, -1]]]
+    )
+    stim_idx = np.arange(len(all_stimuli))
+    label = np.searchsorted(all_plateaus[:-1, 0], stim_idx, side='right') - 1
+    in_plateau = (stim_idx <= all_plateaus[label, 1]) & (plateau_trial[label] == stim_trial)
+    label = np.where(in_plateau, label, -1)
+
+    # Local inter-stimulus interval: mean of the intervals with the neighbours of the same plateau
+    intervals = np.diff(all_stimuli).astype(float)
+    same_plateau = (label[1:] == label[:-1]) & (label[1:] >= 0) & (stim_trial[1:] == stim_trial[:-1])
+    neighbours = np.full((2, len(all_stimuli)), np.nan)
+    neighbours[0, 1:] = np.where(same_plateau, intervals, np.nan)
+    neighbours[1, :-1] = np.where(same_plateau, intervals, np.nan)
+    n_neighbours = np.sum(~np.isnan(neighbours), axis=0)
+    local_ioi = np.divide(np.nansum(neighbours, axis=0), n_neighbours, out=np.full(len(all_stimuli), np.nan),
+                          where=n_neighbours > 0)
+
+    # Nearest peak of the same trial on each side of each stimulus. A last peak of trial -1 is appended, so that the
+    # missing neighbours (indices -1 and number of peaks) are never in the same trial as the stimulus.
+    peak_trial = np.append(peak_trial, -1)
+    all_peaks = np.append(all_peaks, 0)
+    right = np.searchsorted(all_peaks[:-1], all_stimuli)
+    left = right - 1
+    distances = np.stack((all_stimuli - all_peaks[left], all_peaks[right] - all_stimuli)).astype(float)
+    distances[0, peak_trial[left] != stim_trial] = np.inf
+    distances[1, peak_trial[right] != stim_trial] = np.inf
+    nearest = np.where(distances[1] < distances[0], right, left)
+    distance = np.min(distances, axis=0)
+
+    matched = distance <= local_ioi / 2
+    matched_peaks = np.full(len(all_stimuli), np.nan)
+    matched_peaks[matched] = all_peaks[nearest[matched]] - shift[stim_trial[matched]]
+
+    # Index of the plateau within its trial
+    plateau_start = np.concatenate(([0], np.cumsum(n_plateaus)[:-1]))
+    label = np.where(label >= 0, label - plateau_start[stim_trial], -1)
+
+    if single:
+        return matched_peaks, local_ioi, label
+    position = stim_idx - stim_start[stim_trial]
+    padded = []
+    for values, fill_value in ((matched_peaks, np.nan), (local_ioi, np.nan), (label, -1)):
+        array = np.full((n_trials, n_stimuli.max(initial=0)), fill_value, dtype=values.dtype)
+        array[stim_trial, position] = values
+        padded.append(array)
+
+    return tuple(padded)
+
+
+def synchronization_metrics(peaks, stim_onset, plateaus=None, fs=5000):
+    """
+    Compute the asynchrony and relative phase of each stimulus.
+
+    Parameters
+    ----------
+    peaks : array or list
+        Detected peak indices, or list of the detected peak indices of each trial.
+    stim_onset : array or list
+        Indices of stimulus onset times, or list of the stimulus onsets of each trial.
+    plateaus : array or list, optional
+        Plateau start and end indices as (start, end) pairs, or list of the plateaus of each trial. See `match_peaks`.
+        Default is None.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+
+    Returns
+    -------
+    out : dict
+        Arrays with one value per stimulus (one row per trial for several trials):
+            - 'matched_peaks': index of the peak paired with the stimulus, NaN if none.
+            - 'asynchrony': peak time minus stimulus time in seconds.
+            - 'relative_phase': asynchrony as a phase of the local inter-stimulus interval, in radians between -pi and
+              pi.
+            - 'local_ioi': local inter-stimulus interval in seconds.
+            - 'plateau': index of the plateau of the stimulus, -1 if none.
+    """
+    matched_peaks, local_ioi, plateau = match_peaks(peaks, stim_onset, plateaus)
+    stimuli = pad_trials(_as_trials(stim_onset)[0])
+    if np.ndim(matched_peaks) == 1:
+        stimuli = stimuli[0]
+
+    asynchrony = (matched_peaks - stimuli) / fs
+    local_ioi = local_ioi / fs
+
+    return {
+        'matched_peaks': matched_peaks,
+        'asynchrony': asynchrony,
+        'relative_phase': 2 * np.pi * asynchrony / local_ioi,
+        'local_ioi': local_ioi,
+        'plateau': plateau,
+    }
+
+
+def _mean_resultant(phase, axis=-1):
+    # Mean of the unit vectors of the phases, ignoring NaN
+    phase = np.asarray(phase, dtype=float)
+    valid = ~np.isnan(phase)
+    n_valid = np.sum(valid, axis=axis)
+    resultant = np.sum(np.where(valid, np.exp(1j * np.where(valid, phase, 0)), 0), axis=axis)
+    return np.divide(resultant, n_valid, out=np.full(np.shape(n_valid), np.nan, dtype=complex), where=n_valid > 0)
+
+
+def circular_mean(phase, axis=-1):
+    """
+    Compute the circular mean of phases, ignoring NaN.
+
+    Parameters
+    ----------
+    phase : array_like
+        Phases in radians.
+    axis : int, optional
+        Axis along which the mean is computed. Default is -1.
+
+    Returns
+    -------
+    out : ndarray or float
+        Circular mean in radians between -pi and pi. NaN if there are no phases.
+    """
+    resultant = _mean_resultant(phase, axis=axis)
+    return np.where(np.isnan(resultant), np.nan, np.angle(resultant))[()]
+
+
+def vector_strength(phase, axis=-1):
+    """
+    Compute the vector strength (mean resultant length) of phases, ignoring NaN.
+
+    Parameters
+    ----------
+    phase : array_like
+        Phases in radians.
+    axis : int, optional
+        Axis along which the vector strength is computed. Default is -1.
+
+    Returns
+    -------
+    out : ndarray or float
+        Vector strength between 0 (phases uniformly spread) and 1 (identical phases). NaN if there are no phases.
+    """
+    resultant = _mean_resultant(phase, axis=axis)
+    return np.where(np.isnan(resultant), np.nan, np.abs(resultant))[()]
+
+
+def plateau_statistics(metrics):
+    """
+    Compute the synchronization statistics of each plateau of each trial.
+
+    All the plateaus of all the trials are summarized at once, by grouping the stimuli on their trial and plateau.
+
+    Parameters
+    ----------
+    metrics : dict
+        Synchronization metrics, as returned by `synchronization_metrics`.
+
+    Returns
+    -------
+    out : pandas.DataFrame
+        One row per trial and plateau, with the number of stimuli and matched peaks, the mean and standard deviation of
+        the asynchronies in seconds, and the circular mean (radians) and vector strength of the relative phases.
+    """
+    asynchrony = np.atleast_2d(metrics['asynchrony'])
+    phase = np.atleast_2d(metrics['relative_phase'])
+    plateau = np.atleast_2d(metrics['plateau'])
+
+    # Group of each stimulus, as a single integer key
+    n_groups = int(plateau.max(initial=-1)) + 1
+    trial = np.broadcast_to(np.arange(plateau.shape[0])[:, None], plateau.shape)
+    in_group = plateau >= 0
+    key = (trial * n_groups + plateau)[in_group]
+    n_keys = plateau.shape[0] * n_groups
+
+    matched = ~np.isnan(asynchrony[in_group])
+    values = np.where(matched, asynchrony[in_group], 0)
+    angles = np.where(matched, phase[in_group], 0)
+
+    n_stimuli = np.bincount(key, minlength=n_keys)
+    n_matched = np.bincount(key, weights=matched, minlength=n_keys)
+    total = np.bincount(key, weights=values, minlength=n_keys)
+    total_squares = np.bincount(key, weights=values ** 2, minlength=n_keys)
+    total_cos = np.bincount(key, weights=np.where(matched, np.cos(angles), 0), minlength=n_keys)
+    total_sin = np.bincount(key, weights=np.where(matched, np.sin(angles), 0), minlength=n_keys)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / n_matched
+        sd = np.sqrt(np.maximum(total_squares / n_matched - mean ** 2, 0))
+        resultant = (total_cos + 1j * total_sin) / n_matched
+
+    keep = n_stimuli > 0
+    return pd.DataFrame({
+        'trial': (np.arange(n_keys) // max(n_groups, 1))[keep],
+        'plateau': (np.arange(n_keys) % max(n_groups, 1))[keep],
+        'n_stimuli': n_stimuli[keep],
+        'n_matched': n_matched[keep].astype(int),
+        'mean_asynchrony': mean[keep],
+        'sd_asynchrony': sd[keep],
+        'circular_mean': np.angle(resultant[keep]),
+        'vector_strength': np.abs(resultant[keep]),
+    })
+
+
+def ioi_drift(peaks, fs=5000, start=None, end=None):
+    """
+    Compute the drift of the inter-onset intervals of the peaks.
+
+    The drift is the slope of the linear regression of the IOIs on time, e.g., the tendency to speed up or slow down
+    during continuation.
+
+    Parameters
+    ----------
+    peaks : array or list
+        Detected peak indices, or list of the detected peak indices of each trial.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    start : int or array_like, optional
+        Index from which the peaks are used, for all the trials or for each trial. If None, all the peaks from the
+        beginning are used. Default is None.
+    end : int or array_like, optional
+        Index until which the peaks are used, for all the trials or for each trial. If None, all the peaks until the end
+        are used. Default is None.
+
+    Returns
+    -------
+    out : float or ndarray
+        Change of the IOI per second, in seconds per second, for each trial. NaN if less than two IOIs are available.
+    """
+    peaks_list, single = _as_trials(peaks)
+    peaks = pad_trials(peaks_list)
+
+    # Only the IOIs between two peaks in [start, end] are used
+    start = -np.inf if start is None else np.asarray(start, dtype=float).reshape(-1, 1)
+    end = np.inf if end is None else np.asarray(end, dtype=float).reshape(-1, 1)
+    peaks = np.where((peaks >= start) & (peaks <= end), peaks, np.nan)
+
+    iois = np.diff(peaks, axis=1) / fs
+    t = peaks[:, :-1] / fs
+    valid = ~np.isnan(iois)
+    n_valid = np.sum(valid, axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_mean = np.nansum(np.where(valid, t, np.nan), axis=1) / n_valid
+        ioi_mean = np.nansum(iois, axis=1) / n_valid
+        t_centered = np.where(valid, t - t_mean[:, None], 0)
+        slope = np.sum(t_centered * np.where(valid, iois - ioi_mean[:, None], 0), axis=1) / np.sum(t_centered ** 2,
+                                                                                                  axis=1)
+    slope = np.where(n_valid >= 2, slope, np.nan)
+
+    return slope[0] if single else slope
+
+
+def adaptation_time_constant(values, target, t=None):
+    """
+    Estimate the time constant of the convergence of values to a target.
+
+    After a change of stimulus frequency, the IOIs (or asynchronies) of the participant are assumed to converge
+    exponentially to their new target: |value - target| = A * exp(-t / tau). The time constant tau is estimated by the
+    linear regression of log|value - target| on t.
+
+    Parameters
+    ----------
+    values : array or list
+        Values after the change (e.g., IOIs in seconds), or list of the values of each trial. NaN values are ignored.
+    target : float or array_like
+        Target value, for all the trials or for each trial (e.g., the new inter-stimulus interval).
+    t : array or list, optional
+        Time of each value, in the same layout as `values`. If None, the index of each value is used, and the time
+        constant is a number of values (e.g., of movements). Default is None.
+
+    Returns
+    -------
+    out : float or ndarray
+        Time constant for each trial. NaN if the values do not converge to the target or if less than two values are
+        available.
+    """
+    values_list, single = _as_trials(values)
+    values = pad_trials(values_list)
+    if t is None:
+        t = np.broadcast_to(np.arange(values.shape[1], dtype=float), values.shape)
+    else:
+        t = pad_trials(_as_trials(t)[0])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_error = np.log(np.abs(values - np.asarray(target, dtype=float).reshape(-1, 1)))
+    valid = np.isfinite(log_error) & ~np.isnan(t)
+    n_valid = np.sum(valid, axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_mean = np.sum(np.where(valid, t, 0), axis=1) / n_valid
+        log_mean = np.sum(np.where(valid, log_error, 0), axis=1) / n_valid
+        t_centered = np.where(valid, t - t_mean[:, None], 0)
+        slope = np.sum(t_centered * np.where(valid, log_error - log_mean[:, None], 0), axis=1) / np.sum(
+            t_centered ** 2, axis=1
+        )
+        tau = np.where((n_valid >= 2) & (slope < 0), -1 / slope, np.nan)
+
+    return tau[0] if single else tau
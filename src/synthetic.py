@@ -0,0 +1,213 @@
+"""
+SYNTHETIC RECORDINGS
+====================
+This script synthesizes goniometer and sound signals that mimic the acquisition of a trial: sound bips at the stimulus
+onsets, and flexion-extension movements synchronized with the stimuli, with a negative mean asynchrony, a timing
+variability, a slow drift of the baseline and a measurement noise. The flexion of the slow movements can be held with a
+small dip, which gives two peaks per movement as for participants who keep their finger in flexion. The index of the
+peak flexion of each movement is returned, so that the signals can be used to test or benchmark the analysis.
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Functions
+---------
+synthetic_onsets(duration, frequency, fs=5000, silence=1)
+    Onsets of a start bip, stimuli at a constant rate and an end bip.
+synthetic_sound(onsets, n_samples, fs=5000, tone_frequency=440, tone_duration=0.05, noise=0.002, seed=None)
+    Sound signal with a tone at each onset.
+synthetic_movement(targets, n_samples, fs=5000, amplitude=30, dwell=0, drift=3, noise=0.3, seed=None)
+    Goniometer signal with a flexion at each target, and the indices of the peak flexions.
+synthetic_recording(duration, frequency, fs=5000, asynchrony=-0.03, variability=0.03, dwell=None, seed=None)
+    Synthesize the signals of a synchronization trial at a constant stimulus rate.
+
+Usage
+-----
+    recording = synthetic_recording(300, 2, seed=0)
+    recording['gonio'], recording['sound'], recording['peaks']
+"""
+
+
+import numpy as np
+
+
+def synthetic_onsets(duration, frequency, fs=5000, silence=1):
+    """
+    Onsets of a start bip, stimuli at a constant rate and an end bip.
+
+    Parameters
+    ----------
+    duration : float
+        Duration of the recording in s.
+    frequency : float
+        Stimulus frequency in Hz.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    silence : float, optional
+        Duration in s before the start bip, between the bips and the stimuli, and after the end bip. Default is 1.
+
+    Returns
+    -------
+    out : ndarray
+        Indices of the start bip, the stimuli and the end bip.
+    """
+    n_stimuli = int((duration - 4 * silence) * frequency) + 1
+    if n_stimuli < 2:
+        raise ValueError("The recording is too short for the stimulus frequency.")
+
+    stimuli = 2 * silence + np.arange(n_stimuli) / frequency
+    times = np.concatenate(([silence], stimuli, [stimuli[-1] + silence]))
+    return np.round(times * fs).astype(int)
+
+
+def synthetic_sound(onsets, n_samples, fs=5000, tone_frequency=440, tone_duration=0.05, noise=0.002, seed=None):
+    """
+    Sound signal with a tone at each onset.
+
+    Parameters
+    ----------
+    onsets : array
+        Indices of the onsets of the tones.
+    n_samples : int
+        Number of samples of the signal.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    tone_frequency : float, optional
+        Frequency of the tones in Hz. Default is 440.
+    tone_duration : float, optional
+        Duration of the tones in s. Default is 0.05.
+    noise : float, optional
+        Standard deviation of the noise, relative to the amplitude of the tones. Default is 0.002.
+    seed : int, optional
+        Seed of the noise. Default is None.
+
+    Returns
+    -------
+    out : ndarray
+        Sound signal.
+    """
+    sound = np.random.default_rng(seed).normal(0, noise, n_samples)
+    tone = np.sin(2 * np.pi * tone_frequency * np.arange(int(tone_duration * fs)) / fs)
+
+    for onset in onsets:
+        end = min(onset + len(tone), n_samples)
+        sound[onset:end] += tone[:end - onset]
+
+    return sound
+
+
+def synthetic_movement(targets, n_samples, fs=5000, amplitude=30, dwell=0, drift=3, noise=0.3, seed=None):
+    """
+    Goniometer signal with a flexion at each target, and the indices of the peak flexions.
+
+    The phase of the movement increases by one cycle between consecutive targets, and the finger rests in extension
+    half a cycle before the first target and after the last one. With a dwell, the flexion has a dip slightly after
+    the target, so each movement has two peaks, the first one being the highest.
+
+    Parameters
+    ----------
+    targets : array
+        Indices of the flexions, in increasing order.
+    n_samples : int
+        Number of samples of the signal.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    amplitude : float, optional
+        Amplitude of the movement in degrees. Default is 30.
+    dwell : float, optional
+        Depth of the dip of the flexion, relative to the amplitude. Default is 0 (no dip).
+    drift : float, optional
+        Amplitude of the slow drift of the baseline (0.05 Hz) in degrees. Default is 3.
+    noise : float, optional
+        Standard deviation of the measurement noise in degrees. Default is 0.3.
+    seed : int, optional
+        Seed of the noise. Default is None.
+
+    Returns
+    -------
+    gonio : ndarray
+        Goniometer signal.
+    peaks : ndarray
+        Indices of the peak flexion of each movement in the signal without noise.
+    """
+    targets = np.asarray(targets, dtype=float)
+    samples = np.arange(n_samples)
+
+    # Phase in cycles, with half a cycle of rest in extension before the first flexion and after the last one
+    first_period, last_period = targets[1] - targets[0], targets[-1] - targets[-2]
+    knots = np.concatenate(([targets[0] - first_period / 2], targets, [targets[-1] + last_period / 2]))
+    phase = np.interp(samples, knots, np.concatenate(([-0.5], np.arange(len(targets)), [len(targets) - 0.5])))
+
+    # Distance to the nearest flexion in cycles
+    cycle_phase = phase - np.round(phase)
+    clean = np.cos(2 * np.pi * phase)
+    if dwell:
+        clean -= dwell * np.exp(-(cycle_phase - 0.02) ** 2 / (2 * 0.05 ** 2))
+    clean = amplitude * clean + drift * np.sin(2 * np.pi * 0.05 * samples / fs)
+
+    # Peak flexion of each movement, between the extensions before and after it
+    bounds = np.searchsorted(phase, np.arange(len(targets) + 1) - 0.5)
+    peaks = np.array([start + np.argmax(clean[start:end]) for start, end in zip(bounds[:-1], bounds[1:])])
+
+    gonio = clean + np.random.default_rng(seed).normal(0, noise, n_samples)
+    return gonio, peaks
+
+
+def synthetic_recording(duration, frequency, fs=5000, asynchrony=-0.03, variability=0.03, dwell=None, seed=None):
+    """
+    Synthesize the signals of a synchronization trial at a constant stimulus rate.
+
+    The recording is a 'synch' trial with a single plateau: a start bip, stimuli at `frequency` and an end bip.
+
+    Parameters
+    ----------
+    duration : float
+        Duration of the recording in s.
+    frequency : float
+        Stimulus frequency in Hz.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    asynchrony : float, optional
+        Mean time in s between the stimuli and the flexions. Default is -0.03 (flexions anticipate the stimuli).
+    variability : float, optional
+        Standard deviation of the timing of the flexions, relative to the stimulus period. Default is 0.03.
+    dwell : float, optional
+        Depth of the dip of the flexions. See `synthetic_movement`. If None, it is 0.3 below 2 Hz and 0 otherwise.
+        Default is None.
+    seed : int, optional
+        Seed of the noise. Default is None.
+
+    Returns
+    -------
+    out : dict
+        Time vector ('t'), goniometer ('gonio') and sound ('sound') signals, indices of the bips and stimuli ('onsets'),
+        of the stimuli only ('stim_onset') and of the peak flexions ('peaks'), and the stimulus frequency in Hz
+        ('frequency').
+    """
+    rng = np.random.default_rng(seed)
+    onsets = synthetic_onsets(duration, frequency, fs=fs)
+    n_samples = int(round(duration * fs))
+    if dwell is None:
+        dwell = 0.3 if frequency < 2 else 0
+
+    stim_onset = onsets[1:-1]
+    period = fs / frequency
+    targets = stim_onset + asynchrony * fs + rng.normal(0, variability * period, len(stim_onset))
+
+    gonio, peaks = synthetic_movement(targets, n_samples, fs=fs, dwell=dwell, seed=rng.integers(2**32))
+    sound = synthetic_sound(onsets, n_samples, fs=fs, seed=rng.integers(2**32))
+
+    return {
+        't': np.arange(n_samples) / fs,
+        'gonio': gonio,
+        'sound': sound,
+        'onsets': onsets,
+        'stim_onset': stim_onset,
+        'peaks': peaks,
+        'frequency': frequency,
+    }
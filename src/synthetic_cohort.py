@@ -0,0 +1,418 @@
+"""
+SYNTHETIC COHORT
+================
+This script writes synthetic cohorts in the format of the acquisition CSV files (see `write_acquisition_csv`), with the
+directory layout and file names expected by `discover_trials`: one directory per participant, with 5 'Pref' (SMT), 6
+'adapt', 6 'conti' and 8 'synch' trials. The stimuli of each trial follow the participant's schedule (see
+`build_session`), and the movement is synthesized from the participant's traits (SMT, mean asynchrony, timing
+variability, amplitude, flexion dwell). Half of the participants are written with '.' as decimal symbol and the other
+half with ','.
+
+The indices of the peak flexions of each trial are saved as ground truth, so that the accuracy of
+`identify_peak_flexion` can be measured on the results of the batch pipeline (see `run_batch`).
+
+Author: Martin Le Guennec
+Email: martin.le-guennec@umontpellier.fr
+
+Versions
+---------
+2026-10-18: v1.0.0.
+    First version of the script.
+
+Functions
+---------
+participant_id(participant_number, n_participants=None)
+    Identifier of a synthetic participant.
+participant_traits(rng)
+    Draw the movement traits of a synthetic participant.
+trial_targets(task, onsets, traits, fs=5000, rng=None)
+    Times of the flexions of a participant during a trial.
+synthetic_trial(schedule, traits, fs=5000, seed=None)
+    Synthesize the goniometer and sound signals of a trial.
+write_participant(participant_number, cohort_dir, n_participants=None, fs=5000, seed=0, decimal_symbol=None, tasks=None)
+    Write the trial files and the ground truth of a synthetic participant.
+generate_cohort(cohort_dir, n_participants, fs=5000, seed=0, decimal_symbol=None, tasks=None, max_workers=None)
+    Write a synthetic cohort.
+evaluate_cohort(cohort_dir, results_dir, fs=5000, tolerance=0.05)
+    Compare the peaks detected by the batch pipeline with the ground truth.
+
+Usage
+-----
+    python -m src.synthetic_cohort generate synthetic_data --participants 1000 --workers 8
+    python -m src.batch_processing synthetic_data --workers 8 --results-dir synthetic_results --output synthetic.csv
+    python -m src.synthetic_cohort evaluate synthetic_data --results-dir synthetic_results
+
+Notes
+-----
+Synthetic participants are named 'S001', 'S002', etc., so that they never get the custom peak detection parameters of
+real participants. The ground truth is written in `<cohort_dir>/ground_truth/<file name>.npz`, and a table of the
+trials in `<cohort_dir>/cohort.csv`; both are ignored by `discover_trials`. Each participant takes about 400 MB.
+"""
+
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.batch_processing import TASKS, map_trials
+from src.peak_detection import compare_peaks
+from src.schedule import build_session
+from src.stimulus_analysis import write_acquisition_csv
+from src.synthetic import synthetic_movement, synthetic_sound
+
+
+# Task identifiers of the schedules, and the corresponding task identifiers in the file names
+FILE_TASKS = {task: file_task for file_task, task in TASKS.items()}
+
+# Duration of the stimuli and of the start and end bips in s, as in `generate_stimuli`
+STIMULUS_DURATION = 0.04
+BIP_DURATION = 0.5
+
+
+def participant_id(participant_number, n_participants=None):
+    """
+    Identifier of a synthetic participant.
+
+    Parameters
+    ----------
+    participant_number : int
+        Participant number.
+    n_participants : int, optional
+        Number of participants of the cohort, which sets the number of digits (at least 3). Default is None.
+
+    Returns
+    -------
+    out : str
+        Identifier, e.g., 'S001'.
+    """
+    width = max(3, len(str(n_participants or 0)))
+    return f"S{participant_number:0{width}d}"
+
+
+def participant_traits(rng):
+    """
+    Draw the movement traits of a synthetic participant.
+
+    Parameters
+    ----------
+    rng : numpy.random.Generator
+        Random generator.
+
+    Returns
+    -------
+    out : dict
+        SMT in Hz ('smt'), mean asynchrony in s ('asynchrony'), timing variability relative to the period
+        ('variability'), amplitude and offset of the movement in degrees ('amplitude', 'offset'), depth of the flexion
+        dwell ('dwell', 0 for participants who do not hold the flexion), tempo drift of the continuation relative to the
+        period ('continuation_drift'), and gain of the sound channel ('sound_gain').
+    """
+    return {
+        'smt': float(np.round(rng.uniform(1, 3), 2)),
+        'asynchrony': rng.normal(-0.03, 0.015),
+        'variability': rng.uniform(0.02, 0.05),
+        'amplitude': rng.uniform(20, 40),
+        'offset': rng.uniform(-20, 20),
+        'dwell': 0.3 if rng.random() < 0.3 else 0,
+        'continuation_drift': rng.normal(0, 0.03),
+        'sound_gain': rng.uniform(0.5, 2),
+    }
+
+
+def _tapping(start, end, period, variability, rng):
+    # Self-paced flexions from `start` to `end`, with a timing variability
+    n = int((end - start) / period) + 1
+    times = start + np.cumsum(np.concatenate(([0], period * (1 + rng.normal(0, variability, n - 1)))))
+    return times[times < end]
+
+
+def trial_targets(task, onsets, traits, fs=5000, rng=None):
+    """
+    Times of the flexions of a participant during a trial.
+
+    The participant taps at the SMT between the bips of the SMT trials, synchronizes with the stimuli, continues at the
+    stimulus period (with a tempo drift) after the last stimulus of the 'conti' and 'adapt' trials, and taps at the SMT
+    after the reminder stimuli of the 'adapt' trials until the stimuli start.
+
+    Parameters
+    ----------
+    task : {'SMT', 'adapt', 'conti', 'synch'}
+        Task of the trial.
+    onsets : array
+        Indices of the onsets of the start bip, the stimuli and the end bip in the recording.
+    traits : dict
+        Traits of the participant, as returned by `participant_traits`.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    rng : numpy.random.Generator, optional
+        Random generator. Default is None.
+
+    Returns
+    -------
+    out : ndarray
+        Indices of the flexions, in increasing order.
+    """
+    rng = np.random.default_rng(rng)
+    variability = traits['variability']
+    smt_period = fs / traits['smt']
+
+    def synchronize(stimuli):
+        period = np.median(np.diff(stimuli))
+        return stimuli + traits['asynchrony'] * fs + rng.normal(0, variability * period, len(stimuli))
+
+    def continue_after(stimuli, end):
+        period = np.median(np.diff(stimuli[-5:])) * (1 + traits['continuation_drift'])
+        return _tapping(stimuli[-1] + period, end - period / 2, period, variability, rng)
+
+    if task == 'SMT':
+        start = onsets[0] + rng.uniform(0.5, 1.5) * fs
+        return _tapping(start, onsets[-1] - smt_period / 2, smt_period, variability, rng)
+
+    if task == 'synch':
+        return synchronize(onsets[1:-1])
+
+    if task == 'conti':
+        stimuli = onsets[1:-1]
+        return np.concatenate((synchronize(stimuli), continue_after(stimuli, onsets[-1])))
+
+    if task == 'adapt':
+        # Start bip, 3 reminders at the SMT, then the stimuli at the new frequency
+        stimuli = onsets[4:-1]
+        first_period = np.median(np.diff(stimuli))
+        self_paced = _tapping(onsets[1], stimuli[0] - max(smt_period, first_period) / 2, smt_period, variability, rng)
+        return np.concatenate((self_paced, synchronize(stimuli), continue_after(stimuli, onsets[-1])))
+
+    raise ValueError("Task must be either 'synch', 'adapt', 'conti' or 'SMT'.")
+
+
+def synthetic_trial(schedule, traits, fs=5000, seed=None):
+    """
+    Synthesize the goniometer and sound signals of a trial.
+
+    The acquisition starts 1 to 3 s before the sequence and stops 2 s after the end bip.
+
+    Parameters
+    ----------
+    schedule : dict
+        Schedule of the trial, as returned by `trial_schedule` with the sampling frequency of the acquisition.
+    traits : dict
+        Traits of the participant, as returned by `participant_traits`.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    seed : int, optional
+        Seed of the trial. Default is None.
+
+    Returns
+    -------
+    out : dict
+        Goniometer ('gonio') and sound ('sound') signals, indices of the onsets of the bips and stimuli ('onsets') and
+        of the peak flexions ('peaks').
+    """
+    rng = np.random.default_rng(seed)
+    onsets = np.asarray(schedule['onsets']) + int(rng.uniform(1, 3) * fs)
+    n_samples = int(onsets[-1] + (BIP_DURATION + 2) * fs)
+
+    targets = trial_targets(schedule['task'], onsets, traits, fs=fs, rng=rng)
+    rate = fs / np.median(np.diff(targets))
+    gonio, peaks = synthetic_movement(
+        targets, n_samples, fs=fs, amplitude=traits['amplitude'], dwell=traits['dwell'] if rate < 2 else 0,
+        seed=rng.integers(2**32)
+    )
+
+    # Stimuli and bips, with the durations of the rendered sequences
+    sound = synthetic_sound(onsets[1:-1], n_samples, fs=fs, tone_duration=STIMULUS_DURATION, seed=rng.integers(2**32))
+    sound += synthetic_sound(onsets[[0, -1]], n_samples, fs=fs, tone_duration=BIP_DURATION, noise=0)
+
+    return {
+        'gonio': gonio + traits['offset'],
+        'sound': sound * traits['sound_gain'],
+        'onsets': onsets,
+        'peaks': peaks,
+    }
+
+
+def write_participant(
+    participant_number, cohort_dir, n_participants=None, fs=5000, seed=0, decimal_symbol=None, tasks=None
+):
+    """
+    Write the trial files and the ground truth of a synthetic participant.
+
+    Parameters
+    ----------
+    participant_number : int
+        Participant number, used to randomize the conditions (see `randomize_conditions`) and to seed the participant.
+    cohort_dir : str or Path
+        Directory of the cohort.
+    n_participants : int, optional
+        Number of participants of the cohort. See `participant_id`. Default is None.
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    seed : int, optional
+        Seed of the cohort. Default is 0.
+    decimal_symbol : {'.', ','}, optional
+        Symbol used for decimals. If None, '.' is used for odd participant numbers and ',' for even ones. Default is
+        None.
+    tasks : list, optional
+        Tasks to write, as written in the file names (e.g., 'Pref', 'synch'). If None, all tasks are written. Default
+        is None.
+
+    Returns
+    -------
+    out : list of dict
+        Description of each trial: participant, task and trial number, condition, SMT and stimulus frequency in Hz,
+        decimal symbol, number of samples and of ground-truth peaks, and path of the file.
+    """
+    cohort_dir = Path(cohort_dir)
+    participant = participant_id(participant_number, n_participants)
+    if decimal_symbol is None:
+        decimal_symbol = '.' if participant_number % 2 else ','
+
+    rng = np.random.default_rng([seed, participant_number])
+    traits = participant_traits(rng)
+    session = build_session(participant_number, traits['smt'], fs=fs)
+
+    (cohort_dir / participant).mkdir(parents=True, exist_ok=True)
+    (cohort_dir / 'ground_truth').mkdir(parents=True, exist_ok=True)
+
+    rows = []
+    for task, schedules in session.items():
+        file_task = FILE_TASKS[task]
+        if tasks is not None and file_task not in tasks:
+            continue
+
+        for trial_number, schedule in enumerate(schedules, start=1):
+            trial = synthetic_trial(schedule, traits, fs=fs, seed=rng.integers(2**32))
+            file_path = cohort_dir / participant / f"{participant}_{file_task}__{trial_number}.csv"
+            write_acquisition_csv(file_path, trial['gonio'], trial['sound'], fs=fs, decimal_symbol=decimal_symbol)
+            np.savez(
+                cohort_dir / 'ground_truth' / f"{file_path.stem}.npz", peaks=trial['peaks'], onsets=trial['onsets']
+            )
+
+            frequencies = schedule['parameters'].get('frequencies', [])
+            rows.append({
+                'participant': participant,
+                'task': file_task,
+                'trial': trial_number,
+                'condition': schedule['condition'],
+                'smt': traits['smt'],
+                'frequency': frequencies[-1] if task in ('adapt', 'conti') else np.nan,
+                'decimal_symbol': decimal_symbol,
+                'n_samples': len(trial['gonio']),
+                'n_peaks': len(trial['peaks']),
+                'file_path': str(file_path),
+            })
+
+    return rows
+
+
+def generate_cohort(cohort_dir, n_participants, fs=5000, seed=0, decimal_symbol=None, tasks=None, max_workers=None):
+    """
+    Write a synthetic cohort.
+
+    Participants are written in parallel in a pool of processes.
+
+    Parameters
+    ----------
+    cohort_dir : str or Path
+        Directory of the cohort.
+    n_participants : int
+        Number of participants.
+    fs, seed, decimal_symbol, tasks
+        See `write_participant`.
+    max_workers : int, optional
+        Number of processes. See `map_trials`. Default is None.
+
+    Returns
+    -------
+    out : pandas.DataFrame
+        One row per trial, as returned by `write_participant`, also written in `<cohort_dir>/cohort.csv`.
+    """
+    Path(cohort_dir).mkdir(parents=True, exist_ok=True)
+    participants = map_trials(
+        write_participant, range(1, n_participants + 1), max_workers=max_workers, cohort_dir=cohort_dir,
+        n_participants=n_participants, fs=fs, seed=seed, decimal_symbol=decimal_symbol, tasks=tasks
+    )
+
+    cohort = pd.DataFrame([row for rows in participants for row in rows])
+    cohort.to_csv(Path(cohort_dir) / 'cohort.csv', index=False)
+
+    return cohort
+
+
+def evaluate_cohort(cohort_dir, results_dir, fs=5000, tolerance=0.05):
+    """
+    Compare the peaks detected by the batch pipeline with the ground truth.
+
+    Parameters
+    ----------
+    cohort_dir : str or Path
+        Directory of the cohort.
+    results_dir : str or Path
+        Directory in which the batch pipeline saved the detected peaks (see `run_batch`).
+    fs : int, optional
+        Sampling frequency in Hz. Default is 5000.
+    tolerance : float, optional
+        Maximum distance in s between a ground-truth peak and a detected peak. See `compare_peaks`. Default is 0.05.
+
+    Returns
+    -------
+    out : pandas.DataFrame
+        One row per trial of `cohort.csv`, with the results of `compare_peaks`, the proportions of ground-truth peaks
+        that were detected ('recall') and of detected peaks that are true peaks ('precision'). Trials without results
+        have NaN values.
+    """
+    cohort = pd.read_csv(Path(cohort_dir) / 'cohort.csv')
+
+    rows = []
+    for trial in cohort.itertuples(index=False):
+        stem = Path(trial.file_path).stem
+        row = {'participant': trial.participant, 'task': trial.task, 'trial': trial.trial, 'condition': trial.condition}
+
+        results_path = Path(results_dir) / f"{stem}.npz"
+        if results_path.exists():
+            reference = np.load(Path(cohort_dir) / 'ground_truth' / f"{stem}.npz")['peaks']
+            detected = np.load(results_path)['peaks']
+            comparison = compare_peaks(reference, detected, fs=fs, tolerance=tolerance)
+            row.update(comparison)
+            row['recall'] = comparison['n_matched'] / comparison['n_reference']
+            n_detected = comparison['n_detected']
+            row['precision'] = comparison['n_matched'] / n_detected if n_detected else np.nan
+
+        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic cohort, or evaluate the peak detection on it.")
+    parser.add_argument('command', choices=['generate', 'evaluate'])
+    parser.add_argument('cohort_dir', nargs='?', default='synthetic_data', help="Directory of the cohort.")
+    parser.add_argument('--participants', type=int, default=10, help="Number of participants ('generate').")
+    parser.add_argument('--tasks', nargs='+', default=None, choices=list(TASKS), help="Tasks to write ('generate').")
+    parser.add_argument('--decimal', default=None, choices=['.', ','],
+                        help="Symbol used for decimals ('generate'). By default, both are used.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the cohort ('generate').")
+    parser.add_argument('--workers', type=int, default=None, help="Number of processes ('generate').")
+    parser.add_argument('--results-dir', default='synthetic_results',
+                        help="Directory of the peaks detected by the batch pipeline ('evaluate').")
+    parser.add_argument('--output', default=None, help="Csv file in which the evaluation is written ('evaluate').")
+    parser.add_argument('--fs', type=int, default=5000, help="Sampling frequency in Hz.")
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        cohort = generate_cohort(
+            args.cohort_dir, args.participants, fs=args.fs, seed=args.seed, decimal_symbol=args.decimal,
+            tasks=args.tasks, max_workers=args.workers
+        )
+        print(f"{len(cohort)} trials of {args.participants} participants written to {args.cohort_dir}")
+    else:
+        evaluation = evaluate_cohort(args.cohort_dir, args.results_dir, fs=args.fs)
+        if args.output is not None:
+            evaluation.to_csv(args.output, index=False)
+        summary = evaluation.groupby('task')[['recall', 'precision', 'mean_abs_error']].mean()
+        print(summary.to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,16 @@
 import numpy as np
 
-def moving_average(data, window, boundary='default'):
+def moving_average(data, window, boundary='default', axis=-1):
     """
-    Compute the moving average of a 1D array with flexible window size and boundary handling.
-    
+    Compute the moving average of an array with flexible window size and boundary handling.
+
+    The average is computed from cumulative sums, so the cost is linear in the number of samples and does not depend on
+    the window size. Several signals (e.g., channels or trials) can be smoothed in one call by passing a 2-D array.
+
     Parameters
     ----------
     data : array_like
-        The input data.
+        The input data. Either a 1D array or a 2D array of signals, smoothed along `axis`.
     window : int or tuple
         The window size. If an integer, the window will be centered on the data point. If a tuple of two integers, the
         window will extend before the data point by the first integer and after the data point by the second integer.
@@ -16,47 +19,146 @@ def moving_average(data, window, boundary='default'):
             - `default`: does not pad the data and uses smaller windows at the edges
             - `fill`: pads the data with zeros
             - `omitnan`: dynamically adjusts the window size to the number of available data points.
+    axis : int, optional
+        Axis along which the moving average is computed. Default is -1.
 
     Returns
     -------
     result : ndarray
-        The moving average of the input data.
+        The moving average of the input data, with the same shape as the input.
     """
     data = np.asarray(data, dtype=float)
-    n = len(data)
-    
+    if data.ndim not in (1, 2):
+        raise ValueError("Data must be a 1D or a 2D array.")
+    data = np.moveaxis(data, axis, -1)
+    n = data.shape[-1]
+
     # Parse the window size
-    if isinstance(window, int):
-        before = window // 2
-        after = window - before - 1
+    if isinstance(window, (int, np.integer)):
+        before = int(window) // 2
+        after = int(window) - before - 1
     elif isinstance(window, tuple) and len(window) == 2:
         before, after = window
     else:
         raise ValueError("Window must be an integer or a tuple of two integers.")
-    
-    # Initialize the result
-    result = np.full(n, np.nan)  # Default to NaN for uncomputable positions
-
-    # Boundary handling
-    if boundary == 'fill':
-        data = np.pad(data, (before, after), mode='constant', constant_values=0)
-    elif boundary == 'default':
-        pass  # No explicit padding; edges will have smaller windows
-    elif boundary == 'omitnan':
-        # Handle NaNs dynamically in computations
-        pass
-    else:
+
+    if boundary not in ('default', 'fill', 'omitnan'):
         raise ValueError("Boundary must be 'default', 'fill', or 'omitnan'.")
-    
-    # Compute the moving average
-    for i in range(n):
-        start = max(0, i - before)
-        end = min(n, i + after + 1)
-        if boundary == 'omitnan':
-            window_data = data[start:end]
-            result[i] = np.nanmean(window_data)
-        else:
-            result[i] = np.mean(data[start:end])
-
-    return result
 
+    # Bounds of the window for each sample, clipped to the data
+    idx = np.arange(n)
+    start = np.clip(idx - before, 0, n)
+    end = np.clip(idx + after + 1, 0, n)
+    window_length = np.maximum(end - start, 0)
+
+    # Remove an offset before summing to limit the loss of precision of the cumulative sums on long recordings
+    valid = ~np.isnan(data)
+    n_valid = np.sum(valid, axis=-1, keepdims=True)
+    offset = np.divide(np.sum(np.where(valid, data, 0), axis=-1, keepdims=True), n_valid,
+                       out=np.zeros(n_valid.shape), where=n_valid > 0)
+    centered = np.where(valid, data - offset, 0)
+
+    # Cumulative sums with a leading zero, so that the sum over [start, end) is csum[end] - csum[start]
+    pad_width = [(0, 0)] * (data.ndim - 1) + [(1, 0)]
+    csum = np.pad(np.cumsum(centered, axis=-1), pad_width)
+    ccount = np.pad(np.cumsum(valid, axis=-1), pad_width)
+    count = ccount[..., end] - ccount[..., start]
+    window_sum = csum[..., end] - csum[..., start] + offset * count
+
+    # Compute the moving average; windows without any data point are left to NaN
+    result = np.full(data.shape, np.nan)
+    if boundary == 'omitnan':
+        np.divide(window_sum, count, out=result, where=count > 0)
+    else:
+        # Windows containing a NaN are NaN, as with np.mean
+        has_data = (count == window_length) & (window_length > 0)
+        if boundary == 'fill':
+            # Samples outside the data are zeros, so the window always has its full length
+            window_length = np.full(n, before + after + 1)
+        np.divide(window_sum, window_length, out=result, where=has_data)
+
+    return np.moveaxis(result, -1, axis)
+
+
+def minmax_decimate(signal, start, stop, n_bins):
+    """
+    Decimate a part of a signal by keeping the minimum and maximum of each bin.
+
+    The decimated signal drawn as a line has the same envelope as the full signal, so it looks the same on a screen
+    when there is about one bin per pixel.
+
+    Parameters
+    ----------
+    signal : array
+        The input signal.
+    start : int
+        Index of the first sample of the part to decimate.
+    stop : int
+        Index after the last sample of the part to decimate.
+    n_bins : int
+        Number of bins. If the part has less than two samples per bin, it is returned without decimation.
+
+    Returns
+    -------
+    idx : ndarray
+        Sample indices of the decimated signal. Each bin gives two points, placed at its first sample.
+    values : ndarray
+        Values of the decimated signal, alternating the minimum and maximum of each bin.
+    """
+    start = int(np.clip(start, 0, len(signal)))
+    stop = int(np.clip(stop, start, len(signal)))
+    n_bins = max(int(n_bins), 1)
+
+    if stop - start <= 2 * n_bins:
+        idx = np.arange(start, stop)
+        return idx, np.asarray(signal[start:stop])
+
+    edges = np.linspace(start, stop, n_bins + 1).astype(int)[:-1]
+    part = np.asarray(signal[start:stop])
+    minima = np.minimum.reduceat(part, edges - start)
+    maxima = np.maximum.reduceat(part, edges - start)
+
+    return np.repeat(edges, 2), np.column_stack((minima, maxima)).ravel()
+
+
+def plot_decimated(ax, signal, fs=5000, **line_kwargs):
+    """
+    Plot a long signal as a min/max decimated line, decimated again when the view changes.
+
+    The signal is decimated to about two points per pixel of the axes. When the x-axis limits or the size of the figure
+    change (e.g., zoom in an interactive figure), only the visible part of the signal is decimated again, so that details
+    appear when zooming in.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axes in which the signal is plotted.
+    signal : array
+        The signal to plot.
+    fs : int, optional
+        Sampling frequency in Hz. The x-axis is in seconds. Default is 5000.
+    **line_kwargs
+        Keyword arguments passed to `ax.plot`.
+
+    Returns
+    -------
+    out : matplotlib.lines.Line2D
+        The plotted line.
+    """
+    def decimate(xmin, xmax):
+        n_bins = max(int(ax.bbox.width), 1)
+        # Include one sample on each side so that the line reaches the edges of the axes
+        idx, values = minmax_decimate(signal, np.floor(xmin * fs) - 1, np.ceil(xmax * fs) + 2, n_bins)
+        return idx / fs, values
+
+    line, = ax.plot(*decimate(0, (len(signal) - 1) / fs), **line_kwargs)
+
+    # The canvas is redrawn after a zoom or a resize, so the line only needs new data
+    def update(_):
+        xmin, xmax = ax.get_xlim()
+        line.set_data(*decimate(xmin, xmax))
+
+    ax.callbacks.connect('xlim_changed', update)
+    ax.figure.canvas.mpl_connect('resize_event', update)
+
+    return line